@@ -1,95 +1,469 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from llm1 import LLMClient
-from graph import run_cypher
-from dataproduct_schema import GRAPH_SCHEMA
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from llm import Tool, ToolLLM
+from graph import (
+    get_driver, init_driver, close_driver,
+    run_cypher_page, run_cypher_next_page, stream_cypher, encode_page_token, can_page, InvalidPageToken,
+    db_executions
+)
+from config import LLM_QUERY_ROW_CAP, QUERY_PAGE_SIZE, BATCH_CONCURRENCY, MAX_BATCH_CONCURRENCY
+from dataproduct_schema import SchemaSnapshot
+from singleflight import SingleFlight
+from intent_router import CatalogIndex, IntentRouter
+from catalog_api import router as catalog_router
+from shared_cache import shared_cache, enabled as shared_cache_enabled
+from tracing import trace_request, span, token_counts, metrics as stage_metrics, slow_queries
+from synthesis import plan_synthesis, plan_stats, totals_snapshot as synthesis_totals
+from result_format import (
+    COLUMNAR, RECORDS, FORMAT_PATTERN, ColumnarResponse, columnar as columnar_results, records_to_columnar
+)
 from cypher_queries import CYPHER_EXAMPLES
-from neo4j_graphrag.retrievers import Text2CypherRetriever
+from cypher_guard import CypherRejected
+from retriever import GuardedText2CypherRetriever
 from neo4j_graphrag.generation import GraphRAG
-import nest_asyncio
+from neo4j_graphrag.generation.prompts import RagTemplate
 import asyncio
+import gc
+import json
+import logging
+import threading
+import time
 import traceback
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+process_started = time.perf_counter()
 
-class AskRequest(BaseModel):
-    question: str
-
-# Initialize LLM, retriever, and RAG pipeline at startup
-my_LLMClient = LLMClient(api_key="<< LLM API key >>")
-nest_asyncio.apply()
-asyncio.run(LLMClient._get_session(my_LLMClient))
-driver = None
+# Clients and caches are created cheaply here; connections are opened and
+# caches warmed by lifespan() before the app accepts traffic.
+# Pooled completions client (retries, circuit breaker, hedging) behind every LLM
+# call: Text2Cypher and answer synthesis through the my_LLMClient adapter, and
+# /ask/stream answer tokens directly
+llm_tool = Tool()
+my_LLMClient = ToolLLM(llm_tool)
 retriever = None
 rag = None
+_rag_lock = threading.Lock()
+schema_snapshot = SchemaSnapshot()
+# Identical questions asked concurrently share one generation + execution
+ask_flights = SingleFlight()
+# Common question intents answered with parameterized Cypher, without the LLM
+catalog_index = CatalogIndex()
+intent_router = IntentRouter(catalog_index)
+if shared_cache_enabled():
+    # Prefork mode: the schema and catalog index come from the snapshot the
+    # gunicorn master published, never from per-worker graph queries. Loading
+    # it here (pre-fork under preload_app) and freezing it out of the GC keeps
+    # the pages shared copy-on-write between workers.
+    schema_snapshot.ttl = catalog_index.ttl = float("inf")
+    shared_cache.subscribe(lambda snapshot: schema_snapshot.load(**snapshot["schema"]))
+    shared_cache.subscribe(lambda snapshot: catalog_index.load(**snapshot["catalog"]))
+    shared_cache.load()
+    gc.freeze()
+
+# Startup and first-request latency, reported by /readyz
+startup_stats = {"ready": False, "stages_ms": {}, "cold_start_ms": None, "first_request_ms": None}
 
 def get_rag():
-    global driver, retriever, rag
+    global retriever, rag
     if rag is not None:
         return rag
-    from neo4j import GraphDatabase
-    driver = GraphDatabase.driver(
-        "bolt://localhost:7687",
-        auth=("<<user-name>>", "<<password>>")
-    )
-    retriever = Text2CypherRetriever(
-        driver=driver,
-        llm=my_LLMClient,
-        neo4j_schema=GRAPH_SCHEMA,
-        examples=CYPHER_EXAMPLES
-    )
-    rag = GraphRAG(retriever=retriever, llm=my_LLMClient)
+    with _rag_lock:
+        if rag is None:
+            schema_snapshot.ensure_fresh()
+            retriever = GuardedText2CypherRetriever(
+                driver=get_driver(),
+                llm=my_LLMClient,
+                neo4j_schema=schema_snapshot.render(),
+                examples=CYPHER_EXAMPLES
+            )
+            rag = GraphRAG(retriever=retriever, llm=my_LLMClient)
     return rag
 
-def extract_cypher_query(response: str) -> str:
-    import re
-    response = re.sub(r'`+', '', response)
-    response = response.strip()
-    cypher_keywords = (
-        "MATCH", "RETURN", "WITH", "WHERE", "CREATE", "MERGE", "OPTIONAL", "UNWIND",
-        "CALL", "SET", "DELETE", "DETACH", "ORDER", "SKIP", "LIMIT", "REMOVE",
-        "FOREACH", "LOAD", "USING", "UNION"
-    )
-    lines = response.splitlines()
-    start_idx = None
-    for i, line in enumerate(lines):
-        if line.strip().upper().startswith(cypher_keywords):
-            start_idx = i
-            break
-    if start_idx is not None:
-        cypher_lines = []
-        for line in lines[start_idx:]:
-            stripped = line.strip()
-            if not stripped:
-                break
-            if (stripped.upper().startswith(cypher_keywords) or line.startswith("    ") or line.startswith("\t")):
-                cypher_lines.append(line)
-            else:
-                break
-        cypher = "\n".join(cypher_lines).strip()
-        cypher = cypher.rstrip(';').strip()
-        cypher = re.sub(r'`+', '', cypher).strip()
-        return cypher
-    for line in lines:
-        if line.strip().upper().startswith(cypher_keywords):
-            return re.sub(r'`+', '', line.strip())
-    return re.sub(r'`+', '', response.strip())
+def warm_caches() -> None:
+    """Loads the schema snapshot and catalog index and builds the RAG pipeline."""
+    if shared_cache.snapshot is None:
+        schema_snapshot.refresh()
+        catalog_index.refresh()
+    get_rag()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stages = startup_stats["stages_ms"]
+
+    async def stage(name, fn):
+        started = time.perf_counter()
+        await fn()
+        stages[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def open_llm_sessions():
+        await llm_tool.ensure_session()
+        my_LLMClient.bind_loop(asyncio.get_running_loop())
+
+    await stage("neo4j_pool", lambda: run_in_threadpool(init_driver))
+    await stage("llm_session", open_llm_sessions)
+    await stage("warm_caches", lambda: run_in_threadpool(warm_caches))
+    startup_stats["cold_start_ms"] = round((time.perf_counter() - process_started) * 1000, 1)
+    startup_stats["ready"] = True
+    logger.info("API ready in %s ms: %s", startup_stats["cold_start_ms"], stages)
+    try:
+        yield
+    finally:
+        startup_stats["ready"] = False
+        await llm_tool.close()
+        await run_in_threadpool(close_driver)
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(catalog_router)
+
+@app.middleware("http")
+async def request_hooks(request: Request, call_next):
+    if shared_cache_enabled() and shared_cache.reload_due():
+        # At most once a second; mapping a new generation and applying it stays off the event loop
+        await run_in_threadpool(shared_cache.maybe_reload)
+    if startup_stats["first_request_ms"] is not None or request.url.path in ("/healthz", "/readyz"):
+        return await call_next(request)
+    started = time.perf_counter()
+    response = await call_next(request)
+    startup_stats["first_request_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return response
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: Neo4j pool verified, LLM sessions open and caches warm."""
+    checks = {
+        "startup_complete": startup_stats["ready"],
+        "schema_snapshot": schema_snapshot.introspected,
+        "catalog_index": bool(catalog_index.loaded_at),
+        "rag_pipeline": rag is not None,
+    }
+    if shared_cache_enabled():
+        checks["shared_cache"] = shared_cache.snapshot is not None
+    body = {"ready": all(checks.values()), "checks": checks, "startup": startup_stats,
+            "shared_cache_generation": shared_cache.generation}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+# "format": "columnar" returns results as {"columns", "rows"} (see result_format.py)
+class AskRequest(BaseModel):
+    question: str
+    page_size: int = Field(default=QUERY_PAGE_SIZE, ge=1, le=5000)
+    format: str = Field(default=RECORDS, pattern=FORMAT_PATTERN)
+
+class AskBatchRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=1000)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=MAX_BATCH_CONCURRENCY)
+    page_size: int = Field(default=QUERY_PAGE_SIZE, ge=1, le=5000)
+    format: str = Field(default=RECORDS, pattern=FORMAT_PATTERN)
+
+class PageRequest(BaseModel):
+    page_token: str
+    page_size: int = Field(default=QUERY_PAGE_SIZE, ge=1, le=5000)
+    format: str = Field(default=RECORDS, pattern=FORMAT_PATTERN)
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def page_results(page: dict, columnar: bool):
+    return columnar_results(page["columns"], page["rows"]) if columnar else page["rows"]
+
+def answer_routed_question(route: dict, page_size: int = QUERY_PAGE_SIZE, columnar: bool = False) -> dict:
+    """Answers a question the intent router recognised, without calling the LLM."""
+    page = run_cypher_page(route["cypher"], params=route["params"], page_size=page_size, columnar=columnar)
+    answer = None
+    # Templated answers describe the whole result, so only use them when it fit in one page
+    if route["answer"] and page["rows"] and page["next_page_token"] is None:
+        records = page["rows"]
+        if columnar:
+            records = [dict(zip(page["columns"], row)) for row in records]
+        answer = route["answer"](records, route["params"])
+    return {
+        "cypher": route["cypher"],
+        "params": route["params"],
+        "intent": route["intent"],
+        "answer": answer,
+        "results": page_results(page, columnar),
+        "next_page_token": page["next_page_token"],
+        "truncated": page["truncated"]
+    }
+
+def answer_question(question: str, page_size: int = QUERY_PAGE_SIZE, columnar: bool = False) -> dict:
+    """Runs the full /ask pipeline for one question (blocking), tracing each stage."""
+    with trace_request("ask", question=question) as trace:
+        with span("route") as attrs:
+            route = intent_router.route(question)
+            attrs["intent"] = route["intent"] if route else None
+        if route:
+            with span("query"):
+                result = answer_routed_question(route, page_size, columnar)
+        else:
+            result = answer_llm_question(question, page_size, columnar)
+        trace.attrs["cypher"] = result["cypher"]
+    result["timings_ms"] = trace.timings()
+    result["db_executions"] = trace.attrs.get("db_executions", 0)
+    return result
+
+def synthesize_answer(question: str, records: list) -> tuple:
+    """
+    Writes the answer to `question` from its result records within the token
+    budget (see synthesis.py), calling the LLM only when the result needs
+    explaining. Returns (answer, synthesis stats).
+    """
+    with span("synthesis") as attrs:
+        plan = plan_synthesis(question, records)
+        attrs.update(plan_stats(plan))
+    answer = plan["answer"]
+    if answer is None:
+        rag = get_rag()
+        prompt = rag.prompt_template.format(query_text=question, context=plan["context"], examples="")
+        with span("llm_answer") as attrs:
+            answer = rag.llm.invoke(prompt, system_instruction=rag.prompt_template.system_instructions).content
+            attrs.update(token_counts(prompt, answer))
+    return answer, plan_stats(plan)
+
+def answer_llm_question(question: str, page_size: int, columnar: bool = False) -> dict:
+    """Text2Cypher + RAG path of answer_question."""
+    get_rag()
+    with span("retrieve"):
+        # Only the part of the live schema relevant to this question goes into the prompt
+        schema = schema_snapshot.prune(question)
+        search = retriever.get_search_results(question, prompt_params={"schema": schema})
+    # The retriever's records (already capped at LLM_QUERY_ROW_CAP) are the results;
+    # only later pages, via the token, run the query again
+    records = [record.data() for record in search.records]
+    with span("answer"):
+        answer, synthesis = synthesize_answer(question, records)
+    # The guarded retriever reports the query it actually ran (possibly rewritten or repaired)
+    metadata = search.metadata or {}
+    cypher = metadata["cypher"]
+    guard = metadata.get("guard", {})
+    next_page_token, truncated = None, metadata.get("truncated", False)
+    if len(records) > page_size:
+        if can_page(cypher):
+            next_page_token = encode_page_token(cypher, {}, page_size, LLM_QUERY_ROW_CAP)
+        else:
+            truncated = True
+    results = records[:page_size]
+    return {
+        "cypher": cypher,
+        "answer": answer,
+        "synthesis": synthesis,
+        "results": records_to_columnar(results) if columnar else results,
+        "next_page_token": next_page_token,
+        "truncated": truncated,
+        "cypher_rewritten": guard.get("rewritten", False),
+        "cypher_repaired": guard.get("repaired", False)
+    }
+
+def normalize_question(question: str) -> str:
+    """Canonical form used to detect duplicate questions."""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+async def answer_question_coalesced(question: str, page_size: int = QUERY_PAGE_SIZE, columnar: bool = False) -> dict:
+    """answer_question, shared with any identical question already in flight."""
+    key = (normalize_question(question), page_size, columnar)
+    result = await ask_flights.do(key, lambda: run_in_threadpool(answer_question, question, page_size, columnar))
+    # Each caller gets its own copy of the shared result
+    return dict(result)
 
 @app.post("/ask")
 async def ask_endpoint(req: AskRequest):
     try:
-        rag = get_rag()
-        response = rag.search(query_text=req.question)
-        cypher = extract_cypher_query(response.generated_query)
-        try:
-            results = run_cypher(cypher)
-        except Exception as e:
-            results = None
-        return {
-            "cypher": cypher,
-            "answer": getattr(response, "answer", None),
-            "results": results
+        result = await answer_question_coalesced(req.question, req.page_size, req.format == COLUMNAR)
+        return ColumnarResponse(result) if req.format == COLUMNAR else result
+    except CypherRejected as e:
+        return JSONResponse(status_code=422, content={"error": str(e), "cypher": e.cypher, "reasons": e.reasons})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e), "traceback": traceback.format_exc()})
+
+@app.post("/ask/batch")
+async def ask_batch_endpoint(req: AskBatchRequest):
+    """
+    Answers a list of questions concurrently. Duplicate questions (after
+    normalization) are answered once; results come back in request order,
+    each with its own timing or error.
+    """
+    started = time.perf_counter()
+    unique = {}
+    for question in req.questions:
+        unique.setdefault(normalize_question(question), question)
+
+    semaphore = asyncio.Semaphore(req.concurrency or BATCH_CONCURRENCY)
+
+    async def answer_one(question: str) -> dict:
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                result = await answer_question_coalesced(question, req.page_size, req.format == COLUMNAR)
+            except Exception as e:
+                result = {"error": str(e)}
+            result["elapsed_ms"] = elapsed_ms(t0)
+            return result
+
+    answers = await asyncio.gather(*(answer_one(q) for q in unique.values()))
+    by_key = dict(zip(unique.keys(), answers))
+    body = {
+        "results": [
+            {"question": question, **by_key[normalize_question(question)]}
+            for question in req.questions
+        ],
+        "unique_questions": len(unique),
+        "elapsed_ms": elapsed_ms(started)
+    }
+    return ColumnarResponse(body) if req.format == COLUMNAR else body
+
+@app.post("/ask/page")
+async def ask_page_endpoint(req: PageRequest):
+    """Fetches the next page of results using a next_page_token from /ask."""
+    try:
+        started = time.perf_counter()
+        columnar = req.format == COLUMNAR
+        page = await run_in_threadpool(run_cypher_next_page, req.page_token, req.page_size, columnar)
+        body = {
+            "results": page_results(page, columnar),
+            "next_page_token": page["next_page_token"],
+            "truncated": page["truncated"],
+            "timings_ms": {"query_ms": elapsed_ms(started)}
         }
+        return ColumnarResponse(body) if columnar else body
+    except InvalidPageToken as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e), "traceback": traceback.format_exc()}) 
+        return JSONResponse(status_code=500, content={"error": str(e), "traceback": traceback.format_exc()})
+
+@app.get("/stats/llm")
+async def llm_stats_endpoint():
+    """Latency/error metrics of the pooled LLM client, per endpoint."""
+    return llm_tool.metrics()
+
+@app.get("/stats/intents")
+async def intent_stats_endpoint():
+    """Hit rate of the LLM-free intent router, per intent."""
+    return intent_router.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Latency histograms per /ask pipeline stage, in Prometheus text format."""
+    return PlainTextResponse(stage_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/slow-queries")
+async def slow_queries_endpoint():
+    """The slowest /ask requests seen: question, Cypher, total time and per-stage spans."""
+    return slow_queries.entries()
+
+@app.get("/stats/db")
+async def db_stats_endpoint():
+    """Cypher executions against Neo4j since startup (EXPLAINs not included)."""
+    return db_executions
+
+@app.get("/stats/synthesis")
+async def synthesis_stats_endpoint():
+    """How answers were synthesized (direct, full or summarised context) and LLM tokens saved."""
+    return synthesis_totals()
+
+@app.get("/stats/coalescing")
+async def coalescing_stats_endpoint():
+    """How many /ask executions ran and how many identical calls were collapsed into them."""
+    return ask_flights.stats()
+
+def generate_cypher(question: str) -> str:
+    """Ask the LLM for the Cypher answering `question` and guard it, without executing it."""
+    get_rag()
+    verdict = retriever.generate_guarded_cypher(question, schema=schema_snapshot.prune(question))
+    return verdict["cypher"]
+
+def ndjson_event(event: str, **fields) -> str:
+    return json.dumps({"event": event, **fields}, default=str) + "\n"
+
+async def ask_stream_events(question: str, page_size: int = QUERY_PAGE_SIZE, columnar: bool = False):
+    """
+    Yields NDJSON events for `question` as each stage produces them: the
+    generated Cypher, then the first `page_size` result rows (later pages via
+    /ask/page with the next_page_token in "rows_done"), then answer tokens.
+    "done" carries the per-stage timings. With `columnar`, a "columns" event
+    precedes the rows and each row's data is a list of values in that order.
+    """
+    with trace_request("ask_stream", question=question) as trace:
+
+        def done_event(**fields) -> str:
+            timings = trace.timings()
+            timings["total_ms"] = elapsed_ms(trace.started)
+            return ndjson_event("done", timings_ms=timings, db_executions=trace.attrs.get("db_executions", 0),
+                                **fields)
+
+        try:
+            with span("route") as attrs:
+                # route() may refresh the catalog from Neo4j; keep it off the event loop
+                route = await run_in_threadpool(intent_router.route, question)
+                attrs["intent"] = route["intent"] if route else None
+            if route:
+                cypher, params = route["cypher"], route["params"]
+                yield ndjson_event("cypher", cypher=cypher, params=params, intent=route["intent"])
+            else:
+                with span("cypher"):
+                    cypher, params = await run_in_threadpool(generate_cypher, question), {}
+                yield ndjson_event("cypher", cypher=cypher)
+            trace.attrs["cypher"] = cypher
+
+            # Every row (up to the cap) feeds the answer, but only the first page goes to the client
+            rows, columns = [], None
+            with span("query"):
+                # One look-ahead row past the cap tells whether the result was truncated
+                rows_in = stream_cypher(cypher, params, max_rows=LLM_QUERY_ROW_CAP + 1)
+                async for row in iterate_in_threadpool(rows_in):
+                    rows.append(row)
+                    if len(rows) <= page_size:
+                        if not columnar:
+                            yield ndjson_event("row", data=row)
+                            continue
+                        if columns is None:
+                            columns = list(row.keys())
+                            yield ndjson_event("columns", columns=columns)
+                        yield ndjson_event("row", data=[row.get(column) for column in columns])
+            if columnar and columns is None:
+                yield ndjson_event("columns", columns=[])
+            truncated = len(rows) > LLM_QUERY_ROW_CAP
+            rows = rows[:LLM_QUERY_ROW_CAP]
+            next_page_token = None
+            if len(rows) > page_size:
+                if can_page(cypher, params):
+                    next_page_token = encode_page_token(cypher, params, page_size, LLM_QUERY_ROW_CAP)
+                else:
+                    truncated = True
+            yield ndjson_event("rows_done", count=min(len(rows), page_size), total=len(rows),
+                               next_page_token=next_page_token, truncated=truncated)
+
+            if route:
+                if route["answer"] and rows:
+                    yield ndjson_event("token", text=route["answer"](rows, params))
+                yield done_event()
+                return
+
+            with span("synthesis") as attrs:
+                plan = plan_synthesis(question, rows)
+                attrs.update(plan_stats(plan))
+            if plan["answer"] is not None:
+                yield ndjson_event("token", text=plan["answer"])
+                yield done_event(synthesis=plan_stats(plan))
+                return
+
+            prompt = RagTemplate().format(query_text=question, context=plan["context"], examples="")
+            with span("answer"):
+                async for token in llm_tool.stream({"prompt": prompt}):
+                    yield ndjson_event("token", text=token)
+            yield done_event(synthesis=plan_stats(plan))
+        except Exception as e:
+            yield ndjson_event("error", error=str(e), traceback=traceback.format_exc())
+
+@app.post("/ask/stream")
+async def ask_stream_endpoint(req: AskRequest):
+    """Streaming variant of /ask returning newline-delimited JSON events."""
+    return StreamingResponse(ask_stream_events(req.question, req.page_size, req.format == COLUMNAR),
+                             media_type="application/x-ndjson")
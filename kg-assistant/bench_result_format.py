@@ -0,0 +1,88 @@
+"""
+Benchmark of result payload formats: payload bytes and encode time of
+
+  records/fastapi  - list of dicts through jsonable_encoder + json.dumps (FastAPI's default)
+  records/orjson   - list of dicts through result_format.dumps
+  columnar/orjson  - {"columns", "rows"} through result_format.dumps (format=columnar)
+
+Runs on a synthetic wide result by default, or on a live query with --cypher:
+
+  python bench_result_format.py --rows 20000 --columns 16
+  python bench_result_format.py --cypher "MATCH (dp:DataProduct) RETURN dp.name AS name, dp.domain AS domain"
+"""
+
+import argparse
+import json
+import random
+import statistics
+import string
+import time
+
+from fastapi.encoders import jsonable_encoder
+from neo4j.time import DateTime
+
+from result_format import columnar, dumps, records_to_columnar
+
+
+def synthetic_records(rows: int, columns: int) -> list:
+    """Rows shaped like catalog results: names, domains, counts, scores, timestamps and tag lists."""
+    rng = random.Random(42)
+    names = [f"DataProductAttribute{i}" for i in range(columns)]
+    words = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(200)]
+    makers = [
+        lambda: rng.choice(words).title() + "Data",
+        lambda: rng.randint(0, 1_000_000),
+        lambda: round(rng.random() * 100, 3),
+        lambda: DateTime(2024, rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), 0, 0),
+        lambda: rng.sample(words, 3),
+    ]
+    column_makers = [makers[i % len(makers)] for i in range(columns)]
+    return [{name: make() for name, make in zip(names, column_makers)} for _ in range(rows)]
+
+def live_pages(cypher: str, rows: int):
+    from graph import run_cypher_page
+    records = run_cypher_page(cypher, page_size=rows)
+    raw = run_cypher_page(cypher, page_size=rows, columnar=True)
+    return records["rows"], columnar(raw["columns"], raw["rows"])
+
+def time_encode(encode, repeat: int):
+    timings, payload = [], b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = encode()
+        timings.append((time.perf_counter() - started) * 1000)
+    return len(payload), statistics.median(timings)
+
+def fastapi_default(records: list) -> bytes:
+    # What JSONResponse.render does after FastAPI has run jsonable_encoder
+    return json.dumps(jsonable_encoder(records, custom_encoder={DateTime: DateTime.iso_format}),
+                      ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cypher", help="benchmark a live query instead of synthetic rows")
+    args = parser.parse_args()
+
+    if args.cypher:
+        records, table = live_pages(args.cypher, args.rows)
+    else:
+        records = synthetic_records(args.rows, args.columns)
+        table = records_to_columnar(records)
+    print(f"{len(records)} rows x {len(table['columns'])} columns, median of {args.repeat} runs\n")
+
+    results = {
+        "records/fastapi": time_encode(lambda: fastapi_default(records), args.repeat),
+        "records/orjson": time_encode(lambda: dumps(records), args.repeat),
+        "columnar/orjson": time_encode(lambda: dumps(table), args.repeat),
+    }
+    base_bytes, base_ms = results["records/fastapi"]
+    print(f"{'format':<18}{'bytes':>14}{'size':>8}{'encode ms':>12}{'speedup':>9}")
+    for name, (size, ms) in results.items():
+        print(f"{name:<18}{size:>14,}{size / base_bytes:>8.0%}{ms:>12.1f}{base_ms / ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
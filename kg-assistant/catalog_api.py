@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+import json
+
+from config import CYPHER_MAX_PATH_DEPTH, REPORT_TOP_N, SEARCH_INDEX
+from graph import run_cypher
+from reports import DIMENSIONS, report_cache
+from shared_cache import shared_cache
+import catalog_queries as q
+
+# Direct, LLM-free endpoints for lineage, impact and catalog queries.
+# Handlers are plain functions, so FastAPI runs them in its threadpool.
+router = APIRouter()
+
+MAX_PAGE_SIZE = 1000
+
+
+def paginated(query: str, skip: int, limit: int, **params) -> dict:
+    """Runs a query ending in SKIP $skip LIMIT $limit, fetching one extra row to detect a next page."""
+    rows = run_cypher(query, dict(params, skip=skip, limit=limit + 1))
+    has_more = len(rows) > limit
+    return {
+        "items": rows[:limit],
+        "skip": skip,
+        "limit": limit,
+        "next_skip": skip + limit if has_more else None
+    }
+
+def one_or_404(query: str, **params) -> dict:
+    rows = run_cypher(query, params, max_rows=1)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No DataProduct found with id: {params.get('id')}")
+    return rows[0]
+
+
+@router.get("/dataproducts")
+def list_dataproducts(domain: Optional[str] = None,
+                      skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    return paginated(q.DATAPRODUCTS_QUERY, skip, limit, domain=domain)
+
+@router.get("/search")
+def search(q_: str = Query(..., alias="q", min_length=1, max_length=200),
+           skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+    """Ranked data product search over names, descriptions, tags, business terms and tables."""
+    query = q.fulltext_query(q_)
+    if not query:
+        return {"items": [], "skip": skip, "limit": limit, "next_skip": None}
+    return paginated(q.SEARCH_QUERY, skip, limit, index=SEARCH_INDEX, query=query)
+
+@router.get("/dataproducts/{dataproduct_id}")
+def get_dataproduct(dataproduct_id: str):
+    return one_or_404(q.DATAPRODUCT_QUERY, id=dataproduct_id)
+
+@router.get("/dataproducts/{dataproduct_id}/as-of")
+def get_dataproduct_as_of(dataproduct_id: str, at: str = Query(..., description="ISO 8601 timestamp, UTC unless offset given")):
+    """The product's properties and relations as they were at `at`."""
+    # Parsed here and passed as a datetime, so every timestamp Python accepts
+    # (e.g. "2025-01-01 12:00:00") is one the query accepts too
+    try:
+        at_time = datetime.fromisoformat(at)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid ISO 8601 timestamp: {at}")
+    if at_time.tzinfo is None:
+        at_time = at_time.replace(tzinfo=timezone.utc)
+    rows = run_cypher(q.DATAPRODUCT_AS_OF_QUERY, {"id": dataproduct_id, "at": at_time}, max_rows=1)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No version of DataProduct {dataproduct_id} valid at {at}")
+    version = rows[0]["version"]
+    version["relations"] = json.loads(version.get("relations") or "{}")
+    return version
+
+@router.get("/dataproducts/{dataproduct_id}/versions")
+def list_dataproduct_versions(dataproduct_id: str,
+                              skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """Version history of a product, newest first."""
+    return dict(paginated(q.DATAPRODUCT_VERSIONS_QUERY, skip, limit, id=dataproduct_id), dataproduct_id=dataproduct_id)
+
+@router.get("/dataproducts/{dataproduct_id}/lineage")
+def dataproduct_lineage(dataproduct_id: str,
+                        direction: str = Query("both", pattern="^(upstream|downstream|both)$"),
+                        depth: int = Query(3, ge=1, le=CYPHER_MAX_PATH_DEPTH),
+                        skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """Upstream and/or downstream data products within `depth` FEEDS_INTO hops, nearest first."""
+    # In prefork mode the lineage adjacency is already in (shared) memory
+    items = shared_cache.lineage(dataproduct_id, direction, depth)
+    if items is not None:
+        if not items and dataproduct_id not in shared_cache.snapshot["lineage"]:
+            raise HTTPException(status_code=404, detail=f"No DataProduct found with id: {dataproduct_id}")
+        has_more = len(items) > skip + limit
+        return {"items": items[skip:skip + limit], "skip": skip, "limit": limit,
+                "next_skip": skip + limit if has_more else None,
+                "dataproduct_id": dataproduct_id, "direction": direction, "depth": depth}
+    page = paginated(q.lineage_query(direction, depth), skip, limit, id=dataproduct_id)
+    if not page["items"] and skip == 0:
+        one_or_404(q.DATAPRODUCT_QUERY, id=dataproduct_id)
+    return dict(page, dataproduct_id=dataproduct_id, direction=direction, depth=depth)
+
+@router.get("/dataproducts/{dataproduct_id}/impact")
+def dataproduct_impact(dataproduct_id: str, depth: int = Query(CYPHER_MAX_PATH_DEPTH, ge=1, le=CYPHER_MAX_PATH_DEPTH),
+                       skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Direct and transitive dependants of a data product, and the domains they
+    belong to. impacted_dataproducts is paginated (by name) with skip/limit.
+    """
+    impact = one_or_404(q.impact_query(depth), id=dataproduct_id, skip=skip, limit=limit + 1)
+    has_more = len(impact["impacted_dataproducts"]) > limit
+    impact["impacted_dataproducts"] = impact["impacted_dataproducts"][:limit]
+    return dict(impact, skip=skip, limit=limit, next_skip=skip + limit if has_more else None)
+
+@router.get("/columns/pii-propagation")
+def pii_propagation(column: Optional[str] = None, unflagged_only: bool = False,
+                    depth: int = Query(CYPHER_MAX_PATH_DEPTH, ge=1, le=CYPHER_MAX_PATH_DEPTH),
+                    skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """Columns derived from PII columns (or from `column` only); unflagged ones first."""
+    page = paginated(q.pii_propagation_query(depth), skip, limit, key=column, unflagged_only=unflagged_only)
+    return dict(page, column=column, unflagged_only=unflagged_only, depth=depth)
+
+@router.get("/columns/{column_key}/lineage")
+def column_lineage(column_key: str,
+                   direction: str = Query("both", pattern="^(upstream|downstream|both)$"),
+                   depth: int = Query(3, ge=1, le=CYPHER_MAX_PATH_DEPTH),
+                   skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """Upstream and/or downstream columns ("table.column") within `depth` DERIVES hops, nearest first."""
+    page = paginated(q.column_lineage_query(direction, depth), skip, limit, key=column_key)
+    if not page["items"] and skip == 0 and not run_cypher(q.COLUMN_QUERY, {"key": column_key}, max_rows=1):
+        raise HTTPException(status_code=404, detail=f"No Column found with key: {column_key}")
+    return dict(page, column=column_key, direction=direction, depth=depth)
+
+@router.get("/dependencies")
+def list_dependencies(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    return paginated(q.DEPENDENCIES_QUERY, skip, limit)
+
+@router.get("/domains/summary")
+def domains_summary(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    return paginated(q.DOMAIN_SUMMARY_QUERY, skip, limit)
+
+@router.get("/pipelines/flow")
+def pipeline_flow(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    return paginated(q.PIPELINE_FLOW_QUERY, skip, limit)
+
+@router.get("/pipelines/produces")
+def pipeline_produces(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    return paginated(q.PIPELINE_PRODUCES_QUERY, skip, limit)
+
+@router.get("/pipelines/execution-order")
+def pipeline_execution_order(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    return paginated(q.PIPELINE_EXECUTION_ORDER_QUERY, skip, limit)
+
+@router.get("/reports/quality-usage")
+def quality_usage_report(group_by: List[str] = Query(DIMENSIONS), top_n: int = Query(REPORT_TOP_N, ge=1, le=MAX_PAGE_SIZE)):
+    """Quality score and usage rollups by domain, subdomain, environment and/or owner."""
+    unknown = sorted(set(group_by) - set(DIMENSIONS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown group_by {unknown}; expected any of {DIMENSIONS}")
+    return report_cache.report(group_by, top_n)
@@ -0,0 +1,219 @@
+# Parameterized Cypher behind the direct REST endpoints (catalog_api.py).
+# These are the queries from kg-builder/query_examples.py, rewritten to take
+# parameters and to page with SKIP $skip LIMIT $limit.
+import re
+from functools import lru_cache
+
+DATAPRODUCTS_QUERY = """
+MATCH (dp:DataProduct)
+WHERE $domain IS NULL OR dp.domain = $domain
+RETURN dp.id AS id, dp.name AS name, dp.type AS type, dp.domain AS domain,
+       dp.subdomain AS subdomain, dp.destination AS destination, dp.schedule AS schedule
+ORDER BY dp.domain, dp.name
+SKIP $skip LIMIT $limit
+"""
+
+DATAPRODUCT_QUERY = """
+MATCH (dp:DataProduct {id: $id})
+OPTIONAL MATCH (dp)-[:OWNED_BY]->(owner:Owner)
+OPTIONAL MATCH (dp)-[:HAS_TAG]->(tag:Tag)
+OPTIONAL MATCH (p:Pipeline)-[:PRODUCES]->(dp)
+RETURN properties(dp) AS dataproduct,
+       properties(owner) AS owner,
+       collect(DISTINCT tag.name) AS tags,
+       collect(DISTINCT p.name) AS produced_by
+"""
+
+# Point-in-time views: DataProductVersion nodes written by kg-builder on every
+# create/update, each valid over [valid_from, valid_to). The latest version
+# starting at or before $at is a single seek on the (dataproduct_id, valid_from)
+# index however many revisions a product has. $at is passed as a datetime.
+DATAPRODUCT_AS_OF_QUERY = """
+MATCH (v:DataProductVersion)
+WHERE v.dataproduct_id = $id AND v.valid_from <= $at
+WITH v ORDER BY v.valid_from DESC LIMIT 1
+WHERE v.valid_to IS NULL OR v.valid_to > $at
+RETURN v {.*, valid_from: toString(v.valid_from), valid_to: toString(v.valid_to)} AS version
+"""
+
+DATAPRODUCT_VERSIONS_QUERY = """
+MATCH (v:DataProductVersion)
+WHERE v.dataproduct_id = $id AND v.valid_from IS NOT NULL
+RETURN v.version AS version, v.name AS name, toString(v.valid_from) AS valid_from,
+       toString(v.valid_to) AS valid_to, coalesce(v.deleted, false) AS deleted
+ORDER BY v.valid_from DESC
+SKIP $skip LIMIT $limit
+"""
+
+PIPELINE_FLOW_QUERY = """
+MATCH (p1:Pipeline)-[:TRIGGERS]->(p2:Pipeline)
+RETURN p1.name AS from_pipeline, p2.name AS to_pipeline
+ORDER BY p1.name, p2.name
+SKIP $skip LIMIT $limit
+"""
+
+PIPELINE_PRODUCES_QUERY = """
+MATCH (p:Pipeline)-[:PRODUCES]->(dp:DataProduct)
+RETURN p.name AS pipeline, dp.id AS dataproduct_id, dp.name AS dataproduct, dp.type AS type
+ORDER BY p.name, dp.name
+SKIP $skip LIMIT $limit
+"""
+
+PIPELINE_EXECUTION_ORDER_QUERY = """
+MATCH (p:Pipeline)
+OPTIONAL MATCH (p)-[:TRIGGERS]->(dependent:Pipeline)
+WITH p, count(dependent) AS dependencies
+RETURN p.name AS pipeline, dependencies
+ORDER BY dependencies ASC, pipeline
+SKIP $skip LIMIT $limit
+"""
+
+DEPENDENCIES_QUERY = """
+MATCH (dp1:DataProduct)-[:FEEDS_INTO]->(dp2:DataProduct)
+RETURN dp1.id AS source_id, dp1.name AS source, dp2.id AS target_id, dp2.name AS target,
+       dp1.domain AS source_domain, dp2.domain AS target_domain
+ORDER BY dp1.domain, dp1.name, dp2.name
+SKIP $skip LIMIT $limit
+"""
+
+DOMAIN_SUMMARY_QUERY = """
+MATCH (dp:DataProduct)
+OPTIONAL MATCH (dp)-[:FEEDS_INTO]->(other:DataProduct)
+WITH dp, count(DISTINCT CASE WHEN other.domain <> dp.domain THEN other END) AS cross_domain_feeds
+RETURN dp.domain AS domain, count(dp) AS dataproducts, collect(dp.name) AS names,
+       sum(cross_domain_feeds) AS cross_domain_feeds
+ORDER BY dataproducts DESC, domain
+SKIP $skip LIMIT $limit
+"""
+
+IMPACT_QUERY = """
+MATCH (dp:DataProduct {{id: $id}})
+OPTIONAL MATCH (dp)-[:FEEDS_INTO*1..{depth}]->(down:DataProduct)
+WITH dp, down ORDER BY down.name
+WITH dp, collect(DISTINCT down) AS downstream
+OPTIONAL MATCH (up:DataProduct)-[:FEEDS_INTO*1..{depth}]->(dp)
+WITH dp, downstream, collect(DISTINCT up) AS upstream
+RETURN dp.id AS id, dp.name AS name,
+       COUNT {{ (dp)-[:FEEDS_INTO]->(:DataProduct) }} AS direct_downstream,
+       COUNT {{ (:DataProduct)-[:FEEDS_INTO]->(dp) }} AS direct_upstream,
+       size(downstream) AS transitive_downstream,
+       size(upstream) AS transitive_upstream,
+       [n IN downstream | n.name][$skip..$skip + $limit] AS impacted_dataproducts,
+       reduce(domains = [], n IN downstream | CASE WHEN n.domain IN domains THEN domains ELSE domains + n.domain END) AS impacted_domains
+"""
+
+# Variable-length bounds cannot be parameters, so lineage queries are built
+# per (direction, depth) once and cached; depth is validated by the caller.
+LINEAGE_BRANCHES = {
+    "upstream": "WITH dp MATCH path = (other:DataProduct)-[:FEEDS_INTO*1..{depth}]->(dp)\n"
+                "  RETURN 'upstream' AS direction, other, length(path) AS hops",
+    "downstream": "WITH dp MATCH path = (dp)-[:FEEDS_INTO*1..{depth}]->(other:DataProduct)\n"
+                  "  RETURN 'downstream' AS direction, other, length(path) AS hops",
+}
+
+# Hits on tags, business terms and tables count towards the data products
+# that use them; a product's score is the sum of its hits' scores.
+SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score
+OPTIONAL MATCH (node)<-[:HAS_TAG|HAS_TERM|USES_TABLE]-(linked:DataProduct)
+WITH node, score, collect(linked) AS linked
+WITH node, score, CASE WHEN node:DataProduct THEN [node] ELSE linked END AS products
+UNWIND products AS dp
+WITH dp, sum(score) AS score,
+     collect(DISTINCT CASE WHEN node:DataProduct THEN 'DataProduct' ELSE labels(node)[0] + ':' + node.name END) AS matched_on
+RETURN dp.id AS id, dp.name AS name, dp.domain AS domain,
+       dp.short_description AS short_description, score, matched_on
+ORDER BY score DESC, name
+SKIP $skip LIMIT $limit
+"""
+
+LINEAGE_QUERY = """
+MATCH (dp:DataProduct {{id: $id}})
+CALL {{
+  {branches}
+}}
+WITH direction, other, min(hops) AS hops
+RETURN direction, other.id AS id, other.name AS name, other.domain AS domain, hops
+ORDER BY direction DESC, hops, name
+SKIP $skip LIMIT $limit
+"""
+
+# Column-level lineage: (Column)-[:DERIVES]->(Column) edges built from
+# field_lineage by kg-builder. Columns are looked up through the unique
+# Column.key constraint and PII seeds through the Column.pii index, so
+# traversals only touch the columns actually connected to the start.
+COLUMN_LINEAGE_BRANCHES = {
+    "upstream": "WITH c MATCH path = (other:Column)-[:DERIVES*1..{depth}]->(c)\n"
+                "  RETURN 'upstream' AS direction, other, length(path) AS hops",
+    "downstream": "WITH c MATCH path = (c)-[:DERIVES*1..{depth}]->(other:Column)\n"
+                  "  RETURN 'downstream' AS direction, other, length(path) AS hops",
+}
+
+COLUMN_LINEAGE_QUERY = """
+MATCH (c:Column {{key: $key}})
+CALL {{
+  {branches}
+}}
+WITH direction, other, min(hops) AS hops
+RETURN direction, other.key AS column, other.table AS table, coalesce(other.pii, false) AS pii, hops,
+       [(dp:DataProduct)-[:HAS_COLUMN]->(other) | dp.name] AS dataproducts
+ORDER BY direction DESC, hops, column
+SKIP $skip LIMIT $limit
+"""
+
+COLUMN_QUERY = """
+MATCH (c:Column {key: $key})
+RETURN c.key AS column, c.table AS table, c.name AS name, coalesce(c.pii, false) AS pii,
+       [(dp:DataProduct)-[:HAS_COLUMN]->(c) | dp.name] AS dataproducts
+"""
+
+# Every column derived from a PII column, with the nearest PII source.
+# flagged = false marks columns that carry PII without being declared as such.
+PII_PROPAGATION_QUERY = """
+MATCH (seed:Column {{pii: true}})
+WHERE $key IS NULL OR seed.key = $key
+MATCH path = (seed)-[:DERIVES*1..{depth}]->(derived:Column)
+WITH derived, seed, min(length(path)) AS hops
+WHERE NOT $unflagged_only OR NOT coalesce(derived.pii, false)
+RETURN seed.key AS pii_column, derived.key AS column, coalesce(derived.pii, false) AS flagged, hops,
+       [(dp:DataProduct)-[:HAS_COLUMN]->(derived) | dp.name] AS dataproducts
+ORDER BY flagged, pii_column, hops, column
+SKIP $skip LIMIT $limit
+"""
+
+@lru_cache(maxsize=None)
+def lineage_query(direction: str, depth: int) -> str:
+    """direction is "upstream", "downstream" or "both"."""
+    names = ["upstream", "downstream"] if direction == "both" else [direction]
+    branches = "\n  UNION ALL\n  ".join(LINEAGE_BRANCHES[name].format(depth=depth) for name in names)
+    return LINEAGE_QUERY.format(branches=branches)
+
+@lru_cache(maxsize=None)
+def column_lineage_query(direction: str, depth: int) -> str:
+    """direction is "upstream", "downstream" or "both"."""
+    names = ["upstream", "downstream"] if direction == "both" else [direction]
+    branches = "\n  UNION ALL\n  ".join(COLUMN_LINEAGE_BRANCHES[name].format(depth=depth) for name in names)
+    return COLUMN_LINEAGE_QUERY.format(branches=branches)
+
+@lru_cache(maxsize=None)
+def pii_propagation_query(depth: int) -> str:
+    return PII_PROPAGATION_QUERY.format(depth=depth)
+
+@lru_cache(maxsize=None)
+def impact_query(depth: int) -> str:
+    return IMPACT_QUERY.format(depth=depth)
+
+def fulltext_query(text: str) -> str:
+    """
+    Lucene query for free text: each word matches exactly (boosted), as a
+    prefix, and - from four letters on - within edit distance 1 (2 from seven
+    letters) to tolerate typos. Words are ORed; more matching words rank higher.
+    Only word characters are kept, so user input cannot inject query syntax.
+    """
+    clauses = []
+    for word in re.findall(r"\w+", text.lower()):
+        terms = [f"{word}^3", f"{word}*"]
+        if len(word) >= 4:
+            terms.append(f"{word}~{1 if len(word) < 7 else 2}")
+        clauses.append("(" + " OR ".join(terms) + ")")
+    return " ".join(clauses)
@@ -1,5 +1,6 @@
 
 import os
+import secrets
 from dotenv import load_dotenv
 
 # Load from .env file
@@ -16,5 +17,61 @@ LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL")
 if not all([NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD]):
     print("⚠️ Missing Neo4j config. Check your .env file!")
 
-if not all([LLM_BASE_URL, DSX_API_KEY, LLM_DEFAULT_MODEL]):
+if not all([LLM_BASE_URL, LLM_API_KEY, LLM_DEFAULT_MODEL]):
     print("⚠️ Missing LLM config. Check your .env file!")
+
+# How often (seconds) the live graph schema snapshot is re-introspected
+SCHEMA_REFRESH_SECONDS = int(os.getenv("SCHEMA_REFRESH_SECONDS", "300"))
+
+# Query execution limits (see graph.run_cypher_page)
+QUERY_FETCH_SIZE = int(os.getenv("QUERY_FETCH_SIZE", "500"))
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "200"))
+LLM_QUERY_ROW_CAP = int(os.getenv("LLM_QUERY_ROW_CAP", "10000"))
+QUERY_MEMORY_BUDGET_BYTES = int(os.getenv("QUERY_MEMORY_BUDGET_BYTES", str(16 * 1024 * 1024)))
+# Secret used to sign page tokens. Every worker must verify tokens issued by the
+# others, so it is required when several run; a single process may use a random one.
+PAGE_TOKEN_SECRET = os.getenv("PAGE_TOKEN_SECRET")
+if not PAGE_TOKEN_SECRET:
+    if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        raise RuntimeError("Set PAGE_TOKEN_SECRET when running several API workers")
+    PAGE_TOKEN_SECRET = secrets.token_hex(32)
+
+# Concurrent questions answered by /ask/batch (default and per-request maximum)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "32"))
+
+# Guard rails for LLM-generated Cypher (see cypher_guard.py)
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+CYPHER_MAX_PATH_DEPTH = int(os.getenv("CYPHER_MAX_PATH_DEPTH", "6"))
+CYPHER_MAX_ESTIMATED_ROWS = float(os.getenv("CYPHER_MAX_ESTIMATED_ROWS", "10000000"))
+
+# How often (seconds) the product/domain name index used by the intent router is refreshed
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+
+# Full-text index behind /search; created by kg-builder (fulltext_index in dataproduct_config.yaml)
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "dataproduct_discovery")
+
+# Quality/usage reports (see reports.py): how often (seconds) the graph is checked
+# for changes before the cached report frame is reused, the UsageStats attribute
+# that counts accesses, and how many most accessed products are listed
+REPORT_FINGERPRINT_CHECK_SECONDS = int(os.getenv("REPORT_FINGERPRINT_CHECK_SECONDS", "10"))
+REPORT_USAGE_FIELD = os.getenv("REPORT_USAGE_FIELD", "access_count")
+REPORT_TOP_N = int(os.getenv("REPORT_TOP_N", "10"))
+
+# Prefork mode (see shared_cache.py / gunicorn.conf.py): file holding the shared
+# read-mostly snapshot, how often the master checks the graph for changes, and
+# the age after which the snapshot is rebuilt even if no change was detected
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+SHARED_CACHE_POLL_SECONDS = int(os.getenv("SHARED_CACHE_POLL_SECONDS", "30"))
+SHARED_CACHE_MAX_AGE_SECONDS = int(os.getenv("SHARED_CACHE_MAX_AGE_SECONDS", "3600"))
+
+# Answer synthesis (see synthesis.py): approximate token budget for the result
+# context sent to the LLM, and how many most frequent values to keep per column
+# when the result has to be summarised to fit it
+ANSWER_TOKEN_BUDGET = int(os.getenv("ANSWER_TOKEN_BUDGET", "3000"))
+ANSWER_TOP_K = int(os.getenv("ANSWER_TOP_K", "5"))
+
+# Tracing (see tracing.py): how many of the slowest requests the slow-query log
+# keeps, and the duration above which a request is also logged as a warning
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "50"))
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "5000"))
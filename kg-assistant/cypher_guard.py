@@ -0,0 +1,103 @@
+"""
+Pre-flight checks for LLM-generated Cypher.
+
+Every generated query is EXPLAINed (planned, not executed) before it runs.
+The plan is rejected when it writes to the graph, contains a Cartesian
+product, or is estimated to produce an excessive number of rows. Unbounded
+variable-length expansions (`[*]`, `[:FEEDS_INTO*1..]`) are rewritten to a
+bounded depth and the rewritten query is planned again.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from config import CYPHER_MAX_PATH_DEPTH, CYPHER_MAX_ESTIMATED_ROWS
+from graph import explain_cypher
+
+
+class CypherRejected(Exception):
+    """Raised when generated Cypher fails the pre-flight checks."""
+
+    def __init__(self, cypher: str, reasons: List[str]):
+        super().__init__(f"Generated Cypher rejected: {'; '.join(reasons)}")
+        self.cypher = cypher
+        self.reasons = reasons
+
+
+# Relationship pattern with a variable-length quantifier, e.g. [:FEEDS_INTO*], [r*2..], [*..3]
+VAR_LENGTH_PATTERN = re.compile(r"(\[[^\[\]]*?\*)\s*(\d*)\s*(\.\.)?\s*(\d*)\s*(\])")
+
+
+def _is_unbounded(lower: str, dots: Optional[str], upper: str) -> bool:
+    if dots:
+        return not upper
+    # A bare "*" is unbounded; "*3" means exactly three hops
+    return not lower
+
+def bound_var_length_paths(cypher: str, max_depth: int = CYPHER_MAX_PATH_DEPTH) -> str:
+    """Gives every unbounded variable-length relationship pattern an upper bound of `max_depth`."""
+    def bound(match):
+        head, lower, dots, upper, tail = match.groups()
+        if not _is_unbounded(lower, dots, upper):
+            return match.group(0)
+        return f"{head}{lower}..{max(max_depth, int(lower or 1))}{tail}"
+    return VAR_LENGTH_PATTERN.sub(bound, cypher)
+
+def has_unbounded_var_length(cypher: str) -> bool:
+    return any(_is_unbounded(m.group(2), m.group(3), m.group(4)) for m in VAR_LENGTH_PATTERN.finditer(cypher))
+
+
+def _operator_name(plan: dict) -> str:
+    # Neo4j 5 suffixes operators with the runtime, e.g. "CartesianProduct@neo4j"
+    return plan.get("operatorType", "").split("@")[0]
+
+def _walk(plan: Optional[dict]):
+    if not plan:
+        return
+    yield plan
+    for child in plan.get("children", []):
+        yield from _walk(child)
+
+def plan_summary(plan: Optional[dict]) -> Dict:
+    """Operators used by a plan, its variable-length expansions and its estimated row count."""
+    operators, var_length_details = [], []
+    for op in _walk(plan):
+        name = _operator_name(op)
+        operators.append(name)
+        if "VarLengthExpand" in name:
+            var_length_details.append(str(op.get("args", {}).get("Details", "")))
+    estimated_rows = (plan or {}).get("args", {}).get("EstimatedRows")
+    return {"operators": operators, "var_length_details": var_length_details, "estimated_rows": estimated_rows}
+
+
+def check_cypher(cypher: str, params: Optional[dict] = None) -> Dict:
+    """
+    EXPLAINs `cypher` and decides whether it may run.
+
+    Returns {"cypher", "accepted", "rewritten", "reasons", "plan"}; `cypher` is the
+    query to execute, which differs from the input when unbounded paths were bounded.
+    """
+    rewritten = False
+    if has_unbounded_var_length(cypher):
+        cypher = bound_var_length_paths(cypher)
+        rewritten = True
+
+    reasons = []
+    try:
+        summary = explain_cypher(cypher, params)
+    except Exception as e:
+        return {"cypher": cypher, "accepted": False, "rewritten": rewritten,
+                "reasons": [f"Query does not compile: {e}"], "plan": None}
+
+    plan = plan_summary(summary.plan)
+    if summary.query_type != "r":
+        reasons.append(f"Query is not read-only (query type '{summary.query_type}')")
+    if "CartesianProduct" in plan["operators"]:
+        reasons.append("Plan contains a Cartesian product; connect the MATCH patterns or use WITH between them")
+    if any(has_unbounded_var_length(details) for details in plan["var_length_details"]):
+        reasons.append(f"Variable-length path without an upper bound; use at most *..{CYPHER_MAX_PATH_DEPTH}")
+    if plan["estimated_rows"] is not None and plan["estimated_rows"] > CYPHER_MAX_ESTIMATED_ROWS:
+        reasons.append(f"Plan is estimated to produce {int(plan['estimated_rows'])} rows; add filters or aggregation")
+
+    return {"cypher": cypher, "accepted": not reasons, "rewritten": rewritten,
+            "reasons": reasons, "plan": plan}
@@ -1,3 +1,14 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import SCHEMA_REFRESH_SECONDS
+from graph import read_session
+
+logger = logging.getLogger(__name__)
+
 # This is the schema that will be passed to the LLM for Cypher generation
 
 GRAPH_SCHEMA = """
@@ -28,7 +39,9 @@ Nodes:
   - Pipeline(name, <other attributes>)
   - Job(<attributes>)
   - FieldLineage(<attributes>)
+  - Column(key, table, name, pii)
   - ChangeLog(timestamp, field, old_value, new_value)
+  - DataProductVersion(dataproduct_id, version, valid_from, valid_to, deleted, relations, <DataProduct properties>)
 
 Relationships:
   - (DataProduct)-[:HAS_TAG]->(Tag)
@@ -56,8 +69,197 @@ Relationships:
   - (DataProduct)-[:HAS_PIPELINE]->(Pipeline)
   - (DataProduct)-[:HAS_JOB]->(Job)
   - (DataProduct)-[:HAS_FIELD_LINEAGE]->(FieldLineage)
+  - (DataProduct)-[:HAS_COLUMN]->(Column)
+  - (Column)-[:DERIVES {dataproduct_id, transformation}]->(Column)
   - (DataProduct)-[:FEEDS_INTO]->(DataProduct)
   - (Pipeline)-[:TRIGGERS]->(Pipeline)
   - (Pipeline)-[:PRODUCES]->(DataProduct)
   - (DataProduct)-[:HAS_CHANGE_LOG]->(ChangeLog)
-"""
\ No newline at end of file
+  - (DataProduct)-[:HAS_VERSION]->(DataProductVersion)
+  - (DataProduct)-[:CURRENT_VERSION]->(DataProductVersion)
+"""
+
+# ---------------------------------------------------------------------------
+# Live schema introspection
+# ---------------------------------------------------------------------------
+# GRAPH_SCHEMA above is kept as the fallback used when the graph cannot be
+# introspected. SchemaSnapshot reads labels, relationship types and property
+# keys from the running database and renders them in the same format, pruned
+# per question to the parts of the graph the question is likely to touch.
+
+NODE_PROPERTIES_QUERY = """
+CALL db.schema.nodeTypeProperties()
+YIELD nodeLabels, propertyName
+UNWIND nodeLabels AS label
+RETURN label, [p IN collect(DISTINCT propertyName) WHERE p IS NOT NULL] AS properties
+ORDER BY label
+"""
+
+# db.schema.visualization() is served from the counts store, so it is cheap
+# even on large graphs (it may over-approximate label combinations).
+RELATIONSHIP_PATTERNS_QUERY = """
+CALL db.schema.visualization()
+YIELD relationships
+UNWIND relationships AS rel
+RETURN DISTINCT startNode(rel).name AS from_label, type(rel) AS rel_type, endNode(rel).name AS to_label
+ORDER BY from_label, rel_type, to_label
+"""
+
+# Label every pruned schema keeps: it is the hub all other nodes hang off.
+CORE_LABELS = {"DataProduct"}
+
+# Words in a question that point at a label beyond its own name.
+LABEL_KEYWORDS: Dict[str, List[str]] = {
+    "DataProduct": ["product", "dataset", "domain", "subdomain", "environment", "schedule", "feed", "depend", "upstream", "downstream", "lineage", "impact"],
+    "Tag": ["tag", "tagged", "label"],
+    "BusinessTerm": ["term", "business"],
+    "Glossary": ["glossary"],
+    "KnownIssue": ["issue", "bug", "problem"],
+    "Documentation": ["doc", "documentation", "link"],
+    "FAQ": ["faq", "question"],
+    "Query": ["query", "queries", "sql", "sample"],
+    "Table": ["table"],
+    "PIIField": ["pii", "personal", "sensitive"],
+    "Owner": ["owner", "own", "owns", "owned", "responsible", "contact"],
+    "Manager": ["manager", "managed"],
+    "Metrics": ["metric", "kpi"],
+    "DataQuality": ["quality", "completeness", "freshness", "accuracy"],
+    "Classification": ["classification", "classified", "confidential", "internal", "public"],
+    "UsageStats": ["usage", "used", "access", "accessed", "popular"],
+    "Team": ["team"],
+    "AccessControl": ["access", "permission", "role"],
+    "Database": ["database", "db", "stored", "host"],
+    "Schema": ["schema", "column"],
+    "Steward": ["steward", "stewarded", "responsible"],
+    "Consumer": ["consumer", "consumed", "consume"],
+    "Policy": ["policy", "policies", "retention", "compliance"],
+    "Pipeline": ["pipeline", "trigger", "triggers", "produce", "produces", "execution", "run"],
+    "Job": ["job"],
+    "FieldLineage": ["field", "column", "lineage"],
+    "Column": ["column", "field", "derive", "derived", "lineage", "pii"],
+    "ChangeLog": ["change", "changed", "history", "updated", "modified"],
+    "DataProductVersion": ["version", "history", "previously", "snapshot", "quarter"],
+}
+
+
+def _words(text: str) -> Set[str]:
+    """Lower-case word set of `text`, with a naive plural strip."""
+    words = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        words.add(word)
+        if len(word) > 3 and word.endswith("s"):
+            words.add(word[:-1])
+    return words
+
+
+def _label_words(label: str) -> Set[str]:
+    """Words of a CamelCase label, e.g. BusinessTerm -> {business, term}."""
+    return _words(" ".join(re.findall(r"[A-Z]+[a-z0-9]*", label)))
+
+
+class SchemaSnapshot:
+    """
+    Cached snapshot of the live graph schema.
+
+    The snapshot is refreshed in the background once it is older than
+    `ttl` seconds; callers keep using the previous snapshot meanwhile.
+    """
+
+    def __init__(self, ttl: int = SCHEMA_REFRESH_SECONDS):
+        self.ttl = ttl
+        self.node_properties: Dict[str, List[str]] = {}
+        self.relationships: List[Tuple[str, str, str]] = []
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        """True once the snapshot holds any labels (an empty graph renders GRAPH_SCHEMA)."""
+        return bool(self.node_properties)
+
+    @property
+    def introspected(self) -> bool:
+        """True once introspection has succeeded, even if the graph was empty."""
+        return bool(self.loaded_at)
+
+    def refresh(self) -> None:
+        """Introspect the database and replace the snapshot."""
+        with read_session() as session:
+            node_properties = {
+                row["label"]: sorted(row["properties"])
+                for row in session.run(NODE_PROPERTIES_QUERY)
+            }
+            relationships = [
+                (row["from_label"], row["rel_type"], row["to_label"])
+                for row in session.run(RELATIONSHIP_PATTERNS_QUERY)
+            ]
+        self.load(node_properties, relationships)
+        logger.info("Schema snapshot refreshed: %d labels, %d relationship patterns", len(node_properties), len(relationships))
+
+    def load(self, node_properties: Dict[str, List[str]], relationships: List[Tuple[str, str, str]]) -> None:
+        """Replace the snapshot with already-introspected data (e.g. from shared_cache)."""
+        self.node_properties = node_properties
+        self.relationships = [tuple(rel) for rel in relationships]
+        self.loaded_at = time.time()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Schema introspection failed, keeping previous snapshot: %s", e)
+        finally:
+            self._refreshing = False
+
+    def ensure_fresh(self) -> None:
+        """Load the snapshot if missing, refresh it in the background if stale."""
+        if not self.introspected:
+            with self._lock:
+                if not self.introspected:
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        logger.error("Schema introspection failed, using static GRAPH_SCHEMA: %s", e)
+            return
+        if time.time() - self.loaded_at < self.ttl:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def render(self, labels: Optional[Set[str]] = None) -> str:
+        """Render the snapshot (restricted to `labels` if given) in GRAPH_SCHEMA format."""
+        if not self.loaded:
+            return GRAPH_SCHEMA
+        lines = ["", "Nodes:"]
+        for label, properties in self.node_properties.items():
+            if labels is None or label in labels:
+                lines.append(f"  - {label}({', '.join(properties)})")
+        lines.append("")
+        lines.append("Relationships:")
+        for from_label, rel_type, to_label in self.relationships:
+            if labels is None or (from_label in labels and to_label in labels):
+                lines.append(f"  - ({from_label})-[:{rel_type}]->({to_label})")
+        return "\n".join(lines) + "\n"
+
+    def relevant_labels(self, question: str) -> Set[str]:
+        """Labels a question is likely to need, always including CORE_LABELS."""
+        words = _words(question)
+        selected = set(CORE_LABELS)
+        for label in self.node_properties:
+            keywords = _label_words(label) | set(LABEL_KEYWORDS.get(label, []))
+            if words & keywords:
+                selected.add(label)
+        for from_label, rel_type, to_label in self.relationships:
+            if words & _words(rel_type.replace("_", " ")) - {"has", "in", "by", "of"}:
+                selected.update((from_label, to_label))
+        return selected
+
+    def prune(self, question: str) -> str:
+        """Schema text for `question`, limited to the labels it likely touches."""
+        self.ensure_fresh()
+        if not self.loaded:
+            return GRAPH_SCHEMA
+        return self.render(self.relevant_labels(question))
@@ -1,9 +1,58 @@
-from neo4j import GraphDatabase
-from config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from neo4j import GraphDatabase, Query, READ_ACCESS
+from config import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+    QUERY_FETCH_SIZE, QUERY_PAGE_SIZE, QUERY_MEMORY_BUDGET_BYTES, PAGE_TOKEN_SECRET,
+    QUERY_TIMEOUT_SECONDS
+)
 
+import base64
+import hashlib
+import hmac
+import json
 import re
+import threading
+from typing import Iterator, Optional
+
+from tracing import current_trace, span
+
+# The driver (and its connection pool) is created on first use or by init_driver()
+# at API startup, never at import time.
+driver = None
+_driver_lock = threading.Lock()
+
+# Queries executed (EXPLAIN excluded) since startup, reported by /stats/db; traced
+# requests also count their own executions in trace.attrs["db_executions"]
+db_executions = {"total": 0}
+
+
+class ResultTooLarge(Exception):
+    """Raised when a query result exceeds the per-request memory budget."""
+
+
+class InvalidPageToken(ValueError):
+    """Raised when a page token is malformed or was not issued by this service."""
+
+
+def get_driver():
+    """Returns the shared Neo4j driver, creating it on first use."""
+    global driver
+    if driver is None:
+        with _driver_lock:
+            if driver is None:
+                driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    return driver
+
+def init_driver() -> None:
+    """Creates the driver and verifies connectivity, opening the first pooled connection."""
+    get_driver().verify_connectivity()
+
+def close_driver() -> None:
+    global driver
+    with _driver_lock:
+        if driver is not None:
+            driver.close()
+            driver = None
 
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
 def clean_cypher_query(cypher_query: str) -> str:
     """
@@ -12,11 +61,244 @@ def clean_cypher_query(cypher_query: str) -> str:
     # Remove triple backticks and any leading/trailing whitespace
     return re.sub(r"```+", "", cypher_query).strip()
 
-def run_cypher(cypher_query: str) -> list:
+def extract_cypher_query(response: str) -> str:
+    response = re.sub(r'`+', '', response)
+    response = response.strip()
+    cypher_keywords = (
+        "MATCH", "RETURN", "WITH", "WHERE", "CREATE", "MERGE", "OPTIONAL", "UNWIND",
+        "CALL", "SET", "DELETE", "DETACH", "ORDER", "SKIP", "LIMIT", "REMOVE",
+        "FOREACH", "LOAD", "USING", "UNION"
+    )
+    lines = response.splitlines()
+    start_idx = None
+    for i, line in enumerate(lines):
+        if line.strip().upper().startswith(cypher_keywords):
+            start_idx = i
+            break
+    if start_idx is not None:
+        cypher_lines = []
+        for line in lines[start_idx:]:
+            stripped = line.strip()
+            if not stripped:
+                break
+            if (stripped.upper().startswith(cypher_keywords) or line.startswith("    ") or line.startswith("\t")):
+                cypher_lines.append(line)
+            else:
+                break
+        cypher = "\n".join(cypher_lines).strip()
+        cypher = cypher.rstrip(';').strip()
+        cypher = re.sub(r'`+', '', cypher).strip()
+        return cypher
+    for line in lines:
+        if line.strip().upper().startswith(cypher_keywords):
+            return re.sub(r'`+', '', line.strip())
+    return re.sub(r'`+', '', response.strip())
+
+def read_session(fetch_size: int = QUERY_FETCH_SIZE):
+    """Session in read access mode: the server rejects any write attempted through it."""
+    return get_driver().session(default_access_mode=READ_ACCESS, fetch_size=fetch_size)
+
+def timed_query(cypher_query: str) -> Query:
+    """Wraps a query with the server-side transaction timeout."""
+    return Query(cypher_query, timeout=QUERY_TIMEOUT_SECONDS)
+
+def explain_cypher(cypher_query: str, params: Optional[dict] = None):
     """
-    Executes a Cypher query against Neo4j and returns results.
+    Runs EXPLAIN for a Cypher query and returns the result summary
+    (query_type and plan) without executing the query.
+    """
+    cleaned_query = clean_cypher_query(cypher_query).rstrip(";")
+    with span("neo4j_explain"), read_session() as session:
+        return session.run(timed_query(f"EXPLAIN {cleaned_query}"), params or {}).consume()
+
+def count_execution() -> None:
+    db_executions["total"] += 1
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attrs["db_executions"] = trace.attrs.get("db_executions", 0) + 1
+
+def server_ms(summary) -> Optional[int]:
+    """Time the server spent producing and streaming a result, from its summary."""
+    if summary.result_available_after is None:
+        return None
+    return summary.result_available_after + (summary.result_consumed_after or 0)
+
+def row_size(row: dict) -> int:
+    """Approximate in-memory footprint of a result row, in bytes of its JSON form."""
+    return len(json.dumps(row, default=str))
+
+def run_cypher(cypher_query: str, params: Optional[dict] = None, max_rows: Optional[int] = None,
+               memory_budget: int = QUERY_MEMORY_BUDGET_BYTES, as_records: bool = False) -> list:
+    """
+    Executes a read-only Cypher query against Neo4j and returns results: dicts, or
+    with `as_records` the neo4j.Record objects (as neo4j_graphrag's RawSearchResult requires).
+    Stops after `max_rows` rows and raises ResultTooLarge past `memory_budget` bytes.
     """
     cleaned_query = clean_cypher_query(cypher_query)
-    with driver.session() as session:
-        result = session.run(cleaned_query)
-        return [record.data() for record in result]
\ No newline at end of file
+    rows, used = [], 0
+    with span("neo4j_query") as attrs, read_session() as session:
+        count_execution()
+        result = session.run(timed_query(cleaned_query), params or {})
+        for record in result:
+            if max_rows is not None and len(rows) >= max_rows:
+                break
+            row = record.data()
+            used += row_size(row)
+            if used > memory_budget:
+                raise ResultTooLarge(f"Query result exceeds memory budget of {memory_budget} bytes; use run_cypher_page")
+            rows.append(record if as_records else row)
+        # Discard anything still buffered on the server
+        summary = result.consume()
+        attrs.update(rows=len(rows), bytes=used, server_ms=server_ms(summary))
+    return rows
+
+
+def stream_cypher(cypher_query: str, params: Optional[dict] = None, fetch_size: int = QUERY_FETCH_SIZE,
+                  max_rows: Optional[int] = None) -> Iterator[dict]:
+    """
+    Executes a Cypher query and yields result rows as Neo4j streams them,
+    without materializing the full result set. Stops after `max_rows` rows.
+    """
+    cleaned_query = clean_cypher_query(cypher_query)
+    with span("neo4j_stream") as attrs, read_session(fetch_size) as session:
+        count_execution()
+        result = session.run(timed_query(cleaned_query), params or {})
+        attrs["rows"] = 0
+        for count, record in enumerate(result):
+            if max_rows is not None and count >= max_rows:
+                break
+            attrs["rows"] = count + 1
+            yield record.data()
+        result.consume()
+
+
+# ---------------------------------------------------------------------------
+# Paginated execution
+# ---------------------------------------------------------------------------
+# A page token carries the query, its parameters, the offset of the next page
+# and the total row cap, signed so clients cannot use it to run other Cypher.
+# Each page pushes its window into the query: SKIP/LIMIT are appended to the
+# final RETURN (folded into any SKIP/LIMIT the query already ends with), so the
+# server skips earlier rows and stops after one page plus one look-ahead row.
+# Wrapping the query in CALL { ... } instead would reject generated Cypher whose
+# RETURN expressions are unaliased. Page boundaries are as stable as the query's
+# ORDER BY. Queries that do not end in a top-level RETURN (UNION, bare
+# procedure calls) are served as a single page.
+
+_PAGE_TAIL = re.compile(r"(?is)^(?P<body>.*?)(?:\s+SKIP\s+(?P<skip>\$\w+|\d+))?"
+                        r"(?:\s+LIMIT\s+(?P<limit>\$\w+|\d+))?\s*$")
+
+def _final_return_at_top_level(cypher_query: str) -> bool:
+    """True if the query's last RETURN is its final clause, outside any subquery or UNION."""
+    if re.search(r"(?i)\bUNION\b", cypher_query):
+        return False
+    returns = list(re.finditer(r"(?i)\bRETURN\b", cypher_query))
+    if not returns:
+        return False
+    before = cypher_query[:returns[-1].start()]
+    return before.count("{") == before.count("}")
+
+def _resolve_bound(bound: Optional[str], params: dict) -> Optional[int]:
+    if bound is None:
+        return None
+    value = params.get(bound[1:]) if bound.startswith("$") else int(bound)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"Unsupported SKIP/LIMIT value: {bound}")
+    return value
+
+def page_window(cypher_query: str, params: dict, offset: int, fetch: int) -> Optional[tuple]:
+    """
+    (query, params) fetching at most `fetch` rows starting `offset` rows into the
+    result, or None if the query cannot be windowed on the server.
+    """
+    if not _final_return_at_top_level(cypher_query):
+        return None
+    tail = _PAGE_TAIL.match(cypher_query)
+    try:
+        skip = _resolve_bound(tail.group("skip"), params) or 0
+        limit = _resolve_bound(tail.group("limit"), params)
+    except ValueError:
+        return None
+    if limit is not None:
+        fetch = max(0, min(fetch, limit - offset))
+    query = f"{tail.group('body')}\nSKIP $__page_skip LIMIT $__page_limit"
+    return query, dict(params, __page_skip=skip + offset, __page_limit=fetch)
+
+def encode_page_token(cypher_query: str, params: Optional[dict], offset: int, max_rows: Optional[int]) -> str:
+    body = json.dumps({"q": cypher_query, "p": params or {}, "o": offset, "c": max_rows},
+                      separators=(",", ":"), default=str).encode("utf-8")
+    signature = hmac.new(PAGE_TOKEN_SECRET.encode("utf-8"), body, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(signature + body).decode("ascii")
+
+def decode_page_token(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token.encode("ascii"))
+    except Exception:
+        raise InvalidPageToken("Malformed page token")
+    signature, body = raw[:16], raw[16:]
+    expected = hmac.new(PAGE_TOKEN_SECRET.encode("utf-8"), body, hashlib.sha256).digest()[:16]
+    if not hmac.compare_digest(signature, expected):
+        raise InvalidPageToken("Page token signature mismatch")
+    return json.loads(body)
+
+def can_page(cypher_query: str, params: Optional[dict] = None) -> bool:
+    """True if pages after the first can be fetched for the query (see page_window)."""
+    return page_window(clean_cypher_query(cypher_query).rstrip(";"), params or {}, 0, 1) is not None
+
+def run_cypher_page(cypher_query: str, params: Optional[dict] = None, page_size: int = QUERY_PAGE_SIZE,
+                    offset: int = 0, max_rows: Optional[int] = None,
+                    memory_budget: int = QUERY_MEMORY_BUDGET_BYTES, columnar: bool = False) -> dict:
+    """
+    Executes one page of a Cypher query.
+
+    Returns {"columns", "rows", "next_page_token", "truncated"}: `next_page_token` is
+    None on the last page, and `truncated` is True when `max_rows` cut the result
+    short, or when the query cannot be windowed and had more than one page. A page
+    also ends early once its rows exceed `memory_budget` bytes; the remaining rows
+    are served by the next page. Rows are dicts, or with `columnar`
+    lists of raw values (Neo4j nodes, relationships and temporal types included)
+    in `columns` order, for result_format.
+    """
+    cleaned_query = clean_cypher_query(cypher_query).rstrip(";")
+    limit = page_size
+    if max_rows is not None:
+        limit = max(0, min(page_size, max_rows - offset))
+
+    columns, rows, used, has_more = [], [], 0, False
+    window = page_window(cleaned_query, params or {}, offset, limit + 1)
+    single_page = window is None
+    if single_page:
+        if offset > 0:
+            raise InvalidPageToken("Query cannot be paged past its first page")
+        window = cleaned_query, params or {}
+    if limit > 0:
+        query, query_params = window
+        with span("neo4j_page", offset=offset) as attrs, read_session(min(QUERY_FETCH_SIZE, limit + 1)) as session:
+            count_execution()
+            result = session.run(timed_query(query), query_params)
+            columns = list(result.keys())
+            for record in result:
+                if len(rows) >= limit:
+                    has_more = True
+                    break
+                row = record.values() if columnar else record.data()
+                used += row_size(row)
+                if used > memory_budget and rows:
+                    has_more = True
+                    break
+                rows.append(row)
+            summary = result.consume()
+            attrs.update(rows=len(rows), bytes=used, server_ms=server_ms(summary))
+
+    next_offset = offset + len(rows)
+    truncated = has_more and (single_page or max_rows is not None and next_offset >= max_rows)
+    next_page_token = None
+    if has_more and not truncated:
+        next_page_token = encode_page_token(cypher_query, params, next_offset, max_rows)
+    return {"columns": columns, "rows": rows, "next_page_token": next_page_token, "truncated": truncated}
+
+def run_cypher_next_page(page_token: str, page_size: int = QUERY_PAGE_SIZE, columnar: bool = False) -> dict:
+    """Fetches the page identified by a token returned from run_cypher_page."""
+    state = decode_page_token(page_token)
+    return run_cypher_page(state["q"], params=state["p"], page_size=page_size,
+                           offset=state["o"], max_rows=state["c"], columnar=columnar)
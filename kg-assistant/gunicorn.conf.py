@@ -0,0 +1,38 @@
+# Prefork deployment with shared read-only caches:
+#
+#   SHARED_CACHE_PATH=/dev/shm/dpkg-shared-cache.bin PAGE_TOKEN_SECRET=... \
+#       gunicorn -c gunicorn.conf.py api_server:app
+#
+# The master builds the shared snapshot (schema, catalog index, lineage
+# adjacency) once, preloads the app so workers inherit it copy-on-write, and
+# republishes it when the graph changes (see shared_cache.py).
+import multiprocessing
+import os
+
+from config import SHARED_CACHE_PATH
+from shared_cache import Publisher
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+if not SHARED_CACHE_PATH:
+    raise RuntimeError("Set SHARED_CACHE_PATH to run the API in prefork mode")
+# Page tokens issued by one worker are redeemed by any other
+if workers > 1 and not os.getenv("PAGE_TOKEN_SECRET"):
+    raise RuntimeError("Set PAGE_TOKEN_SECRET to run the API with several workers")
+
+# Gunicorn preloads the app before calling on_starting, so the first snapshot
+# has to be published while this config file is loaded for api_server to pick
+# it up before the workers are forked.
+publisher = Publisher(SHARED_CACHE_PATH)
+publisher.rebuild()
+
+
+def when_ready(server):
+    publisher.start()
+
+
+def on_exit(server):
+    publisher.stop()
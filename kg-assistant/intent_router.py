@@ -0,0 +1,251 @@
+"""
+Deterministic fast path for the most common /ask intents.
+
+Questions matching one of INTENTS are answered with a parameterized Cypher
+query (mostly the ones in CYPHER_EXAMPLES) without calling the LLM. Product
+and domain names are recognised against a cached index of the live catalog.
+Anything that does not match falls through to Text2Cypher.
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import CATALOG_REFRESH_SECONDS, CYPHER_MAX_PATH_DEPTH
+from graph import read_session
+
+logger = logging.getLogger(__name__)
+
+CATALOG_QUERY = """
+MATCH (dp:DataProduct)
+RETURN collect(DISTINCT dp.name) AS names, collect(DISTINCT dp.domain) AS domains
+"""
+
+# Words around an entity that are not part of its name: "the Sales domain", "RawSalesData data product"
+ENTITY_NOISE = re.compile(r"^(the|our)\s+|\s+(data ?products?|products?|domain|dataset)$", re.IGNORECASE)
+
+
+def _key(text: str) -> str:
+    """Lookup key ignoring case, spaces and punctuation: 'Raw customer-data' -> 'rawcustomerdata'."""
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+class CatalogIndex:
+    """Cached lookup tables of DataProduct names and domains, refreshed every `ttl` seconds."""
+
+    def __init__(self, ttl: int = CATALOG_REFRESH_SECONDS):
+        self.ttl = ttl
+        self.products: Dict[str, str] = {}
+        self.domains: Dict[str, str] = {}
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def refresh(self) -> None:
+        with read_session() as session:
+            row = session.run(CATALOG_QUERY).single()
+        self.load(row["names"], row["domains"])
+
+    def load(self, names: List[str], domains: List[str]) -> None:
+        self.products = {_key(name): name for name in names if name}
+        self.domains = {_key(domain): domain for domain in domains if domain}
+        self.loaded_at = time.time()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error("Catalog index refresh failed, keeping previous index: %s", e)
+        finally:
+            self._refreshing = False
+
+    def ensure_fresh(self) -> None:
+        if not self.loaded_at:
+            with self._lock:
+                if not self.loaded_at:
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        logger.error("Catalog index load failed: %s", e)
+            return
+        if time.time() - self.loaded_at < self.ttl:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def resolve(self, kind: str, text: str) -> Optional[str]:
+        """Canonical product or domain name written as `text` in a question, if it exists."""
+        table = self.products if kind == "product" else self.domains
+        text = ENTITY_NOISE.sub("", text.strip())
+        return table.get(_key(text))
+
+
+class Intent:
+    """
+    A family of question phrasings answered by one parameterized Cypher query.
+    Each pattern must match the whole question; named groups (?P<product>...)
+    and (?P<domain>...) must resolve against the catalog for the intent to apply.
+    """
+
+    def __init__(self, name: str, patterns: List[str], cypher: str,
+                 answer: Optional[Callable[[list, dict], str]] = None):
+        self.name = name
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.cypher = cypher
+        self.answer = answer
+
+
+UPSTREAM_QUERY = f"""
+MATCH path = (up:DataProduct)-[:FEEDS_INTO*1..{CYPHER_MAX_PATH_DEPTH}]->(dp:DataProduct {{name: $product}})
+RETURN up.name AS UpstreamDataProduct, up.domain AS Domain, min(length(path)) AS Hops
+ORDER BY Hops, UpstreamDataProduct
+"""
+
+DOWNSTREAM_QUERY = f"""
+MATCH path = (dp:DataProduct {{name: $product}})-[:FEEDS_INTO*1..{CYPHER_MAX_PATH_DEPTH}]->(down:DataProduct)
+RETURN down.name AS DownstreamDataProduct, down.domain AS Domain, min(length(path)) AS Hops
+ORDER BY Hops, DownstreamDataProduct
+"""
+
+_DP = r"(data ?)?products?"
+
+INTENTS: List[Intent] = [
+    Intent(
+        "count_products",
+        [rf"how many {_DP}( are there| exist| do we have)?( in total)?",
+         rf"(count|what is the (total )?number of|total number of)( all)?( the)? {_DP}"],
+        "MATCH (dp:DataProduct)\nRETURN count(dp) AS DataProductCount",
+        answer=lambda rows, p: f"There are {rows[0]['DataProductCount']} data products."
+    ),
+    Intent(
+        "count_products_in_domain",
+        [rf"how many {_DP}( are there| exist| do we have)? (are )?(in|for|under) (?P<domain>.+)"],
+        "MATCH (dp:DataProduct) WHERE dp.domain = $domain\nRETURN count(dp) AS DataProductCount",
+        answer=lambda rows, p: f"There are {rows[0]['DataProductCount']} data products in the {p['domain']} domain."
+    ),
+    Intent(
+        "products_by_domain_summary",
+        [rf"(group|count|show|list)( all)?( the)? {_DP} (grouped )?by domains?( with counts)?",
+         rf"{_DP} per domain",
+         rf"how many {_DP} (are there )?(in each|per) domain"],
+        "MATCH (dp:DataProduct)\n"
+        "RETURN dp.domain AS Domain, count(dp) AS DataProductCount, collect(dp.name) AS DataProducts\n"
+        "ORDER BY DataProductCount DESC"
+    ),
+    Intent(
+        "products_in_domain",
+        [rf"(list|show|get|which|what)( me)?( are)?( all)?( the)? {_DP} (are )?(in|for|from|under) (?P<domain>.+)"],
+        "MATCH (dp:DataProduct) WHERE dp.domain = $domain\n"
+        "RETURN dp.name AS Name, dp.type AS Type, dp.subdomain AS Subdomain, dp.schedule AS Schedule\n"
+        "ORDER BY dp.name",
+        answer=lambda rows, p: f"The {p['domain']} domain has {len(rows)} data product(s)."
+    ),
+    Intent(
+        "list_products",
+        [rf"(list|show|get)( me)? all( the)? {_DP}( with their basic information)?",
+         rf"what {_DP} (are there|exist|do we have)"],
+        "MATCH (dp:DataProduct)\n"
+        "RETURN dp.name AS Name, dp.type AS Type, dp.domain AS Domain, dp.subdomain AS Subdomain, "
+        "dp.destination AS Destination, dp.schedule AS Schedule\n"
+        "ORDER BY dp.domain, dp.name"
+    ),
+    Intent(
+        "owner_of_product",
+        [r"who (owns|is the owner of|is responsible for|manages|stewards) (?P<product>.+)",
+         r"((who|what) (is|are) )?the (owners? and stewards?|owners?|stewards?) (of|for) (?P<product>.+)",
+         r"(owners? and stewards?|owners?|stewards?) (of|for) (?P<product>.+)"],
+        "MATCH (dp:DataProduct {name: $product})\n"
+        "OPTIONAL MATCH (dp)-[:OWNED_BY]->(owner:Owner)\n"
+        "OPTIONAL MATCH (dp)-[:STEWARDED_BY]->(steward:Steward)\n"
+        "RETURN dp.name AS DataProduct, owner.name AS Owner, owner.email AS OwnerEmail, collect(DISTINCT steward.name) AS Stewards"
+    ),
+    Intent(
+        "owners_and_stewards",
+        [rf"(show|list|get)( all)?( the)? {_DP} with (their )?owners( and stewards)?",
+         rf"who owns (each|every|all)( the)? {_DP}",
+         r"(show|list|get)( all)?( the)? owners( and stewards)?"],
+        "MATCH (dp:DataProduct)-[:OWNED_BY]->(owner:Owner)\n"
+        "OPTIONAL MATCH (dp)-[:STEWARDED_BY]->(steward:Steward)\n"
+        "RETURN dp.name AS DataProduct, owner.name AS Owner, collect(DISTINCT steward.name) AS Stewards\n"
+        "ORDER BY dp.name"
+    ),
+    Intent(
+        "upstream_of_product",
+        [rf"(what|which)( {_DP})? (feeds? into|flows? into|(is|are) upstream of|feeds?) (?P<product>.+)",
+         r"((show|list|get|what is|what are) )?(the )?upstream( data products| products| dependencies| lineage| sources)? (of|for) (?P<product>.+)",
+         r"(where does|what does) (?P<product>.+) (come from|depend on)"],
+        UPSTREAM_QUERY,
+        answer=lambda rows, p: f"{p['product']} has {len(rows)} upstream data product(s)."
+    ),
+    Intent(
+        "downstream_of_product",
+        [rf"(what|which)( {_DP})? (does|do) (?P<product>.+) feed( into)?",
+         r"((show|list|get|what is|what are) )?(the )?(downstream|impact)( data products| products| dependencies| consumers| analysis)? (of|for) (?P<product>.+)",
+         rf"(what|which)( {_DP})? (is|are|would be) (impacted|affected) (by|if) (?P<product>.+?)( changes| fails| breaks)?",
+         rf"(what|which)( {_DP})? depends? on (?P<product>.+)"],
+        DOWNSTREAM_QUERY,
+        answer=lambda rows, p: f"{p['product']} feeds {len(rows)} downstream data product(s)."
+    ),
+    Intent(
+        "pipeline_flow",
+        [r"(show |list |get )?(the )?(complete )?pipeline (flow|triggers)( with triggers)?",
+         r"(which|what) pipelines trigger (which|other|each other)( pipelines)?"],
+        "MATCH (p1:Pipeline)-[r:TRIGGERS]->(p2:Pipeline)\n"
+        "RETURN p1.name AS FromPipeline, p2.name AS ToPipeline, type(r) AS Relationship\n"
+        "ORDER BY p1.name, p2.name"
+    ),
+]
+
+
+class IntentRouter:
+    """Maps questions to INTENTS, keeping hit/miss counts per intent."""
+
+    def __init__(self, catalog: CatalogIndex, intents: List[Intent] = INTENTS):
+        self.catalog = catalog
+        self.intents = intents
+        self.hits: Dict[str, int] = {intent.name: 0 for intent in intents}
+        self.misses = 0
+        self.route_time_ms = 0.0
+
+    def _match(self, question: str) -> Optional[Dict]:
+        for intent in self.intents:
+            for pattern in intent.patterns:
+                match = pattern.fullmatch(question)
+                if not match:
+                    continue
+                params = {}
+                for kind, text in match.groupdict().items():
+                    if kind in ("product", "domain") and text:
+                        params[kind] = self.catalog.resolve(kind, text)
+                if all(params.values()):
+                    return {"intent": intent.name, "cypher": intent.cypher, "params": params, "answer": intent.answer}
+        return None
+
+    def route(self, question: str) -> Optional[Dict]:
+        """Returns {"intent", "cypher", "params", "answer"} for a known intent, else None."""
+        started = time.perf_counter()
+        self.catalog.ensure_fresh()
+        route = self._match(" ".join(question.split()).rstrip("?.! "))
+        if route:
+            self.hits[route["intent"]] += 1
+        else:
+            self.misses += 1
+        self.route_time_ms += (time.perf_counter() - started) * 1000
+        return route
+
+    def stats(self) -> Dict:
+        routed = sum(self.hits.values())
+        total = routed + self.misses
+        return {
+            "questions": total,
+            "routed": routed,
+            "fallback_to_llm": self.misses,
+            "hit_rate": round(routed / total, 3) if total else None,
+            "avg_route_ms": round(self.route_time_ms / total, 4) if total else None,
+            "hits_by_intent": self.hits,
+        }
@@ -1,129 +1,493 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional
+from collections import deque
+import asyncio
+import concurrent.futures
+import contextvars
 import logging
 import os
 import json
+import random
+import time
 import aiohttp
+from neo4j_graphrag.llm import LLMInterface
+from neo4j_graphrag.llm.types import LLMResponse
 from pydantic import Field, PrivateAttr
 from urllib.parse import urljoin
 
 from utils.types import BaseTool
+from tracing import span, token_counts
 
 logger = logging.getLogger(__name__)
 
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LazyJson:
+    """Defers json.dumps until a log record is actually emitted."""
+
+    def __init__(self, data: Any):
+        self.data = data
+
+    def __str__(self) -> str:
+        return json.dumps(self.data, indent=2, default=str)
+
+
+class RetryableStatus(RuntimeError):
+    """Non-200 response that may succeed on retry."""
+
+    def __init__(self, status: int, text: str, retry_after: Optional[float] = None):
+        super().__init__(f"XsAI API error: {status}, {text}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the LLM while the circuit breaker is open."""
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """True for errors that mean the endpoint is unhealthy: 5xx, timeouts and connection errors."""
+    if isinstance(error, RetryableStatus):
+        return error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive endpoint failures (see
+    is_endpoint_failure) and rejects calls for `reset_seconds`; then lets one
+    trial call through (half-open) and closes again if it succeeds. 4xx
+    responses and calls abandoned by the caller neither count as failures
+    nor reset the count.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError("LLM circuit breaker is open; not calling XsAI API")
+        if state == "half-open":
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_ignored(self) -> None:
+        """A call that says nothing about the endpoint's health; frees the half-open trial."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class EndpointMetrics:
+    """Request, error, retry and latency counters for one LLM endpoint."""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        # Hedges not sent because hedge_max_in_flight were already outstanding
+        self.hedges_skipped = 0
+        self.latencies_ms = deque(maxlen=window)
+
+    def observe(self, elapsed_ms: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        self.latencies_ms.append(elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedges_skipped": self.hedges_skipped,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
 class Tool(BaseTool):
     """LLM tool for processing prompts using XsAI"""
-    
+
     api_key: str = Field(default_factory=lambda: os.getenv("LLM_API_KEY", ""))
     base_url: str = Field(default_factory=lambda: os.getenv("LLM_BASE_URL", ""))
     model: str = Field(default_factory=lambda: os.getenv("LLM_MODEL", "llama3"))
-    
+
+    # Connection pool
+    pool_limit: int = Field(default_factory=lambda: int(os.getenv("LLM_POOL_LIMIT", "100")))
+    pool_limit_per_host: int = Field(default_factory=lambda: int(os.getenv("LLM_POOL_LIMIT_PER_HOST", "32")))
+    keepalive_timeout: float = Field(default_factory=lambda: float(os.getenv("LLM_KEEPALIVE_TIMEOUT", "60")))
+    request_timeout: float = Field(default_factory=lambda: float(os.getenv("LLM_REQUEST_TIMEOUT", "30")))
+
+    # Retries with jittered exponential backoff on 429/5xx and network errors
+    max_retries: int = Field(default_factory=lambda: int(os.getenv("LLM_MAX_RETRIES", "2")))
+    backoff_base: float = Field(default_factory=lambda: float(os.getenv("LLM_BACKOFF_BASE", "0.25")))
+    backoff_max: float = Field(default_factory=lambda: float(os.getenv("LLM_BACKOFF_MAX", "4")))
+
+    # Circuit breaker
+    breaker_threshold: int = Field(default_factory=lambda: int(os.getenv("LLM_BREAKER_THRESHOLD", "5")))
+    breaker_reset_seconds: float = Field(default_factory=lambda: float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")))
+
+    # Send a second, hedged request if the first has not answered after this many seconds (0 disables)
+    hedge_after: float = Field(default_factory=lambda: float(os.getenv("LLM_HEDGE_AFTER", "0")))
+    # At most this many hedged requests outstanding at once, so a slow endpoint is not sent twice the load
+    hedge_max_in_flight: int = Field(default_factory=lambda: int(os.getenv("LLM_HEDGE_MAX_IN_FLIGHT", "4")))
+
     # Private attributes
     _session: Optional[aiohttp.ClientSession] = PrivateAttr(default=None)
-    
+    _breaker: Optional[CircuitBreaker] = PrivateAttr(default=None)
+    _metrics: Dict[str, EndpointMetrics] = PrivateAttr(default_factory=dict)
+    _hedges_in_flight: int = PrivateAttr(default=0)
+
     def __init__(self, **data):
         super().__init__(
             name="llm",
             description="Processes prompts using local LLM via XsAI",
             **data
         )
-        
+        self._breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset_seconds)
+
     async def ensure_session(self):
-        """Ensure aiohttp session exists"""
-        if not self._session:
-            connector = aiohttp.TCPConnector(ssl=False)
+        """Ensure the pooled aiohttp session exists"""
+        if not self._session or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                ssl=False,
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
             self._session = aiohttp.ClientSession(
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
                     "Content-Type": "application/json"
                 },
-                connector=connector
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
             )
-            
-    async def execute(self, params: Dict[str, Any]) -> Any:
-        """Execute LLM processing"""
-        await self.ensure_session()
-        
-        # Add detailed environment logging
-        logger.info("LLM Tool Configuration:")
-        logger.info(f"Base URL: {self.base_url}")
-        logger.info(f"Model: {self.model}")
-        logger.info(f"API Key present: {bool(self.api_key)}")
-        
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Latency and error metrics per endpoint, plus circuit breaker state"""
+        snapshot = {endpoint: m.snapshot() for endpoint, m in self._metrics.items()}
+        snapshot["circuit_breaker"] = {"state": self._breaker.state, "consecutive_failures": self._breaker.failures}
+        return snapshot
+
+    def _endpoint_metrics(self, endpoint: str) -> EndpointMetrics:
+        if endpoint not in self._metrics:
+            self._metrics[endpoint] = EndpointMetrics()
+        return self._metrics[endpoint]
+
+    def _check_config(self, params: Dict[str, Any]) -> str:
         if not self.base_url:
             raise ValueError("LLM_BASE_URL environment variable is not set")
         if not self.api_key:
             raise ValueError("API_KEY environment variable is not set")
-            
         prompt = params.get("prompt")
         if not prompt:
             raise ValueError("No prompt provided")
-            
+        return prompt
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than a server Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    async def _post_once(self, url: str, payload: Dict[str, Any]) -> Any:
+        """One POST attempt; raises RetryableStatus for 429/5xx"""
+        async with self._session.post(url, json=payload) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error("XsAI API error: Status=%s, Response=%s", response.status, error_text)
+                logger.debug("Request URL: %s, payload: %s", url, LazyJson(payload))
+                if response.status in RETRYABLE_STATUSES:
+                    retry_after = response.headers.get("Retry-After")
+                    raise RetryableStatus(
+                        response.status, error_text,
+                        float(retry_after) if retry_after and retry_after.isdigit() else None
+                    )
+                raise RuntimeError(f"XsAI API error: {response.status}, {error_text}")
+            return await response.json()
+
+    async def _post_hedged(self, url: str, payload: Dict[str, Any], metrics: EndpointMetrics) -> Any:
+        """POST, and if no answer arrives within hedge_after seconds, race a second copy"""
+        if not self.hedge_after:
+            return await self._post_once(url, payload)
+
+        primary = asyncio.ensure_future(self._post_once(url, payload))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        if self._hedges_in_flight >= self.hedge_max_in_flight:
+            metrics.hedges_skipped += 1
+            return await primary
+
+        metrics.hedges += 1
+        logger.debug("Hedging request to %s after %.2fs", url, self.hedge_after)
+        self._hedges_in_flight += 1
+        pending = {primary, asyncio.ensure_future(self._post_once(url, payload))}
+        error: Optional[BaseException] = None
         try:
-            # Ensure base_url ends with /
-            base_url = self.base_url.rstrip("/")
-            
-            # Prepare request payload
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "temperature": 0.0,
-                "max_tokens": 1000,
-                "stream": False
-            }
-            
-            # Log the full request details for debugging
-            logger.debug(f"Making request to {base_url}/completions")
-            logger.debug(f"Request payload: {json.dumps(payload, indent=2)}")
-            
-            async with self._session.post(
-                f"{base_url}/completions",
-                json=payload,
-                timeout=30
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"XsAI API error: Status={response.status}, Response={error_text}")
-                    logger.error(f"Request URL: {base_url}/completions")
-                    logger.error(f"Request payload: {json.dumps(payload, indent=2)}")
-                    raise RuntimeError(f"XsAI API error: {response.status}, {error_text}")
-                    
-                data = await response.json()
-                logger.debug(f"API Response: {json.dumps(data, indent=2)}")
-                
-                if not data:
-                    raise RuntimeError("Empty response from XsAI API")
-                
-                # Handle different response formats
-                if isinstance(data, dict):
-                    if "choices" in data and data["choices"]:
-                        response_text = data["choices"][0].get("text", "").strip()
-                        logger.debug(f"Raw response text: {response_text}")
-                        
-                        try:
-                            # Try to parse as JSON first
-                            json_response = json.loads(response_text)
-                            return json_response
-                        except json.JSONDecodeError:
-                            # If not JSON, return as text response
-                            return {
-                                "response": response_text
-                            }
-                        
-                    logger.error(f"Unexpected response format: {data}")
-                    raise RuntimeError("Unexpected response format from XsAI API")
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            self._hedges_in_flight -= 1
+            for task in pending:
+                task.cancel()
+
+    async def _post_with_retries(self, url: str, payload: Dict[str, Any], endpoint: str) -> Any:
+        metrics = self._endpoint_metrics(endpoint)
+        attempt = 0
+        while True:
+            self._breaker.before_call()
+            started = time.perf_counter()
+            try:
+                data = await self._post_hedged(url, payload, metrics)
+            except (RetryableStatus, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.observe((time.perf_counter() - started) * 1000, ok=False)
+                if is_endpoint_failure(e):
+                    self._breaker.record_failure()
                 else:
-                    logger.error(f"Unexpected response type: {type(data)}")
-                    raise RuntimeError("Invalid response type from XsAI API")
-                
-        except aiohttp.ClientError as e:
-            logger.error(f"Network error calling XsAI API: {e}")
-            raise RuntimeError(f"Failed to connect to XsAI API: {e}")
+                    self._breaker.record_ignored()
+                if attempt >= self.max_retries:
+                    if isinstance(e, RetryableStatus):
+                        raise RuntimeError(str(e))
+                    logger.error("Network error calling XsAI API: %s", e)
+                    raise RuntimeError(f"Failed to connect to XsAI API: {e}")
+                delay = self._backoff(attempt, getattr(e, "retry_after", None))
+                logger.warning("XsAI API call failed (%s), retry %d/%d in %.2fs", e, attempt + 1, self.max_retries, delay)
+                metrics.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Non-retryable 4xx, or the caller was cancelled
+                metrics.observe((time.perf_counter() - started) * 1000, ok=False)
+                self._breaker.record_ignored()
+                raise
+            metrics.observe((time.perf_counter() - started) * 1000, ok=True)
+            self._breaker.record_success()
+            return data
+
+    async def complete(self, prompt: str) -> str:
+        """Completion text for a prompt, through the pooled session with retries, breaker and hedging"""
+        await self.ensure_session()
+
+        logger.debug("LLM Tool Configuration: base_url=%s model=%s api_key_present=%s",
+                     self.base_url, self.model, bool(self.api_key))
+        self._check_config({"prompt": prompt})
+
+        # Ensure base_url ends with /
+        base_url = self.base_url.rstrip("/")
+
+        # Prepare request payload
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "temperature": 0.0,
+            "max_tokens": 1000,
+            "stream": False
+        }
+
+        logger.debug("Making request to %s/completions, payload: %s", base_url, LazyJson(payload))
+        with span("llm_completion", model=self.model) as attrs:
+            data = await self._post_with_retries(f"{base_url}/completions", payload, "completions")
+            choices = data.get("choices") if isinstance(data, dict) else None
+            completion = choices[0].get("text", "") if choices else ""
+            attrs.update(token_counts(prompt, completion, data.get("usage") if isinstance(data, dict) else None))
+        logger.debug("API Response: %s", LazyJson(data))
+
+        if not data:
+            raise RuntimeError("Empty response from XsAI API")
+        if not isinstance(data, dict):
+            logger.error("Unexpected response type: %s", type(data))
+            raise RuntimeError("Invalid response type from XsAI API")
+        if not choices:
+            logger.error("Unexpected response format: %s", data)
+            raise RuntimeError("Unexpected response format from XsAI API")
+        return completion.strip()
+
+    async def execute(self, params: Dict[str, Any]) -> Any:
+        """Execute LLM processing"""
+        try:
+            response_text = await self.complete(self._check_config(params))
+            logger.debug("Raw response text: %s", response_text)
+            try:
+                # Try to parse as JSON first
+                return json.loads(response_text)
+            except json.JSONDecodeError:
+                # If not JSON, return as text response
+                return {
+                    "response": response_text
+                }
         except Exception as e:
-            logger.error(f"Error processing prompt with LLM: {e}")
+            logger.error("Error processing prompt with LLM: %s", e)
             raise
-            
+
+    async def stream(self, params: Dict[str, Any]) -> AsyncIterator[str]:
+        """Execute LLM processing with "stream": True, yielding text tokens as they arrive"""
+        await self.ensure_session()
+        prompt = self._check_config(params)
+
+        base_url = self.base_url.rstrip("/")
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "temperature": 0.0,
+            "max_tokens": 1000,
+            "stream": True
+        }
+        with span("llm_stream", model=self.model) as attrs:
+            metrics = self._endpoint_metrics("completions:stream")
+            self._breaker.before_call()
+            started = time.perf_counter()
+            ok = failed = False
+            completion, usage = [], None
+
+            try:
+                async with self._session.post(
+                    f"{base_url}/completions",
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=None, sock_read=self.request_timeout)
+                ) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        logger.error("XsAI API error: Status=%s, Response=%s", response.status, error_text)
+                        failed = response.status >= 500
+                        raise RuntimeError(f"XsAI API error: {response.status}, {error_text}")
+
+                    # Server-sent events: one "data: {...}" line per chunk, "data: [DONE]" at the end
+                    async for raw_line in response.content:
+                        line = raw_line.decode("utf-8").strip()
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        choices = chunk.get("choices") or []
+                        if choices and choices[0].get("text"):
+                            if not completion:
+                                attrs["first_token_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                            completion.append(choices[0]["text"])
+                            yield choices[0]["text"]
+                        if chunk.get("usage"):
+                            usage = chunk["usage"]
+                ok = True
+
+            except aiohttp.ClientError as e:
+                failed = True
+                logger.error("Network error calling XsAI API: %s", e)
+                raise RuntimeError(f"Failed to connect to XsAI API: {e}")
+            except asyncio.TimeoutError:
+                failed = True
+                raise
+            finally:
+                metrics.observe((time.perf_counter() - started) * 1000, ok=ok)
+                attrs.update(token_counts(prompt, "".join(completion), usage))
+                # A consumer that stops reading early (GeneratorExit) is not an endpoint failure
+                if ok:
+                    self._breaker.record_success()
+                elif failed:
+                    self._breaker.record_failure()
+                else:
+                    self._breaker.record_ignored()
+
     async def close(self):
         """Close the client session"""
         if self._session:
             await self._session.close()
-            self._session = None 
+            self._session = None
+
+
+class ToolLLM(LLMInterface):
+    """
+    neo4j_graphrag LLM backed by a Tool, so Text2Cypher generation and answer
+    synthesis share its pooled session, retries, circuit breaker and hedging.
+
+    The Tool's session belongs to the server's event loop: bind_loop() it at
+    startup, after which invoke() may be called from any worker thread (the
+    blocking /ask pipeline runs in the threadpool) and waits for the
+    completion to run on that loop, in the caller's trace context.
+    """
+
+    def __init__(self, tool: Tool):
+        super().__init__(model_name=tool.model)
+        self.tool = tool
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    @staticmethod
+    def _prompt(input: str, message_history=None, system_instruction: Optional[str] = None) -> str:
+        parts = [system_instruction] if system_instruction else []
+        messages = getattr(message_history, "messages", message_history) or []
+        parts += [f"{message['role']}: {message['content']}" for message in messages]
+        return "\n\n".join(parts + [input])
+
+    def invoke(self, input: str, message_history=None, system_instruction: Optional[str] = None) -> LLMResponse:
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            raise RuntimeError("ToolLLM is not bound to a running event loop")
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            raise RuntimeError("ToolLLM.invoke would block its own event loop; use ainvoke")
+
+        done: concurrent.futures.Future = concurrent.futures.Future()
+        prompt = self._prompt(input, message_history, system_instruction)
+        context = contextvars.copy_context()
+
+        def start():
+            task = loop.create_task(self.tool.complete(prompt), context=context)
+            task.add_done_callback(lambda t: done.cancel() if t.cancelled() else
+                                   done.set_exception(t.exception()) if t.exception() else
+                                   done.set_result(t.result()))
+        loop.call_soon_threadsafe(start)
+        return LLMResponse(content=done.result())
+
+    async def ainvoke(self, input: str, message_history=None, system_instruction: Optional[str] = None) -> LLMResponse:
+        prompt = self._prompt(input, message_history, system_instruction)
+        return LLMResponse(content=await self.tool.complete(prompt))
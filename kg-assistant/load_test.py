@@ -0,0 +1,457 @@
+"""
+Offline load test for the assistant API.
+
+Runs api_server's FastAPI app in-process under uvicorn against
+
+  - a stub LLM server (aiohttp) answering OpenAI-style /completions and
+    /chat/completions requests after a configurable latency, with canned
+    Cypher for Text2Cypher prompts and a short canned answer otherwise, and
+  - a graph stand-in installed as graph.driver, which serves the schema and
+    catalog introspection queries, EXPLAIN plans and synthetic result rows
+    after a configurable per-query latency,
+
+then drives /ask at a fixed concurrency with a weighted question mix and
+reports throughput and p50/p95/p99 latency end to end and per pipeline stage
+(from each response's timings_ms), plus Cypher executions per question.
+
+    python load_test.py --concurrency 16 --requests 2000 --llm-latency-ms 400
+    python load_test.py --mix my_questions.json --json report.json
+
+A mix file is a JSON list of {"question", "weight", "cypher"}; "cypher" is
+what the stub LLM returns for that question (omit it for questions the
+intent router answers without the LLM).
+
+The private utils.types package llm.py builds on is replaced by a stand-in
+when it is not installed (see install_module_standins), as in the tests.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import sys
+import time
+import types
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import neo4j
+
+STANDIN_DOMAINS = ["Sales", "Finance", "Marketing", "HR", "Supply Chain"]
+STANDIN_PRODUCTS = ["RawSalesData", "SalesForecast", "CustomerProfile", "InvoiceLedger", "CampaignMetrics"] + [
+    f"DataProduct{i:03d}" for i in range(195)
+]
+STANDIN_SCHEMA = {
+    "DataProduct": ["id", "name", "type", "domain", "subdomain", "destination", "schedule", "description"],
+    "Owner": ["name", "email"],
+    "Steward": ["name", "email"],
+    "Pipeline": ["name", "schedule"],
+    "Tag": ["name"],
+}
+STANDIN_RELATIONSHIPS = [
+    ("DataProduct", "FEEDS_INTO", "DataProduct"),
+    ("DataProduct", "OWNED_BY", "Owner"),
+    ("DataProduct", "STEWARDED_BY", "Steward"),
+    ("DataProduct", "HAS_TAG", "Tag"),
+    ("Pipeline", "PRODUCES", "DataProduct"),
+    ("Pipeline", "TRIGGERS", "Pipeline"),
+]
+
+DEFAULT_MIX = [
+    # Answered by the intent router, without the LLM
+    {"question": "How many data products are there?", "weight": 20},
+    {"question": "List data products in the Sales domain", "weight": 15},
+    {"question": "Who owns RawSalesData?", "weight": 10},
+    {"question": "What feeds into SalesForecast?", "weight": 10},
+    # Text2Cypher through the stub LLM
+    {"question": "Which data products are scheduled daily and written to Snowflake?", "weight": 15,
+     "cypher": "MATCH (dp:DataProduct) WHERE dp.schedule = 'daily' AND dp.destination = 'snowflake'\n"
+               "RETURN dp.name AS Name, dp.domain AS Domain, dp.schedule AS Schedule"},
+    {"question": "Why do so many finance products depend on sales data?", "weight": 10,
+     "cypher": "MATCH (s:DataProduct {domain: 'Sales'})-[:FEEDS_INTO]->(f:DataProduct {domain: 'Finance'})\n"
+               "RETURN s.name AS Source, f.name AS Target, f.subdomain AS Subdomain"},
+    {"question": "Summarize the tags used by marketing data products", "weight": 10,
+     "cypher": "MATCH (dp:DataProduct {domain: 'Marketing'})-[:HAS_TAG]->(t:Tag)\n"
+               "RETURN t.name AS Tag, count(dp) AS DataProductCount ORDER BY DataProductCount DESC"},
+    {"question": "Which pipelines produce customer data products and who owns them?", "weight": 10,
+     "cypher": "MATCH (p:Pipeline)-[:PRODUCES]->(dp:DataProduct)-[:OWNED_BY]->(o:Owner)\n"
+               "WHERE dp.name CONTAINS 'Customer'\nRETURN p.name AS Pipeline, dp.name AS DataProduct, o.name AS Owner"},
+]
+DEFAULT_CYPHER = "MATCH (dp:DataProduct) RETURN dp.name AS Name, dp.domain AS Domain"
+
+
+def install_module_standins() -> None:
+    """Registers a stand-in for the private utils.types package unless it is importable."""
+    try:
+        import utils.types  # noqa: F401
+    except ImportError:
+        from pydantic import BaseModel
+        utils = types.ModuleType("utils")
+        utils.types = types.ModuleType("utils.types")
+        utils.types.BaseTool = BaseModel
+        sys.modules["utils"], sys.modules["utils.types"] = utils, utils.types
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1)
+
+
+# ---------------------------------------------------------------------------
+# Stub LLM server
+# ---------------------------------------------------------------------------
+
+class StubLLM:
+    """OpenAI-style completions endpoint with fixed latency and canned responses."""
+
+    def __init__(self, mix: List[Dict], latency_ms: float, jitter_ms: float, token_ms: float):
+        self.canned = {entry["question"]: entry["cypher"] for entry in mix if entry.get("cypher")}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_ms = token_ms
+        self.requests = 0
+
+    def respond_to(self, prompt: str) -> str:
+        # Text2CypherTemplate asks for "a Cypher statement"; anything else is an answer prompt
+        if "Cypher statement" in prompt:
+            for question, cypher in self.canned.items():
+                if question in prompt:
+                    return cypher
+            return DEFAULT_CYPHER
+        context_lines = prompt.count("\n")
+        return f"Based on the {context_lines} lines of context, here is a short stub answer to the question."
+
+    async def handle(self, request):
+        from aiohttp import web
+        body = await request.json()
+        self.requests += 1
+        prompt = body.get("prompt")
+        if prompt is None:
+            prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        text = self.respond_to(prompt)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+        await asyncio.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        chat = request.path.endswith("chat/completions")
+
+        if not body.get("stream"):
+            choice = {"message": {"role": "assistant", "content": text}} if chat else {"text": text}
+            return web.json_response({"choices": [choice], "usage": usage})
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in re.findall(r"\S+\s*", text):
+            choice = {"delta": {"content": token}} if chat else {"text": token}
+            await response.write(f"data: {json.dumps({'choices': [choice]})}\n\n".encode())
+            await asyncio.sleep(self.token_ms / 1000)
+        await response.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def start(self, port: int):
+        from aiohttp import web
+        app = web.Application()
+        for path in ("/completions", "/v1/completions", "/chat/completions", "/v1/chat/completions"):
+            app.router.add_post(path, self.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+# ---------------------------------------------------------------------------
+# Graph stand-in
+# ---------------------------------------------------------------------------
+
+class StandInSummary:
+    query_type = "r"
+    result_consumed_after = 0
+
+    def __init__(self, plan: Optional[dict], available_after: int):
+        self.plan = plan
+        self.result_available_after = available_after
+
+
+class StandInResult:
+    def __init__(self, keys: List[str], rows: List[list], summary: StandInSummary):
+        self._keys = keys
+        self._records = [neo4j.Record(zip(keys, row)) for row in rows]
+        self._summary = summary
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def keys(self):
+        return list(self._keys)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return self._summary
+
+
+class StandInGraph:
+    """
+    Answers the queries the API issues with canned or synthetic data after
+    `latency_ms`: schema and catalog introspection, EXPLAIN (a small read-only
+    plan) and anything else with `rows` synthetic rows shaped by its RETURN
+    aliases. Pagination parameters ($skip/$limit, or the page window
+    run_cypher_page adds) are honoured.
+    """
+
+    def __init__(self, latency_ms: float, rows: int):
+        self.latency_ms = latency_ms
+        self.rows = rows
+        self.queries = 0
+
+    def run(self, text: str, params: dict) -> StandInResult:
+        self.queries += 1
+        time.sleep(self.latency_ms / 1000)
+        available_after = int(self.latency_ms)
+        if text.lstrip().upper().startswith("EXPLAIN"):
+            plan = {"operatorType": "ProduceResults@neo4j", "args": {"EstimatedRows": float(self.rows)},
+                    "children": [{"operatorType": "NodeByLabelScan@neo4j", "args": {}, "children": []}]}
+            return StandInResult([], [], StandInSummary(plan, available_after))
+        keys, rows = self.rows_for(text)
+        if "__page_skip" in params:
+            offset, limit = params["__page_skip"], params["__page_limit"]
+        else:
+            offset, limit = params.get("skip", 0) or 0, params.get("limit")
+        rows = rows[offset:offset + limit if limit is not None else None]
+        return StandInResult(keys, rows, StandInSummary(None, available_after))
+
+    def rows_for(self, text: str):
+        if "db.schema.nodeTypeProperties" in text:
+            return ["label", "properties"], [[label, props] for label, props in STANDIN_SCHEMA.items()]
+        if "db.schema.visualization" in text:
+            return ["from_label", "rel_type", "to_label"], [list(rel) for rel in STANDIN_RELATIONSHIPS]
+        if "AS names" in text and "AS domains" in text:
+            return ["names", "domains"], [[STANDIN_PRODUCTS, STANDIN_DOMAINS]]
+        # The last RETURN with aliases
+        returned, keys = "", ["value"]
+        for clause in reversed(text.split("RETURN")[1:]):
+            aliases = re.findall(r"\bAS\s+(\w+)", clause)
+            if aliases:
+                returned, keys = clause, aliases
+                break
+        if len(keys) == 1 and "count(" in returned.lower():
+            return keys, [[len(STANDIN_PRODUCTS)]]
+        rows = []
+        for i in range(self.rows):
+            row = []
+            for key in keys:
+                lower = key.lower()
+                if "count" in lower or "hops" in lower:
+                    row.append(i % 7 + 1)
+                elif "domain" in lower:
+                    row.append(STANDIN_DOMAINS[i % len(STANDIN_DOMAINS)])
+                elif lower in ("dataproducts", "stewards", "names"):
+                    row.append(STANDIN_PRODUCTS[i % 10:i % 10 + 3])
+                else:
+                    row.append(f"{key}{i}")
+            rows.append(row)
+        return keys, rows
+
+
+class StandInSession:
+    def __init__(self, graph: StandInGraph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters=None, **kwargs):
+        return self.graph.run(getattr(query, "text", query), dict(parameters or {}, **kwargs))
+
+
+class StandInDriver(neo4j.Driver):
+    """
+    Drop-in for the neo4j driver as used through graph.get_driver(). It is a
+    neo4j.Driver (without a connection pool) so that neo4j_graphrag's
+    retrievers accept it, and answers their dbms.components() version check.
+    """
+
+    _closed = False
+
+    def __init__(self, graph: StandInGraph):
+        self.graph = graph
+        # neo4j_graphrag stamps its user agent on the pool config
+        self._pool = SimpleNamespace(pool_config=SimpleNamespace(user_agent=None))
+
+    def session(self, **config):
+        return StandInSession(self.graph)
+
+    def execute_query(self, query_, parameters_=None, **kwargs):
+        if "dbms.components" in getattr(query_, "text", query_):
+            record = neo4j.Record({"name": "Neo4j Kernel", "versions": ["5.18.1"], "edition": "enterprise"})
+            return neo4j.EagerResult([record], StandInSummary(None, 0), list(record.keys()))
+        result = self.graph.run(getattr(query_, "text", query_), dict(parameters_ or {}))
+        return neo4j.EagerResult(list(result), result.consume(), result.keys())
+
+    def verify_connectivity(self, **config):
+        pass
+
+    def close(self):
+        self._closed = True
+
+
+# ---------------------------------------------------------------------------
+# Load driver and report
+# ---------------------------------------------------------------------------
+
+async def drive(base_url: str, mix: List[Dict], concurrency: int, total: int, duration: Optional[float]) -> Dict:
+    import aiohttp
+    questions = [entry["question"] for entry in mix]
+    weights = [entry.get("weight", 1) for entry in mix]
+    samples = {"client_ms": [], "stages": defaultdict(list), "db_executions": defaultdict(int),
+               "errors": defaultdict(int), "ok": 0}
+    issued = 0
+    deadline = time.monotonic() + duration if duration else None
+
+    async def worker(session):
+        nonlocal issued
+        while issued < total and (deadline is None or time.monotonic() < deadline):
+            issued += 1
+            question = random.choices(questions, weights)[0]
+            started = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/ask", json={"question": question}) as response:
+                    body = await response.json()
+                    status = response.status
+            except Exception as e:
+                samples["errors"][type(e).__name__] += 1
+                continue
+            samples["client_ms"].append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                samples["errors"][f"HTTP {status}"] += 1
+                continue
+            samples["ok"] += 1
+            for stage, ms in (body.get("timings_ms") or {}).items():
+                samples["stages"][stage].append(ms)
+            samples["db_executions"][body.get("db_executions")] += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        samples["elapsed_s"] = time.perf_counter() - started
+        async with session.get(f"{base_url}/stats/coalescing") as response:
+            samples["coalescing"] = await response.json()
+    return samples
+
+def build_report(samples: Dict, concurrency: int) -> Dict:
+    def latency(values):
+        ordered = sorted(values)
+        return {"count": len(ordered), "p50_ms": percentile(ordered, 0.50), "p95_ms": percentile(ordered, 0.95),
+                "p99_ms": percentile(ordered, 0.99), "max_ms": round(ordered[-1], 1) if ordered else None}
+    elapsed = samples["elapsed_s"]
+    return {
+        "concurrency": concurrency,
+        "requests_ok": samples["ok"],
+        "errors": dict(samples["errors"]),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_qps": round(samples["ok"] / elapsed, 1) if elapsed else None,
+        "client": latency(samples["client_ms"]),
+        "stages": {stage: latency(values) for stage, values in sorted(samples["stages"].items())},
+        "db_executions_per_question": {str(k): v for k, v in sorted(samples["db_executions"].items(), key=str)},
+        "coalescing": samples.get("coalescing"),
+    }
+
+def print_report(report: Dict) -> None:
+    print(f"\n{report['requests_ok']} ok, {sum(report['errors'].values())} errors in {report['elapsed_s']} s "
+          f"at concurrency {report['concurrency']}: {report['throughput_qps']} questions/s")
+    if report["errors"]:
+        print(f"errors: {report['errors']}")
+    print(f"\n{'stage':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, stats in [("client (end to end)", report["client"])] + list(report["stages"].items()):
+        print(f"{stage:<28}{stats['count']:>8}{stats['p50_ms'] or 0:>10.1f}{stats['p95_ms'] or 0:>10.1f}"
+              f"{stats['p99_ms'] or 0:>10.1f}{stats['max_ms'] or 0:>10.1f}")
+    print(f"\nCypher executions per question: {report['db_executions_per_question']}")
+    print(f"coalescing: {report['coalescing']}")
+
+
+async def run(args) -> Dict:
+    mix = json.load(open(args.mix)) if args.mix else DEFAULT_MIX
+    llm_port, api_port = free_port(), free_port()
+
+    # Configuration is read at import time, so point it at the stubs first
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}", "LLM_API_KEY": "stub", "LLM_DEFAULT_MODEL": "stub",
+        "LLM_MODEL": "stub", "NEO4J_URI": "bolt://stand-in:7687", "NEO4J_USER": "stand-in",
+        "NEO4J_PASSWORD": "stand-in",
+    })
+    os.environ.pop("SHARED_CACHE_PATH", None)
+    install_module_standins()
+    import uvicorn
+    import graph
+    graph_standin = StandInGraph(args.db_latency_ms, args.rows)
+    graph.driver = StandInDriver(graph_standin)
+    import api_server
+    # In case api_server was imported before the environment pointed at the stub
+    api_server.llm_tool.base_url = os.environ["LLM_BASE_URL"]
+
+    stub = StubLLM(mix, args.llm_latency_ms, args.llm_jitter_ms, args.llm_token_ms)
+    llm_runner = await stub.start(llm_port)
+    server = uvicorn.Server(uvicorn.Config(api_server.app, host="127.0.0.1", port=api_port, log_level="warning"))
+    serving = asyncio.ensure_future(server.serve())
+    try:
+        while not server.started:
+            if serving.done():
+                serving.result()
+                raise RuntimeError("API server failed to start (see the log above)")
+            await asyncio.sleep(0.05)
+        print(f"API on :{api_port}, stub LLM on :{llm_port}; {args.requests} requests at concurrency {args.concurrency}")
+        samples = await drive(f"http://127.0.0.1:{api_port}", mix, args.concurrency, args.requests, args.duration)
+    finally:
+        server.should_exit = True
+        await serving
+        await llm_runner.cleanup()
+    report = build_report(samples, args.concurrency)
+    report["llm_requests"] = stub.requests
+    report["db_queries"] = graph_standin.queries
+    return report
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--duration", type=float, help="stop after this many seconds even if requests remain")
+    parser.add_argument("--mix", help="JSON question mix (default: built-in mix)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-token-ms", type=float, default=5, help="delay between streamed tokens")
+    parser.add_argument("--db-latency-ms", type=float, default=5)
+    parser.add_argument("--rows", type=int, default=50, help="rows returned by synthetic queries")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+
+    random.seed(args.seed)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Quality and usage rollup reports over all data products.
+
+The DataQuality, UsageStats, Metrics and Owner satellites of every product
+are fetched in one streamed query and loaded column-wise into a pandas
+DataFrame (one row per product, numeric satellite attributes as float
+columns prefixed quality_, usage_ and metric_). Rollups are vectorized
+group-bys over that frame:
+
+  - per domain / subdomain / environment / owner: product count, quality
+    score mean and percentiles, total and percentile usage, top accessed
+  - top-N most accessed products
+  - quality score distribution
+
+quality_score is the mean of a product's quality attributes on a 0-100 scale
+(attributes whose values are all fractions are scaled by 100).
+
+The frame is rebuilt only when the graph fingerprint (node, relationship and
+ChangeLog counts plus the latest DataProduct.updated_at, as in shared_cache.py)
+changes; the fingerprint itself is checked at most every
+REPORT_FINGERPRINT_CHECK_SECONDS.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import REPORT_FINGERPRINT_CHECK_SECONDS, REPORT_TOP_N, REPORT_USAGE_FIELD
+from graph import get_driver, stream_cypher
+from shared_cache import graph_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ["domain", "subdomain", "environment", "owner"]
+PERCENTILES = [50, 90, 99]
+QUALITY_BINS = [0, 50, 70, 80, 90, 95, 100]
+
+# Pattern comprehensions rather than OPTIONAL MATCHes, so products with
+# several satellites do not multiply rows
+REPORT_QUERY = """
+MATCH (dp:DataProduct)
+RETURN dp.id AS id, dp.name AS name, dp.domain AS domain, dp.subdomain AS subdomain,
+       dp.environment AS environment,
+       [(dp)-[:OWNED_BY]->(o:Owner) | coalesce(o.name, o.email)][0] AS owner,
+       [(dp)-[:HAS_QUALITY]->(q:DataQuality) | properties(q)][0] AS quality,
+       [(dp)-[:HAS_USAGE]->(u:UsageStats) | properties(u)][0] AS usage,
+       [(dp)-[:HAS_METRIC]->(m:Metrics) | properties(m)][0] AS metric
+"""
+
+SATELLITES = ["quality", "usage", "metric"]
+
+
+def load_frame() -> pd.DataFrame:
+    """Streams REPORT_QUERY into per-column lists and builds the frame once."""
+    columns: Dict[str, list] = defaultdict(list, {key: [] for key in ["id", "name"] + DIMENSIONS})
+    rows = 0
+    for row in stream_cypher(REPORT_QUERY):
+        for key in ["id", "name"] + DIMENSIONS:
+            columns[key].append(row[key])
+        for satellite in SATELLITES:
+            for attr, value in (row[satellite] or {}).items():
+                values = columns[f"{satellite}_{attr}"]
+                # Pad attributes first seen on a later product
+                values.extend([None] * (rows - len(values)))
+                values.append(value)
+        rows += 1
+    for values in columns.values():
+        values.extend([None] * (rows - len(values)))
+
+    frame = pd.DataFrame(dict(columns))
+    satellite_columns = [c for c in frame.columns if c.split("_", 1)[0] in SATELLITES]
+    for column in satellite_columns:
+        raw = frame[column]
+        if not pd.api.types.is_numeric_dtype(raw):
+            # "98.5%" -> 98.5; anything non-numeric becomes NaN
+            raw = raw.astype(str).str.rstrip("%").where(raw.notna())
+        frame[column] = pd.to_numeric(raw, errors="coerce").astype("float64")
+    # Only satellite attributes are dropped when empty; dimensions stay even if all null
+    empty = [c for c in satellite_columns if frame[c].isna().all()]
+    frame = frame.drop(columns=empty)
+    for dimension in DIMENSIONS:
+        frame[dimension] = frame[dimension].fillna("(none)")
+
+    quality = frame[[c for c in frame.columns if c.startswith("quality_")]]
+    if not quality.empty:
+        fractions = quality.max() <= 1.0
+        quality = quality * np.where(fractions, 100.0, 1.0)
+    frame["quality_score"] = quality.mean(axis=1) if not quality.empty else np.nan
+    usage_column = f"usage_{REPORT_USAGE_FIELD}"
+    frame["usage"] = frame[usage_column] if usage_column in frame else np.nan
+    return frame
+
+def _records(frame: pd.DataFrame) -> List[dict]:
+    # to_json turns NaN into null and numpy scalars into plain numbers
+    return json.loads(frame.to_json(orient="records"))
+
+def rollup(frame: pd.DataFrame, dimension: str, top_n: int = 3) -> List[dict]:
+    grouped = frame.groupby(dimension, sort=True)
+    table = grouped.agg(products=("id", "size"),
+                        quality_mean=("quality_score", "mean"),
+                        usage_total=("usage", "sum"))
+    for p in PERCENTILES:
+        table[f"quality_p{p}"] = grouped["quality_score"].quantile(p / 100)
+        table[f"usage_p{p}"] = grouped["usage"].quantile(p / 100)
+    top = (frame.dropna(subset=["usage"])
+           .sort_values("usage", ascending=False)
+           .groupby(dimension)["name"]
+           .agg(lambda names: list(names[:top_n])))
+    table["top_accessed"] = top.reindex(table.index)
+    table["top_accessed"] = table["top_accessed"].apply(lambda names: names if isinstance(names, list) else [])
+    return _records(table.reset_index().round(3))
+
+def quality_distribution(frame: pd.DataFrame) -> List[dict]:
+    scores = frame["quality_score"].dropna().clip(0, 100)
+    counts = pd.cut(scores, QUALITY_BINS, include_lowest=True).value_counts(sort=False)
+    return [{"range": f"{low}-{high}", "products": int(count)}
+            for low, high, count in zip(QUALITY_BINS, QUALITY_BINS[1:], counts)]
+
+def build_report(frame: pd.DataFrame, dimensions: List[str], top_n: int) -> Dict:
+    top = frame.dropna(subset=["usage"]).nlargest(top_n, "usage")
+    return {
+        "products": int(len(frame)),
+        "with_quality": int(frame["quality_score"].notna().sum()),
+        "with_usage": int(frame["usage"].notna().sum()),
+        "quality_score": {
+            "mean": None if frame["quality_score"].isna().all() else round(float(frame["quality_score"].mean()), 3),
+            **{f"p{p}": None if frame["quality_score"].isna().all()
+               else round(float(frame["quality_score"].quantile(p / 100)), 3) for p in PERCENTILES},
+            "distribution": quality_distribution(frame),
+        },
+        "top_accessed": _records(top[["id", "name", "domain", "owner", "usage", "quality_score"]].round(3)),
+        "rollups": {dimension: rollup(frame, dimension, top_n) for dimension in dimensions},
+    }
+
+
+class ReportCache:
+    """The product frame, kept until the graph fingerprint changes."""
+
+    def __init__(self):
+        self.frame: Optional[pd.DataFrame] = None
+        self.fingerprint = None
+        self.built_at: Optional[str] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self) -> pd.DataFrame:
+        with self.lock:
+            now = time.monotonic()
+            if self.frame is not None and now - self.checked_at < REPORT_FINGERPRINT_CHECK_SECONDS:
+                return self.frame
+            fingerprint = graph_fingerprint(get_driver())
+            self.checked_at = now
+            if self.frame is None or fingerprint != self.fingerprint:
+                started = time.perf_counter()
+                self.frame = load_frame()
+                self.fingerprint = fingerprint
+                self.built_at = datetime.now(timezone.utc).isoformat()
+                logger.info("Report frame rebuilt: %d products, %d columns in %.0f ms", len(self.frame),
+                            len(self.frame.columns), (time.perf_counter() - started) * 1000)
+            return self.frame
+
+    def report(self, dimensions: List[str], top_n: int = REPORT_TOP_N) -> Dict:
+        frame = self.get()
+        return dict(build_report(frame, dimensions, top_n), built_at=self.built_at,
+                    fingerprint=list(self.fingerprint))
+
+
+report_cache = ReportCache()
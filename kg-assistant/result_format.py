@@ -0,0 +1,67 @@
+"""
+Compact columnar encoding of query results.
+
+Instead of a list of dicts repeating every column name per row, results are
+returned as {"columns": [...], "rows": [[...], ...]} and serialized with
+orjson, bypassing FastAPI's jsonable_encoder. Raw Neo4j values are encoded
+directly: nodes, relationships and paths as small objects, temporal types as
+ISO 8601 strings and points as {srid, coordinates}.
+
+Clients opt in with "format": "columnar" on /ask, /ask/batch and /ask/page.
+/ask/stream sends the columns in one "columns" event and then each row as a
+list of values.
+See bench_result_format.py for payload size and encode time comparisons.
+"""
+
+from typing import Any, Dict, List
+
+import orjson
+from fastapi.responses import Response
+from neo4j.graph import Node, Path, Relationship
+from neo4j.spatial import Point
+from neo4j.time import Date, DateTime, Duration, Time
+
+RECORDS = "records"
+COLUMNAR = "columnar"
+FORMAT_PATTERN = f"^({RECORDS}|{COLUMNAR})$"
+
+
+def encode_value(value: Any) -> Any:
+    """orjson `default` hook for the Neo4j types it cannot serialize natively."""
+    if isinstance(value, Node):
+        return {"element_id": value.element_id, "labels": sorted(value.labels), "properties": dict(value.items())}
+    if isinstance(value, Relationship):
+        return {
+            "element_id": value.element_id,
+            "type": value.type,
+            "start": value.start_node.element_id if value.start_node else None,
+            "end": value.end_node.element_id if value.end_node else None,
+            "properties": dict(value.items())
+        }
+    if isinstance(value, Path):
+        return {"nodes": list(value.nodes), "relationships": list(value.relationships)}
+    if isinstance(value, (Date, DateTime, Time, Duration)):
+        return value.iso_format()
+    if isinstance(value, Point):
+        return {"srid": value.srid, "coordinates": list(value)}
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=encode_value, option=orjson.OPT_NON_STR_KEYS)
+
+def columnar(columns: List[str], rows: List[list]) -> Dict:
+    return {"columns": columns, "rows": rows}
+
+def records_to_columnar(records: List[dict]) -> Dict:
+    """Columnar form of a list of record dicts (columns taken from the first record)."""
+    columns = list(records[0].keys()) if records else []
+    return columnar(columns, [[record.get(column) for column in columns] for record in records])
+
+
+class ColumnarResponse(Response):
+    """JSON response rendered with orjson and the Neo4j-aware encoder."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
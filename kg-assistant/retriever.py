@@ -0,0 +1,91 @@
+import logging
+from typing import Any, Dict, Optional
+
+from neo4j_graphrag.retrievers import Text2CypherRetriever
+from neo4j_graphrag.generation.prompts import Text2CypherTemplate
+from neo4j_graphrag.types import RawSearchResult
+
+from config import LLM_QUERY_ROW_CAP
+from cypher_guard import CypherRejected, check_cypher
+from graph import extract_cypher_query, run_cypher
+from tracing import span, token_counts
+
+logger = logging.getLogger(__name__)
+
+REPAIR_INSTRUCTIONS = """{question}
+
+A previous attempt produced this Cypher query, which was rejected before execution:
+{cypher}
+
+Rejection reasons:
+{reasons}
+
+Write a corrected, read-only Cypher query for the question that avoids these problems."""
+
+
+class GuardedText2CypherRetriever(Text2CypherRetriever):
+    """
+    Text2CypherRetriever that checks generated Cypher with cypher_guard before
+    running it, gives the LLM one chance to repair a rejected query, and
+    executes accepted queries read-only with a server-side timeout.
+    """
+
+    def generate_cypher(self, query_text: str, schema: Optional[str] = None,
+                        examples: Optional[str] = None) -> str:
+        """Asks the LLM for Cypher answering `query_text`, without executing it."""
+        template = Text2CypherTemplate(template=self.custom_prompt) if self.custom_prompt else Text2CypherTemplate()
+        prompt = template.format(
+            schema=schema or self.neo4j_schema,
+            examples=examples if examples is not None else "\n".join(self.examples or []),
+            query_text=query_text
+        )
+        with span("llm_generate_cypher") as attrs:
+            llm_result = self.llm.invoke(prompt)
+            attrs.update(token_counts(prompt, llm_result.content))
+        with span("extract_cypher"):
+            return extract_cypher_query(llm_result.content)
+
+    def check_cypher(self, cypher: str) -> Dict[str, Any]:
+        """cypher_guard.check_cypher, traced with the verdict and plan summary."""
+        with span("cypher_guard") as attrs:
+            verdict = check_cypher(cypher)
+            attrs.update(accepted=verdict["accepted"], rewritten=verdict.get("rewritten", False),
+                         plan=verdict.get("plan"))
+        return verdict
+
+    def generate_guarded_cypher(self, query_text: str, schema: Optional[str] = None,
+                                examples: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generates Cypher and runs it through the pre-flight guard, with one
+        repair round trip to the LLM if it is rejected. Returns the guard
+        verdict for the accepted query; raises CypherRejected otherwise.
+        """
+        verdict = self.check_cypher(self.generate_cypher(query_text, schema, examples))
+        if verdict["accepted"]:
+            return verdict
+
+        logger.info("Generated Cypher rejected (%s), asking LLM to repair it", "; ".join(verdict["reasons"]))
+        repair_prompt = REPAIR_INSTRUCTIONS.format(
+            question=query_text,
+            cypher=verdict["cypher"],
+            reasons="\n".join(f"- {reason}" for reason in verdict["reasons"])
+        )
+        verdict = self.check_cypher(self.generate_cypher(repair_prompt, schema, examples))
+        verdict["repaired"] = True
+        if not verdict["accepted"]:
+            raise CypherRejected(verdict["cypher"], verdict["reasons"])
+        return verdict
+
+    def get_search_results(self, query_text: str, prompt_params: Optional[Dict[str, Any]] = None) -> RawSearchResult:
+        prompt_params = dict(prompt_params or {})
+        verdict = self.generate_guarded_cypher(
+            query_text,
+            schema=prompt_params.pop("schema", None),
+            examples=prompt_params.pop("examples", None)
+        )
+        # One look-ahead row tells a result of exactly LLM_QUERY_ROW_CAP rows from a truncated one
+        records = run_cypher(verdict["cypher"], max_rows=LLM_QUERY_ROW_CAP + 1, as_records=True)
+        return RawSearchResult(
+            records=records[:LLM_QUERY_ROW_CAP],
+            metadata={"cypher": verdict["cypher"], "guard": verdict, "truncated": len(records) > LLM_QUERY_ROW_CAP}
+        )
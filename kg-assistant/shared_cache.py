@@ -0,0 +1,349 @@
+"""
+Read-mostly structures shared by all workers in prefork mode.
+
+The gunicorn master (see gunicorn.conf.py) builds one snapshot of the graph
+schema, the catalog name index and the FEEDS_INTO lineage adjacency, and
+publishes it atomically to SHARED_CACHE_PATH. With preload_app the master
+then imports api_server, which loads the snapshot before forking and freezes
+it out of the garbage collector, so workers share those pages copy-on-write
+instead of each building and holding its own copy.
+
+File layout: an 8-byte header length, a pickled header (generation,
+fingerprint, schema and catalog, plus the offset of every array) and then the
+lineage as flat numpy arrays, 8-byte aligned: sorted product ids, names and
+domains as UTF-8 blobs with offsets, and the upstream/downstream adjacency in
+CSR form. Workers map the file and read the arrays in place, so every
+generation of the lineage stays in page-cache pages shared by all workers;
+only the small header is unpickled per worker.
+
+Refresh protocol: the master polls a cheap graph fingerprint every
+SHARED_CACHE_POLL_SECONDS and republishes (with a new generation number)
+when it changes or the snapshot is older than SHARED_CACHE_MAX_AGE_SECONDS.
+Workers stat the file at most once per second, off the event loop, and map a
+newer generation; they never query the graph to build these structures
+themselves.
+"""
+
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from neo4j import GraphDatabase
+
+from config import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+    SHARED_CACHE_PATH, SHARED_CACHE_POLL_SECONDS, SHARED_CACHE_MAX_AGE_SECONDS
+)
+from dataproduct_schema import NODE_PROPERTIES_QUERY, RELATIONSHIP_PATTERNS_QUERY
+from intent_router import CATALOG_QUERY
+
+logger = logging.getLogger(__name__)
+
+# Node/relationship totals come from the counts store, so this is O(1).
+# Counts miss property-only edits, so the latest DataProduct.updated_at (set by
+# kg-builder's registry on every create/update, read from the
+# dataproduct_updated_at index) is part of the fingerprint too.
+FINGERPRINT_QUERY = """
+CALL { MATCH (n) RETURN count(n) AS nodes }
+CALL { MATCH ()-[r]->() RETURN count(r) AS relationships }
+CALL { MATCH (c:ChangeLog) RETURN count(c) AS changes }
+CALL {
+  OPTIONAL MATCH (dp:DataProduct) WHERE dp.updated_at IS NOT NULL
+  WITH dp ORDER BY dp.updated_at DESC LIMIT 1
+  RETURN dp.updated_at AS updated_at
+}
+RETURN nodes, relationships, changes, updated_at
+"""
+
+LINEAGE_EDGES_QUERY = """
+MATCH (dp:DataProduct)
+OPTIONAL MATCH (dp)-[:FEEDS_INTO]->(down:DataProduct)
+RETURN dp.id AS id, dp.name AS name, dp.domain AS domain, collect(down.id) AS downstream
+"""
+
+RECHECK_INTERVAL_SECONDS = 1.0
+ALIGNMENT = 8
+
+
+def enabled() -> bool:
+    return bool(SHARED_CACHE_PATH)
+
+
+# ---------------------------------------------------------------------------
+# Master side: build and publish
+# ---------------------------------------------------------------------------
+
+def graph_fingerprint(driver) -> tuple:
+    with driver.session() as session:
+        row = session.run(FINGERPRINT_QUERY).single()
+    return (row["nodes"], row["relationships"], row["changes"], row["updated_at"])
+
+def build_snapshot(driver, generation: int) -> Dict:
+    """Queries the graph for everything the workers share."""
+    with driver.session() as session:
+        node_properties = {
+            row["label"]: sorted(row["properties"]) for row in session.run(NODE_PROPERTIES_QUERY)
+        }
+        relationships = [
+            (row["from_label"], row["rel_type"], row["to_label"])
+            for row in session.run(RELATIONSHIP_PATTERNS_QUERY)
+        ]
+        catalog = session.run(CATALOG_QUERY).single()
+        products, downstream, upstream = {}, {}, {}
+        for row in session.run(LINEAGE_EDGES_QUERY):
+            products[row["id"]] = (row["name"], row["domain"])
+            downstream[row["id"]] = row["downstream"]
+            for target in row["downstream"]:
+                upstream.setdefault(target, []).append(row["id"])
+    return {
+        "generation": generation,
+        "built_at": time.time(),
+        "fingerprint": graph_fingerprint(driver),
+        "schema": {"node_properties": node_properties, "relationships": relationships},
+        "catalog": {"names": catalog["names"], "domains": catalog["domains"]},
+        "lineage": {"products": products, "downstream": downstream, "upstream": upstream},
+    }
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _text_arrays(values: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """UTF-8 blob, start offsets (one extra for the end) and null mask of a string column."""
+    encoded = [(value or "").encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+    return (np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets,
+            np.array([value is None for value in values], dtype=bool))
+
+def lineage_arrays(lineage: Dict) -> Dict[str, np.ndarray]:
+    """The lineage built by build_snapshot as flat arrays (see the file layout above)."""
+    keys = sorted(key.encode("utf-8") for key in lineage["products"] if key is not None)
+    ids = [key.decode("utf-8") for key in keys]
+    position = {dataproduct_id: i for i, dataproduct_id in enumerate(ids)}
+    arrays = {"ids": np.array(keys, dtype=f"S{max(map(len, keys), default=1)}")}
+    for column, text in (("name", 0), ("domain", 1)):
+        blob, offsets, nulls = _text_arrays([lineage["products"][i][text] for i in ids])
+        arrays.update({f"{column}_blob": blob, f"{column}_offsets": offsets, f"{column}_null": nulls})
+    for direction in ("upstream", "downstream"):
+        indptr, neighbours = np.zeros(len(ids) + 1, dtype=np.int64), []
+        for i, dataproduct_id in enumerate(ids):
+            neighbours.extend(position[other] for other in lineage[direction].get(dataproduct_id, [])
+                              if other in position)
+            indptr[i + 1] = len(neighbours)
+        arrays[f"{direction}_indptr"] = indptr
+        arrays[f"{direction}_indices"] = np.array(neighbours, dtype=np.int32)
+    return arrays
+
+def publish(snapshot: Dict, path: str = SHARED_CACHE_PATH) -> None:
+    """Writes the snapshot next to `path` and atomically renames it into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    arrays = lineage_arrays(snapshot["lineage"])
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = (offset, array.dtype.str, len(array))
+        offset = _aligned(offset + array.nbytes)
+    header = {key: value for key, value in snapshot.items() if key != "lineage"}
+    header = pickle.dumps(dict(header, arrays=layout), protocol=pickle.HIGHEST_PROTOCOL)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+        tmp.write(struct.pack("<Q", len(header)) + header)
+        base = _aligned(8 + len(header))
+        for name, array in arrays.items():
+            tmp.write(b"\0" * (base + layout[name][0] - tmp.tell()))
+            tmp.write(array.tobytes())
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp.name, path)
+    logger.info("Published shared cache generation %s to %s", snapshot["generation"], path)
+
+
+class Publisher:
+    """Runs in the gunicorn master: builds the first snapshot, then keeps it current."""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self.generation = 0
+        self.fingerprint = None
+        self.built_at = 0.0
+        # Separate from graph.driver: workers must never inherit a driver the master uses
+        self.driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        self._stop = threading.Event()
+
+    def rebuild(self) -> None:
+        self.generation += 1
+        snapshot = build_snapshot(self.driver, self.generation)
+        publish(snapshot, self.path)
+        self.fingerprint = snapshot["fingerprint"]
+        self.built_at = snapshot["built_at"]
+
+    def poll_once(self) -> bool:
+        """Rebuilds if the graph changed or the snapshot is too old; returns True if it did."""
+        stale = time.time() - self.built_at > SHARED_CACHE_MAX_AGE_SECONDS
+        if stale or graph_fingerprint(self.driver) != self.fingerprint:
+            self.rebuild()
+            return True
+        return False
+
+    def _run(self) -> None:
+        while not self._stop.wait(SHARED_CACHE_POLL_SECONDS):
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error("Shared cache refresh failed, workers keep generation %s: %s", self.generation, e)
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="shared-cache-publisher", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.driver.close()
+
+
+# ---------------------------------------------------------------------------
+# Worker side: load and apply
+# ---------------------------------------------------------------------------
+
+class LineageIndex:
+    """Read-only view of the lineage arrays of a mapped snapshot file."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.arrays["ids"])
+
+    def __contains__(self, dataproduct_id: str) -> bool:
+        return self.position(dataproduct_id) is not None
+
+    def position(self, dataproduct_id: str) -> Optional[int]:
+        ids, key = self.arrays["ids"], dataproduct_id.encode("utf-8")
+        i = int(np.searchsorted(ids, key))
+        return i if i < len(ids) and ids[i] == key else None
+
+    def _text(self, column: str, i: int) -> Optional[str]:
+        if self.arrays[f"{column}_null"][i]:
+            return None
+        offsets = self.arrays[f"{column}_offsets"]
+        return self.arrays[f"{column}_blob"][offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def product(self, i: int) -> Dict:
+        return {"id": self.arrays["ids"][i].decode("utf-8"), "name": self._text("name", i),
+                "domain": self._text("domain", i)}
+
+    def neighbours(self, direction: str, i: int) -> np.ndarray:
+        indptr = self.arrays[f"{direction}_indptr"]
+        return self.arrays[f"{direction}_indices"][indptr[i]:indptr[i + 1]]
+
+
+def read_snapshot(path: str) -> Dict:
+    """Maps a published snapshot; its lineage arrays are views into the mapping."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (header_length,) = struct.unpack_from("<Q", mm, 0)
+    snapshot = pickle.loads(mm[8:8 + header_length])
+    base = _aligned(8 + header_length)
+    # The arrays keep the mapping alive, and with it the replaced file, until
+    # the worker drops this generation
+    snapshot["lineage"] = LineageIndex({
+        name: np.frombuffer(mm, dtype=np.dtype(dtype), count=count, offset=base + offset)
+        for name, (offset, dtype, count) in snapshot.pop("arrays").items()
+    })
+    return snapshot
+
+
+class SharedCache:
+    """
+    Worker view of the published snapshot. `maybe_reload()` is cheap (a
+    throttled stat) and hands a newer generation to the registered consumers.
+    """
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self.snapshot: Optional[Dict] = None
+        self._file_id = None
+        self._checked_at = 0.0
+        self._consumers = []
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> Optional[int]:
+        return self.snapshot["generation"] if self.snapshot else None
+
+    def subscribe(self, consumer) -> None:
+        """`consumer(snapshot)` is called with every newly loaded generation."""
+        self._consumers.append(consumer)
+        if self.snapshot:
+            consumer(self.snapshot)
+
+    def load(self) -> bool:
+        """Loads the published file if it changed since the last load."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        # Every publish renames a new file into place, so the inode changes even
+        # when two generations land within the filesystem's mtime resolution
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id == self._file_id:
+            return False
+        with self._lock:
+            snapshot = read_snapshot(self.path)
+            self.snapshot = snapshot
+            self._file_id = file_id
+        for consumer in self._consumers:
+            consumer(snapshot)
+        logger.info("Loaded shared cache generation %s", snapshot["generation"])
+        return True
+
+    def reload_due(self) -> bool:
+        return time.monotonic() - self._checked_at >= RECHECK_INTERVAL_SECONDS
+
+    def maybe_reload(self) -> None:
+        if not self.reload_due():
+            return
+        self._checked_at = time.monotonic()
+        try:
+            self.load()
+        except Exception as e:
+            logger.error("Could not load shared cache from %s: %s", self.path, e)
+
+    def lineage(self, dataproduct_id: str, direction: str, depth: int) -> Optional[List[Dict]]:
+        """
+        Breadth-first FEEDS_INTO traversal over the shared adjacency, in the same
+        shape and order as catalog_queries.lineage_query; None if not loaded.
+        """
+        if not self.snapshot:
+            return None
+        lineage = self.snapshot["lineage"]
+        start = lineage.position(dataproduct_id)
+        if start is None:
+            return []
+        items = []
+        for name in (["upstream", "downstream"] if direction == "both" else [direction]):
+            # The start is not marked as visited: like the Cypher paths, a cycle
+            # leads back to it and lists it at the cycle's length
+            hops = {}
+            queue = deque([(start, 0)])
+            while queue:
+                current, distance = queue.popleft()
+                if distance == depth:
+                    continue
+                for neighbour in lineage.neighbours(name, current).tolist():
+                    if neighbour not in hops:
+                        hops[neighbour] = distance + 1
+                        queue.append((neighbour, distance + 1))
+            for other, distance in hops.items():
+                items.append({"direction": name, **lineage.product(other), "hops": distance})
+        items.sort(key=lambda item: (item["direction"] != "upstream", item["hops"], item["name"] or ""))
+        return items
+
+
+shared_cache = SharedCache()
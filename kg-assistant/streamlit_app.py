@@ -1,28 +1,142 @@
 import streamlit as st
 import requests
+import json
+import os
+
+API_URL = os.getenv("KG_API_URL", "http://localhost:8000")
+# Rows per table page; later pages are fetched from /ask/page only when viewed
+PAGE_SIZE = 100
+# How long fetched result pages stay cached (seconds)
+PAGE_CACHE_TTL = 600
 
 st.set_page_config(page_title="Data Product KG Assistant 💡", layout="centered")
 st.title("🧠 Data Product - Knowledge Graph Assistant")
 st.markdown("Ask questions about your data products using natural language.")
 
+
+def normalize_question(question: str) -> str:
+    """Same normalization the API uses to coalesce duplicate questions."""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+@st.cache_data(ttl=PAGE_CACHE_TTL, show_spinner=False)
+def fetch_page(page_token: str, page_size: int) -> dict:
+    response = requests.post(
+        f"{API_URL}/ask/page",
+        json={"page_token": page_token, "page_size": page_size},
+        timeout=(5, 60)
+    )
+    response.raise_for_status()
+    return response.json()
+
+def stream_answer(question: str, boxes: dict) -> dict:
+    """
+    Consumes /ask/stream, rendering the Cypher, the first page of rows and the
+    answer tokens into `boxes` as they arrive. Returns the cache entry.
+    """
+    entry = {"question": question, "cypher": None, "pages": [[]], "next_tokens": [None],
+             "total": None, "truncated": False, "answer": "", "timings": {}}
+    rows = entry["pages"][0]
+    # /ask/stream emits one JSON event per line as each stage completes
+    with requests.post(
+        f"{API_URL}/ask/stream",
+        json={"question": question, "page_size": PAGE_SIZE},
+        stream=True,
+        timeout=(5, 60)
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            kind = event.get("event")
+            if kind == "cypher":
+                entry["cypher"] = event["cypher"]
+                boxes["cypher"].code(event["cypher"], language="cypher")
+            elif kind == "row":
+                rows.append(event["data"])
+                if len(rows) % 25 == 1:
+                    boxes["table"].caption(f"📥 {len(rows)} rows received...")
+            elif kind == "rows_done":
+                entry["next_tokens"][0] = event.get("next_page_token")
+                entry["total"] = event.get("total")
+                entry["truncated"] = event.get("truncated", False)
+                boxes["table"].dataframe(rows, use_container_width=True)
+            elif kind == "token":
+                entry["answer"] += event["text"]
+                boxes["answer"].info(entry["answer"])
+            elif kind == "done":
+                entry["timings"] = event.get("timings_ms", {})
+            elif kind == "error":
+                raise RuntimeError(event["error"])
+    return entry
+
+def render_results(key: str, entry: dict, box) -> None:
+    """Paginated results table; pages past the first are fetched on demand and kept in `entry`."""
+    pages, next_tokens = entry["pages"], entry["next_tokens"]
+    if not pages[0]:
+        box.caption("No rows returned.")
+        return
+    with box.container():
+        has_more = next_tokens[-1] is not None
+        page_count = len(pages) + (1 if has_more else 0)
+        page_number = 1
+        if page_count > 1:
+            page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1,
+                                          step=1, key=f"page-{key}")
+        if page_number > len(pages):
+            with st.spinner("Fetching rows..."):
+                page = fetch_page(next_tokens[-1], PAGE_SIZE)
+            pages.append(page["results"] or [])
+            next_tokens.append(page["next_page_token"])
+        rows = pages[page_number - 1]
+        # st.dataframe only draws the visible rows, unlike st.json
+        st.dataframe(rows, use_container_width=True)
+        first = (page_number - 1) * PAGE_SIZE + 1
+        total = f"of {entry['total']}" if entry["total"] is not None else ""
+        note = " (result capped)" if entry["truncated"] else ""
+        st.caption(f"Rows {first}-{first + len(rows) - 1} {total}{note}")
+
+def render_timings(timings: dict, box) -> None:
+    if not timings:
+        return
+    with box.container():
+        st.caption("⏱️ Backend timings")
+        stages = list(timings.items())
+        # One row of metrics per four stages
+        for i in range(0, len(stages), 4):
+            for column, (stage, ms) in zip(st.columns(4), stages[i:i + 4]):
+                column.metric(stage.removesuffix("_ms").replace("_", " "), f"{ms:.0f} ms")
+
+
+# Answers are cached per question for the session, so Streamlit reruns
+# (every widget interaction) do not ask the backend again.
+answers = st.session_state.setdefault("answers", {})
+
 question = st.text_input("💬 Ask a question:")
+col_ask, col_refresh = st.columns([1, 1])
+ask = col_ask.button("Get Answer")
+refresh = col_refresh.button("Ask again", help="Ignore the cached answer for this question")
+key = normalize_question(question)
 
-if st.button("Get Answer") and question:
+boxes = {"cypher": st.empty(), "table": st.empty(), "answer": st.empty(), "timings": st.empty()}
+
+if question and (refresh or (ask and key not in answers)):
+    answers.pop(key, None)
+    st.session_state.pop(f"page-{key}", None)
     with st.spinner("🔎 Thinking..."):
         try:
-            response = requests.post(
-                "http://localhost:8000/ask",
-                json={"question": question},
-                timeout=60
-            )
-            response.raise_for_status()
-            data = response.json()
-            st.code(data.get("cypher", ""), language="cypher")
-            if "results" in data:
-                st.json(data["results"])
-            if "answer" in data:
-                st.success(data["answer"])
-            if "error" in data:
-                st.error(data["error"])
+            answers[key] = stream_answer(question, boxes)
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
+
+entry = answers.get(key) if question else None
+if entry:
+    if entry["cypher"]:
+        boxes["cypher"].code(entry["cypher"], language="cypher")
+    try:
+        render_results(key, entry, boxes["table"])
+    except Exception as e:
+        st.error(f"❌ Error fetching rows: {str(e)}")
+    if entry["answer"]:
+        boxes["answer"].success(entry["answer"])
+    render_timings(entry["timings"], boxes["timings"])
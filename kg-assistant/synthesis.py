@@ -0,0 +1,145 @@
+"""
+Token-budgeted answer synthesis for questions answered through Text2Cypher.
+
+plan_synthesis() decides, per result, whether the LLM needs to write the
+answer at all and, if so, what it gets to see:
+
+  direct   - empty results, single values and "list/show ..." questions are
+             answered without the LLM; the table is the answer
+  full     - the rows serialized one per line, when they fit the budget
+  summary  - row count and per-column aggregates (min/max/mean for numbers,
+             distinct count and top-k values otherwise), followed by as many
+             leading rows as still fit
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token.
+"""
+
+import json
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from config import ANSWER_TOKEN_BUDGET, ANSWER_TOP_K
+
+CHARS_PER_TOKEN = 4
+
+# Questions asking for the rows themselves rather than an explanation
+LISTING_QUESTION = re.compile(r"^\s*(list|show|get|display|give me|return|enumerate|find all)\b", re.IGNORECASE)
+
+# Running totals reported by /stats/synthesis. plan_synthesis runs in
+# threadpool workers, so updates and reads go through totals_lock.
+totals = {"questions": 0, "direct": 0, "full": 0, "summary": 0, "full_tokens": 0, "tokens_saved": 0}
+totals_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def row_line(row: dict) -> str:
+    return json.dumps(row, default=str)
+
+def _label(column: str) -> str:
+    """'DataProductCount' / 'data_product_count' -> 'Data product count'."""
+    words = re.sub(r"(?<=[a-z0-9])(?=[A-Z])|_+", " ", column).split()
+    return " ".join(words).capitalize() if words else column
+
+def direct_answer(question: str, rows: List[dict]) -> Optional[str]:
+    """Answer for results that need no prose, or None if the LLM should write one."""
+    if not rows:
+        return "No matching results were found."
+    if len(rows) == 1 and len(rows[0]) == 1:
+        (column, value), = rows[0].items()
+        return f"{_label(column)}: {value}."
+    if LISTING_QUESTION.match(question):
+        return f"Found {len(rows)} result(s); see the results table."
+    return None
+
+def _hashable(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else json.dumps(value, default=str)
+
+def column_aggregates(rows: List[dict], top_k: int = ANSWER_TOP_K) -> Dict[str, Dict]:
+    columns = list(rows[0].keys()) if rows else []
+    aggregates = {}
+    for column in columns:
+        values = [row.get(column) for row in rows if row.get(column) is not None]
+        summary = {"non_null": len(values)}
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if values and len(numbers) == len(values):
+            summary.update(min=min(numbers), max=max(numbers), sum=sum(numbers),
+                           mean=round(sum(numbers) / len(numbers), 4))
+        else:
+            if values and all(isinstance(v, list) for v in values):
+                # Count list elements (tags, names...) rather than whole lists
+                values = [item for v in values for item in v]
+            counts = Counter(_hashable(v) for v in values)
+            summary["distinct"] = len(counts)
+            top = counts.most_common(top_k)
+            # Top values only say something when some of them repeat
+            if top and top[0][1] > 1:
+                summary["top"] = top
+        aggregates[column] = summary
+    return aggregates
+
+def summary_header(rows: List[dict], budget: int, top_k: int = ANSWER_TOP_K) -> str:
+    """
+    Row count and per-column aggregates within `budget` tokens: top-k values
+    are cut down first, then the aggregates dropped, then the header truncated.
+    """
+    intro = f"The query returned {len(rows)} rows, too many to list."
+    while True:
+        header = (f"{intro} Per-column summary:\n"
+                  f"{json.dumps(column_aggregates(rows, top_k), default=str)}\n"
+                  f"First rows of the result:")
+        if estimate_tokens(header) <= budget or top_k == 0:
+            break
+        top_k //= 2
+    if estimate_tokens(header) > budget:
+        header = f"{intro}\nFirst rows of the result:"
+    return header[:max(budget, 0) * CHARS_PER_TOKEN]
+
+def plan_synthesis(question: str, rows: List[dict], budget: int = ANSWER_TOKEN_BUDGET,
+                   top_k: int = ANSWER_TOP_K) -> Dict:
+    """
+    Returns {"mode", "answer", "context", "rows", "full_tokens", "context_tokens",
+    "tokens_saved"}. `answer` is set for mode "direct"; otherwise `context` is
+    what goes into the answer prompt in place of the full result.
+    """
+    lines = [row_line(row) for row in rows]
+    full_tokens = sum(estimate_tokens(line) + 1 for line in lines)
+    plan = {"mode": "full", "answer": direct_answer(question, rows), "context": None,
+            "rows": len(rows), "full_tokens": full_tokens}
+
+    if plan["answer"] is not None:
+        plan["mode"] = "direct"
+    elif full_tokens <= budget:
+        plan["context"] = "\n".join(lines)
+    else:
+        plan["mode"] = "summary"
+        header = summary_header(rows, budget, top_k)
+        remaining, sample = budget - estimate_tokens(header), []
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+            sample.append(line)
+            remaining -= cost
+        plan["context"] = "\n".join([header] + sample)
+
+    plan["context_tokens"] = estimate_tokens(plan["context"]) if plan["context"] else 0
+    plan["tokens_saved"] = full_tokens - plan["context_tokens"]
+    with totals_lock:
+        totals["questions"] += 1
+        totals[plan["mode"]] += 1
+        totals["full_tokens"] += full_tokens
+        totals["tokens_saved"] += plan["tokens_saved"]
+    return plan
+
+def totals_snapshot() -> Dict:
+    """A consistent copy of the running totals."""
+    with totals_lock:
+        return dict(totals)
+
+def plan_stats(plan: Dict) -> Dict:
+    """The part of a plan reported to clients."""
+    return {key: plan[key] for key in ("mode", "rows", "full_tokens", "context_tokens", "tokens_saved")}
@@ -0,0 +1,154 @@
+"""
+Fixtures for running the /ask pipeline in-process against a stub Neo4j
+driver and a stub LLM.
+
+The private utils.types package is not part of this repository, so the load
+test's stand-in is registered before llm (and so api_server) is imported.
+"""
+
+import os
+import re
+import sys
+
+import pytest
+from neo4j import Record
+from neo4j_graphrag.llm import LLMInterface
+from neo4j_graphrag.llm.types import LLMResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.update({
+    "NEO4J_URI": "bolt://stub:7687", "NEO4J_USER": "stub", "NEO4J_PASSWORD": "stub",
+    "LLM_BASE_URL": "http://stub", "LLM_API_KEY": "stub", "LLM_DEFAULT_MODEL": "stub",
+})
+os.environ.pop("SHARED_CACHE_PATH", None)
+
+from load_test import install_module_standins  # noqa: E402
+
+
+class StubLLM(LLMInterface):
+    """Answers Text2Cypher prompts with `cypher` and anything else with a fixed sentence."""
+
+    cypher = "MATCH (dp:DataProduct) RETURN dp.name AS Name, dp.domain AS Domain"
+
+    def __init__(self, api_key: str = None, **kwargs):
+        super().__init__(model_name="stub")
+        self.prompts = []
+
+    def invoke(self, input, message_history=None, system_instruction=None) -> LLMResponse:
+        self.prompts.append(input)
+        if "Cypher statement" in input:
+            return LLMResponse(content=self.cypher)
+        return LLMResponse(content="A stub answer.")
+
+    async def ainvoke(self, input, message_history=None, system_instruction=None) -> LLMResponse:
+        return self.invoke(input, message_history, system_instruction)
+
+
+install_module_standins()
+
+
+class StubSummary:
+    query_type = "r"
+    result_available_after = 1
+    result_consumed_after = 0
+
+    def __init__(self, plan=None):
+        self.plan = plan
+
+
+class StubResult:
+    def __init__(self, keys, rows, plan=None):
+        self._keys = keys
+        self._records = [Record(zip(keys, row)) for row in rows]
+        self._summary = StubSummary(plan)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def keys(self):
+        return list(self._keys)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return self._summary
+
+
+class StubDriver:
+    """
+    Neo4j driver stand-in: EXPLAIN returns a small read-only plan and any other
+    query returns `rows` rows shaped by its RETURN aliases, windowed by the
+    page parameters run_cypher_page adds. `executions` lists the non-EXPLAIN
+    queries run and `parameters` their parameters.
+    """
+
+    def __init__(self, rows: int = 3):
+        self.rows = rows
+        self.executions = []
+        self.parameters = []
+
+    def session(self, **config):
+        return StubSession(self)
+
+    def run(self, text: str, params: dict) -> StubResult:
+        if text.lstrip().upper().startswith("EXPLAIN"):
+            return StubResult([], [], plan={"operatorType": "ProduceResults@neo4j",
+                                            "args": {"EstimatedRows": float(self.rows)}, "children": []})
+        self.executions.append(text)
+        self.parameters.append(params)
+        keys = re.findall(r"\bAS\s+(\w+)", text.split("RETURN")[-1]) or ["value"]
+        skip = params.get("__page_skip", 0)
+        window = range(self.rows)[skip:skip + params.get("__page_limit", self.rows)]
+        return StubResult(keys, [[f"{key}{i}" for key in keys] for i in window])
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubSession:
+    def __init__(self, driver: StubDriver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def run(self, query, parameters=None, **kwargs):
+        return self.driver.run(getattr(query, "text", query), dict(parameters or {}, **kwargs))
+
+
+@pytest.fixture
+def stub_driver(monkeypatch):
+    import graph
+    driver = StubDriver()
+    monkeypatch.setattr(graph, "driver", driver)
+    return driver
+
+
+@pytest.fixture
+def api(stub_driver, monkeypatch):
+    """api_server with warm caches and a RAG pipeline over the stub LLM and driver."""
+    import neo4j
+    from neo4j_graphrag.generation import GraphRAG
+    import api_server
+    from retriever import GuardedText2CypherRetriever
+
+    monkeypatch.setattr(api_server, "my_LLMClient", StubLLM())
+    api_server.schema_snapshot.load({"DataProduct": ["name", "domain"]}, [])
+    api_server.catalog_index.load(["RawSalesData"], ["Sales"])
+    # The retriever only checks the server version at construction; execution goes
+    # through graph.get_driver(), i.e. the stub
+    monkeypatch.setattr(GuardedText2CypherRetriever, "VERIFY_NEO4J_VERSION", False)
+    unconnected = neo4j.GraphDatabase.driver("bolt://stub:7687", auth=("stub", "stub"))
+    retriever = GuardedText2CypherRetriever(driver=unconnected, llm=api_server.my_LLMClient,
+                                            neo4j_schema=api_server.schema_snapshot.render())
+    monkeypatch.setattr(api_server, "retriever", retriever)
+    monkeypatch.setattr(api_server, "rag", GraphRAG(retriever=retriever, llm=api_server.my_LLMClient))
+    yield api_server
+    unconnected.close()
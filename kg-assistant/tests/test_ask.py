@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from neo4j import Record
+
+import retriever
+
+QUESTION = "Which data products are scheduled daily?"
+
+
+def test_retriever_returns_neo4j_records(api, stub_driver):
+    search = api.retriever.get_search_results(QUESTION)
+    assert search.records and all(isinstance(record, Record) for record in search.records)
+    assert search.records[0].data() == {"Name": "Name0", "Domain": "Domain0"}
+
+
+def test_graphrag_search(api, stub_driver):
+    result = api.get_rag().search(QUESTION, return_context=True)
+    assert result.answer == "A stub answer."
+    assert len(result.retriever_result.items) == stub_driver.rows
+
+
+def test_ask_llm_path(api, stub_driver):
+    response = asyncio.run(api.ask_endpoint(api.AskRequest(question=QUESTION)))
+    assert response["results"] == [{"Name": f"Name{i}", "Domain": f"Domain{i}"} for i in range(stub_driver.rows)]
+    assert response["answer"] == "A stub answer."
+
+
+def collect_stream(api, question: str, page_size: int = 200, columnar: bool = False) -> list:
+    async def collect():
+        return [json.loads(event) async for event in api.ask_stream_events(question, page_size, columnar)]
+    return asyncio.run(collect())
+
+
+def test_one_db_execution_per_llm_question(api, stub_driver):
+    response = asyncio.run(api.ask_endpoint(api.AskRequest(question=QUESTION)))
+    # EXPLAINs from the guard are not executions; the retriever's rows are the results
+    assert len(stub_driver.executions) == 1
+    assert response["db_executions"] == 1
+
+
+def test_one_db_execution_per_routed_question(api, stub_driver):
+    response = asyncio.run(api.ask_endpoint(api.AskRequest(question="How many data products are there?")))
+    assert response["intent"] == "count_products"
+    assert len(stub_driver.executions) == 1
+    assert response["db_executions"] == 1
+
+
+def test_one_db_execution_per_streamed_question(api, stub_driver):
+    events = collect_stream(api, "List the data products scheduled daily")
+    assert events[-1]["event"] == "done"
+    assert len(stub_driver.executions) == 1
+    assert events[-1]["db_executions"] == 1
+
+
+def test_columnar_stream(api, stub_driver):
+    events = collect_stream(api, "List the data products scheduled daily", page_size=2, columnar=True)
+    [columns] = [e["columns"] for e in events if e["event"] == "columns"]
+    rows = [e["data"] for e in events if e["event"] == "row"]
+    assert rows == [[f"{column}{i}" for column in columns] for i in range(2)]
+    assert events.index(next(e for e in events if e["event"] == "columns")) < \
+        events.index(next(e for e in events if e["event"] == "row"))
+
+    stub_driver.rows = 0
+    events = collect_stream(api, "List the data products scheduled daily", columnar=True)
+    assert [e["columns"] for e in events if e["event"] == "columns"] == [[]]
+
+
+def test_truncated_only_past_row_cap(api, stub_driver, monkeypatch):
+    monkeypatch.setattr(retriever, "LLM_QUERY_ROW_CAP", 3)
+    monkeypatch.setattr(api, "LLM_QUERY_ROW_CAP", 3)
+
+    stub_driver.rows = 3
+    response = asyncio.run(api.ask_endpoint(api.AskRequest(question=QUESTION)))
+    assert len(response["results"]) == 3 and not response["truncated"]
+    rows_done = next(e for e in collect_stream(api, "List " + QUESTION) if e["event"] == "rows_done")
+    assert rows_done["total"] == 3 and not rows_done["truncated"]
+
+    stub_driver.rows = 4
+    response = asyncio.run(api.ask_endpoint(api.AskRequest(question=QUESTION)))
+    assert len(response["results"]) == 3 and response["truncated"]
+    rows_done = next(e for e in collect_stream(api, "List " + QUESTION) if e["event"] == "rows_done")
+    assert rows_done["total"] == 3 and rows_done["truncated"]
+
+
+def test_ready_on_empty_graph(api, stub_driver, monkeypatch):
+    stub_driver.rows = 0
+    api.schema_snapshot.refresh()
+    api.catalog_index.load([], [])
+    monkeypatch.setitem(api.startup_stats, "ready", True)
+    response = asyncio.run(api.readyz())
+    assert response.status_code == 200, response.body
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+
+from llm import CircuitBreaker, EndpointMetrics, RetryableStatus, Tool, ToolLLM
+
+
+def tool_failing_with(error: BaseException) -> Tool:
+    tool = Tool(base_url="http://stub", api_key="stub", max_retries=0, breaker_threshold=2)
+
+    async def post(url, payload, metrics):
+        raise error
+    tool._post_hedged = post
+    return tool
+
+
+@pytest.mark.parametrize("error", [
+    RetryableStatus(503, "unavailable"),
+    aiohttp.ClientConnectionError("refused"),
+    asyncio.TimeoutError(),
+])
+def test_endpoint_failures_open_breaker(error):
+    tool = tool_failing_with(error)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(tool._post_with_retries("http://stub/completions", {}, "completions"))
+    assert tool._breaker.state == "open"
+
+
+@pytest.mark.parametrize("error", [
+    RetryableStatus(429, "slow down"),
+    RuntimeError("XsAI API error: 400, bad request"),
+    asyncio.CancelledError(),
+])
+def test_client_errors_and_cancellation_do_not_count(error):
+    tool = tool_failing_with(error)
+    for _ in range(3):
+        with pytest.raises((RuntimeError, asyncio.CancelledError)):
+            asyncio.run(tool._post_with_retries("http://stub/completions", {}, "completions"))
+    assert tool._breaker.state == "closed" and tool._breaker.failures == 0
+
+
+def test_ignored_call_frees_half_open_trial():
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_ignored()
+    # The next call may be the trial
+    breaker.before_call()
+
+
+def test_hedges_in_flight_are_capped():
+    tool = Tool(base_url="http://stub", api_key="stub", hedge_after=0.01, hedge_max_in_flight=1)
+
+    async def slow_post(url, payload):
+        await asyncio.sleep(0.05)
+        return {"choices": [{"text": "ok"}]}
+    tool._post_once = slow_post
+    metrics = EndpointMetrics()
+
+    async def burst():
+        return await asyncio.gather(*(tool._post_hedged("http://stub/completions", {}, metrics) for _ in range(3)))
+    assert len(asyncio.run(burst())) == 3
+    assert metrics.hedges == 1 and metrics.hedges_skipped == 2
+
+
+def test_tool_llm_invokes_from_worker_thread_through_tool():
+    tool = Tool(base_url="http://stub", api_key="stub")
+
+    async def post(url, payload, metrics):
+        return {"choices": [{"text": f" echo: {payload['prompt']} "}]}
+    tool._post_hedged = post
+    llm = ToolLLM(tool)
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        llm.bind_loop(loop)
+        response = llm.invoke("question", system_instruction="system")
+        assert response.content == "echo: system\n\nquestion"
+        assert tool.metrics()["completions"]["requests"] == 1
+    finally:
+        asyncio.run_coroutine_threadsafe(tool.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
@@ -0,0 +1,22 @@
+import asyncio
+import os
+
+import load_test
+
+
+def test_load_test_runs_a_few_requests(monkeypatch):
+    import api_server
+    import graph
+    # run() repoints the environment, the driver and the API's clients; restore them afterwards
+    monkeypatch.setattr(os, "environ", os.environ.copy())
+    monkeypatch.setattr(graph, "driver", None)
+    monkeypatch.setattr(api_server, "retriever", None)
+    monkeypatch.setattr(api_server, "rag", None)
+    monkeypatch.setattr(api_server.llm_tool, "base_url", api_server.llm_tool.base_url)
+
+    args = load_test.parse_args(["--requests", "20", "--concurrency", "4", "--llm-latency-ms", "10",
+                                 "--llm-jitter-ms", "0", "--llm-token-ms", "0", "--db-latency-ms", "0"])
+    report = asyncio.run(load_test.run(args))
+    assert report["requests_ok"] == 20 and not report["errors"]
+    assert report["db_executions_per_question"] == {"1": 20}
+    assert report["llm_requests"] > 0
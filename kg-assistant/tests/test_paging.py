@@ -0,0 +1,42 @@
+import pytest
+
+from graph import InvalidPageToken, can_page, page_window, run_cypher_next_page, run_cypher_page
+
+
+def test_pages_query_with_unaliased_return(stub_driver):
+    stub_driver.rows = 5
+    cypher = "MATCH (dp:DataProduct) RETURN dp.name"
+    first = run_cypher_page(cypher, page_size=2)
+    assert first["rows"] == [{"value": "value0"}, {"value": "value1"}]
+    # No CALL { } wrapper for the RETURN to alias: the window is appended to it
+    assert stub_driver.executions == [f"{cypher}\nSKIP $__page_skip LIMIT $__page_limit"]
+
+    second = run_cypher_next_page(first["next_page_token"], page_size=2)
+    third = run_cypher_next_page(second["next_page_token"], page_size=2)
+    assert [row["value"] for row in second["rows"] + third["rows"]] == ["value2", "value3", "value4"]
+    assert third["next_page_token"] is None and not third["truncated"]
+    # Each page asks the server for its own rows plus one look-ahead row
+    assert [(p["__page_skip"], p["__page_limit"]) for p in stub_driver.parameters] == [(0, 3), (2, 3), (4, 3)]
+
+
+def test_page_stops_at_row_cap(stub_driver):
+    stub_driver.rows = 5
+    page = run_cypher_page("MATCH (dp:DataProduct) RETURN dp.name AS name", page_size=2, offset=2, max_rows=4)
+    assert [row["name"] for row in page["rows"]] == ["name2", "name3"]
+    assert page["truncated"] and page["next_page_token"] is None
+
+
+def test_window_folds_into_existing_skip_and_limit():
+    query, params = page_window("MATCH (n) RETURN n.name AS name ORDER BY name SKIP 5 LIMIT $top",
+                                {"top": 10}, offset=8, fetch=3)
+    assert query == "MATCH (n) RETURN n.name AS name ORDER BY name\nSKIP $__page_skip LIMIT $__page_limit"
+    assert params == {"top": 10, "__page_skip": 13, "__page_limit": 2}
+
+
+def test_union_is_served_as_one_page(stub_driver):
+    cypher = "MATCH (a:A) RETURN a.name AS name UNION MATCH (b:B) RETURN b.name AS name"
+    assert not can_page(cypher)
+    page = run_cypher_page(cypher, page_size=2)
+    assert len(page["rows"]) == 2 and page["truncated"] and page["next_page_token"] is None
+    with pytest.raises(InvalidPageToken):
+        run_cypher_page(cypher, page_size=2, offset=2)
@@ -0,0 +1,75 @@
+from shared_cache import SharedCache, graph_fingerprint, publish
+
+
+def snapshot(generation: int, downstream: dict) -> dict:
+    products = {key: (f"Product {key.upper()}", "Sales" if key != "d" else None) for key in "abcde"}
+    upstream = {}
+    for source, targets in downstream.items():
+        for target in targets:
+            upstream.setdefault(target, []).append(source)
+    return {
+        "generation": generation, "built_at": 0.0, "fingerprint": (5, 4, 0),
+        "schema": {"node_properties": {"DataProduct": ["id", "name"]}, "relationships": []},
+        "catalog": {"names": [name for name, _ in products.values()], "domains": ["Sales"]},
+        "lineage": {"products": products, "downstream": downstream, "upstream": upstream},
+    }
+
+
+def test_lineage_is_read_in_place(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    publish(snapshot(1, {"a": ["b"], "b": ["c"], "c": ["d"]}), path)
+    cache = SharedCache(path)
+    assert cache.load()
+    lineage = cache.snapshot["lineage"]
+    assert "a" in lineage and "z" not in lineage
+    # Views into the mapped file, not per-worker copies
+    assert all(not array.flags.owndata and not array.flags.writeable for array in lineage.arrays.values())
+    assert cache.snapshot["catalog"]["domains"] == ["Sales"]
+
+    assert cache.lineage("c", "both", 3) == [
+        {"direction": "upstream", "id": "b", "name": "Product B", "domain": "Sales", "hops": 1},
+        {"direction": "upstream", "id": "a", "name": "Product A", "domain": "Sales", "hops": 2},
+        {"direction": "downstream", "id": "d", "name": "Product D", "domain": None, "hops": 1},
+    ]
+    assert cache.lineage("a", "downstream", 1) == [
+        {"direction": "downstream", "id": "b", "name": "Product B", "domain": "Sales", "hops": 1},
+    ]
+    assert cache.lineage("z", "both", 3) == []
+
+
+def test_lineage_lists_start_on_a_cycle(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    publish(snapshot(1, {"a": ["b"], "b": ["c"], "c": ["a"]}), path)
+    cache = SharedCache(path)
+    cache.load()
+    downstream = cache.lineage("a", "downstream", 3)
+    assert [(item["id"], item["hops"]) for item in downstream] == [("b", 1), ("c", 2), ("a", 3)]
+    # Outside the depth, the cycle does not reach back to the start
+    assert [item["id"] for item in cache.lineage("a", "downstream", 2)] == ["b", "c"]
+
+
+def test_reload_maps_new_generation(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    publish(snapshot(1, {}), path)
+    cache = SharedCache(path)
+    cache.load()
+    old_lineage = cache.snapshot["lineage"]
+    publish(snapshot(2, {"a": ["e"]}), path)
+    assert cache.load()
+    assert cache.generation == 2
+    assert cache.lineage("e", "upstream", 1)[0]["id"] == "a"
+    # The previous generation stays readable while still referenced
+    assert old_lineage.product(0)["id"] == "a"
+
+
+def test_fingerprint_includes_latest_update(stub_driver):
+    class Counts:
+        def single(self):
+            return {"nodes": 5, "relationships": 4, "changes": 0, "updated_at": stub_driver.updated_at}
+
+    stub_driver.run = lambda text, params: Counts()
+    stub_driver.updated_at = "2025-01-01T12:00:00"
+    before = graph_fingerprint(stub_driver)
+    # A property-only edit leaves every count unchanged
+    stub_driver.updated_at = "2025-01-01T12:05:00"
+    assert graph_fingerprint(stub_driver) != before
@@ -0,0 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from synthesis import plan_synthesis, totals_snapshot
+
+
+def wide_rows(count: int, columns: int) -> list:
+    return [{f"column_{c}": f"value {r % 7} of a fairly long text column {c}" for c in range(columns)}
+            for r in range(count)]
+
+
+def test_summary_fits_budget_with_large_header():
+    plan = plan_synthesis("why are these products related?", wide_rows(500, 60), budget=300)
+    assert plan["mode"] == "summary"
+    assert plan["context_tokens"] <= 300
+
+
+def test_summary_samples_rows_after_header():
+    rows = wide_rows(200, 3)
+    plan = plan_synthesis("why are these products related?", rows, budget=400)
+    assert plan["mode"] == "summary"
+    assert plan["context_tokens"] <= 400
+    assert plan["context"].count("\n") > 3
+
+
+def test_totals_are_exact_under_concurrency():
+    before = totals_snapshot()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: plan_synthesis("list the products", [{"name": "a"}]), range(400)))
+    after = totals_snapshot()
+    assert after["questions"] - before["questions"] == 400
+    assert sum(after[mode] - before[mode] for mode in ("direct", "full", "summary")) == 400
@@ -0,0 +1,192 @@
+"""
+Per-request tracing for the /ask pipeline.
+
+trace_request() starts a Trace for one question and holds it in a context
+variable, so graph.py, llm.py and retriever.py can open spans without the
+trace being passed around (the threadpool and async tasks inherit it):
+
+    with span("neo4j_query") as attrs:
+        ...
+        attrs["rows"] = len(rows)
+
+Every finished span is also recorded in a per-stage latency histogram,
+exposed in Prometheus text format at /metrics, and every finished trace is
+offered to the slow-query log, which keeps the SLOW_QUERY_LOG_SIZE slowest.
+"""
+
+import bisect
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from config import SLOW_QUERY_LOG_SIZE, SLOW_QUERY_THRESHOLD_MS
+from synthesis import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class StageMetrics:
+    """One histogram per span/trace name."""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, elapsed_ms: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(elapsed_ms)
+
+    def render_prometheus(self) -> str:
+        name = "kg_assistant_stage_duration_ms"
+        lines = [f"# HELP {name} Duration of /ask pipeline stages in milliseconds.",
+                 f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {round(histogram.sum, 3)}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans of one request, with offsets relative to its start."""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Dict] = []
+        self.duration_ms: Optional[float] = None
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 1)
+
+    def timings(self) -> Dict[str, float]:
+        """Total milliseconds per span name ("<name>_ms"), plus "total_ms" once finished."""
+        timings: Dict[str, float] = {}
+        for s in sorted(self.spans, key=lambda s: s["start_ms"]):
+            key = f"{s['name']}_ms"
+            timings[key] = round(timings.get(key, 0.0) + s["duration_ms"], 1)
+        if self.duration_ms is not None:
+            timings["total_ms"] = self.duration_ms
+        return timings
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            **self.attrs,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+class SlowQueryLog:
+    """The `size` slowest traces seen so far, kept in a min-heap on duration."""
+
+    def __init__(self, size: int = SLOW_QUERY_LOG_SIZE, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS):
+        self.size = size
+        self.threshold_ms = threshold_ms
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, trace: Trace) -> None:
+        if trace.duration_ms >= self.threshold_ms:
+            logger.warning("Slow %s (%s ms): %r timings=%s", trace.name, trace.duration_ms,
+                           trace.attrs.get("question"), trace.timings())
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, (trace.duration_ms, next(self._order), trace))
+            elif trace.duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (trace.duration_ms, next(self._order), trace))
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            worst = sorted(self._heap, reverse=True)
+        return [trace.to_dict() for _, _, trace in worst]
+
+
+def token_counts(prompt: str, completion: str, usage: Optional[Dict] = None) -> Dict:
+    """Span attributes for an LLM call: reported usage if the API returned it, else estimates."""
+    if usage and "prompt_tokens" in usage:
+        return {"prompt_tokens": usage["prompt_tokens"], "completion_tokens": usage.get("completion_tokens")}
+    return {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(completion),
+            "tokens_estimated": True}
+
+
+metrics = StageMetrics()
+slow_queries = SlowQueryLog()
+
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def trace_request(name: str, **attrs):
+    """Traces one request; yields the Trace so callers can add attributes (e.g. the Cypher)."""
+    trace = Trace(name, **attrs)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+        trace.finish()
+        metrics.observe(name, trace.duration_ms)
+        slow_queries.offer(trace)
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times a stage of the current trace; yields a dict for attributes (rows, tokens, plan...)."""
+    trace = current_trace.get()
+    parent = _current_span.get()
+    _current_span.set(name)
+    started = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # Not reset(): generators driven through the threadpool end spans in another context
+        _current_span.set(parent)
+        metrics.observe(name, elapsed_ms)
+        if trace is not None:
+            trace.spans.append({
+                "name": name,
+                "parent": parent,
+                "start_ms": round((started - trace.started) * 1000, 1),
+                "duration_ms": round(elapsed_ms, 1),
+                **attrs
+            })
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+One-off backfill of column-level lineage (Column nodes and DERIVES edges)
+from the FieldLineage nodes of data products ingested before it existed.
+Safe to re-run: each product's edges are replaced, not duplicated.
+"""
+
+from kg_registry import DataProductRegistry
+
+def backfill_column_lineage():
+    kgm = DataProductRegistry("bolt://localhost:7687", "neo4j", "password")
+
+    print("🧬 Backfilling column lineage from FieldLineage nodes...")
+    kgm.backfill_column_lineage()
+
+if __name__ == "__main__":
+    backfill_column_lineage()
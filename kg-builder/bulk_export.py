@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Offline export of DataProduct definitions to `neo4j-admin database import` CSVs,
+for first-time loads into an empty database.
+
+Input is JSONL, one record per line:
+
+    {"name": "RawSalesData", "type": "Table", "tags": ["raw", "sales"], ...}   # DataProduct(**record)
+    {"link": "TRIGGERS", "from": "IngestSalesData", "to": "CleanSalesData"}   # pipeline -> pipeline
+    {"link": "PRODUCES", "from": "IngestSalesData", "to": "RawSalesData"}     # pipeline -> product name
+    {"link": "FEEDS_INTO", "from": "RawSalesData", "to": "SalesSummary"}      # product name -> product name
+
+The graph written matches DataProductRegistry.add_dataproduct, in a single
+streaming pass:
+
+  - DataProduct ids are uuid5 of the name, so links resolve by name without
+    holding a name -> id map
+  - merged entities (Tags, Tables, Pipelines, Columns, ...) get a hashed key
+    as import id in their own id space; their 8-byte hashes are kept in a
+    temporary SQLite file (SeenKeys) to drop duplicates, so memory stays
+    bounded, and the first occurrence's attributes win
+  - relationships the registry MERGEs are written once: links (TRIGGERS,
+    PRODUCES, FEEDS_INTO) are deduplicated across the input through SeenKeys,
+    a product's own list-of-dict, HAS_COLUMN and DERIVES relationships within
+    its record (a repeated DERIVES keeps the last transformation, like SET)
+  - attribute nodes (Owner, Team, ...) are shared by their merge_keys from
+    dataproduct_config.yaml, like the registry does, and otherwise exported
+    once per product
+  - nodes with free-form attributes (Owner, Policy, Pipeline, ...) are
+    spooled to a temporary JSONL file and get their CSV header, the union of
+    all keys seen, once the input is exhausted; so are links seen before
+    their DataProducts, for the final dangling-link check
+
+Afterwards, connect a DataProductRegistry once to create the indexes and run
+backfill_versions() for the initial DataProductVersion nodes.
+
+    python bulk_export.py catalog.jsonl --out import/
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+import yaml
+
+from kg_dataproduct import DataProduct
+
+ARRAY_DELIMITER = ";"
+DATAPRODUCT_NAMESPACE = uuid.UUID("6f1c2f0e-8a7d-4a53-9a61-3c1b7e0d9b42")
+
+DATAPRODUCT_PROPERTIES = ["name", "type", "source", "description", "short_description",
+                          "destination", "domain", "subdomain", "environment", "schedule"]
+
+# DataProduct attribute -> (label, relationship), as in add_dataproduct
+MERGED_LISTS = {
+    "tags": ("Tag", "HAS_TAG"),
+    "business_terms": ("BusinessTerm", "HAS_TERM"),
+    "glossary_links": ("Glossary", "GLOSSARY_LINK"),
+    "known_issues": ("KnownIssue", "HAS_ISSUE"),
+    "documentation_links": ("Documentation", "HAS_DOC"),
+    "faqs": ("FAQ", "HAS_FAQ"),
+    "sample_queries": ("Query", "HAS_QUERY"),
+    "tables": ("Table", "USES_TABLE"),
+    "pii_fields": ("PIIField", "HAS_PII"),
+}
+DICTS = {
+    "owner": ("Owner", "OWNED_BY"),
+    "manager": ("Manager", "MANAGED_BY"),
+    "metrics": ("Metrics", "HAS_METRIC"),
+    "data_quality": ("DataQuality", "HAS_QUALITY"),
+    "data_classification": ("Classification", "CLASSIFIED_AS"),
+    "usage_stats": ("UsageStats", "HAS_USAGE"),
+    "team": ("Team", "PART_OF_TEAM"),
+    "access_controls": ("AccessControl", "HAS_ACCESS_CTRL"),
+    "database": ("Database", "STORED_IN"),
+    "schema": ("Schema", "HAS_SCHEMA"),
+}
+LISTS_OF_DICTS = {
+    "stewards": ("Steward", "STEWARDED_BY"),
+    "consumers": ("Consumer", "CONSUMED_BY"),
+    "policies": ("Policy", "HAS_POLICY"),
+    "jobs": ("Job", "HAS_JOB"),
+    "field_lineage": ("FieldLineage", "HAS_FIELD_LINEAGE"),
+}
+
+
+def dataproduct_id(name: str) -> str:
+    return str(uuid.uuid5(DATAPRODUCT_NAMESPACE, name))
+
+def hashed_key(label: str, key: str) -> str:
+    return hashlib.blake2b(f"{label}\0{key}".encode("utf-8"), digest_size=8).hexdigest()
+
+def neo4j_type(value) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, list):
+        return "string[]"
+    return "string"
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return ARRAY_DELIMITER.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return value
+
+
+class SeenKeys:
+    """A set of byte keys in a private temporary SQLite database, so it does not grow in memory."""
+
+    def __init__(self):
+        # An empty filename is a temporary on-disk database, deleted on close
+        self.db = sqlite3.connect("")
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("CREATE TABLE seen (key BLOB PRIMARY KEY) WITHOUT ROWID")
+
+    def add(self, key: bytes) -> bool:
+        """Adds `key`; True if it was not there yet."""
+        return self.db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (key,)).rowcount == 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.db.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() is not None
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class CsvFile:
+    """A data CSV plus its one-line header file."""
+
+    def __init__(self, out_dir: str, name: str, header: List[str], rel_type: Optional[str] = None):
+        self.rel_type = rel_type
+        self.header_path = os.path.join(out_dir, f"{name}_header.csv")
+        self.path = os.path.join(out_dir, f"{name}.csv")
+        with open(self.header_path, "w", newline="") as f:
+            csv.writer(f).writerow(header)
+        self.file = open(self.path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.rows = 0
+
+    def write(self, row: list) -> None:
+        self.writer.writerow([csv_value(value) for value in row])
+        self.rows += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class SpooledNodes:
+    """
+    Nodes whose properties are only known once every record has been seen.
+    Rows go to a temporary JSONL file; close() writes the CSV with the union
+    of keys (and their types) as header.
+    """
+
+    def __init__(self, out_dir: str, label: str):
+        self.out_dir, self.label = out_dir, label
+        self.spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.types: Dict[str, str] = {}
+        self.rows = 0
+
+    def write(self, node_id: str, properties: dict) -> None:
+        for key, value in properties.items():
+            if value is None:
+                continue
+            kind = neo4j_type(value)
+            # Properties with mixed types across nodes fall back to string
+            self.types[key] = kind if self.types.get(key, kind) == kind else "string"
+        self.spool.write(json.dumps([node_id, properties], default=str) + "\n")
+        self.rows += 1
+
+    def close(self) -> "CsvFile":
+        keys = sorted(self.types)
+        header = [f":ID({self.label})"] + [
+            key if self.types[key] == "string" else f"{key}:{self.types[key]}" for key in keys
+        ]
+        out = CsvFile(self.out_dir, f"nodes_{self.label}", header)
+        self.spool.seek(0)
+        for line in self.spool:
+            node_id, properties = json.loads(line)
+            out.write([node_id] + [
+                json.dumps(properties.get(key), default=str)
+                if self.types[key] == "string" and isinstance(properties.get(key), (list, dict))
+                else properties.get(key)
+                for key in keys
+            ])
+        self.spool.close()
+        out.close()
+        return out
+
+
+class BulkExporter:
+
+    def __init__(self, out_dir: str, merge_keys: Optional[Dict[str, List[str]]] = None):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.merge_keys = merge_keys or {}
+        self.nodes: Dict[str, object] = {}
+        self.relationships: Dict[tuple, CsvFile] = {}
+        self.seen = SeenKeys()
+        self.pii_columns = SeenKeys()
+        self.dangling = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.products = 0
+
+    # -- files --------------------------------------------------------------
+
+    def node_file(self, label: str, header: Optional[List[str]] = None):
+        if label not in self.nodes:
+            self.nodes[label] = (CsvFile(self.out_dir, f"nodes_{label}", header) if header
+                                 else SpooledNodes(self.out_dir, label))
+        return self.nodes[label]
+
+    def relate(self, rel_type: str, start_label: str, start_id: str, end_label: str, end_id: str,
+               properties: Optional[dict] = None, unique: bool = False) -> None:
+        """Writes a relationship; with `unique`, only the first one between the same two nodes (like MERGE)."""
+        if unique:
+            digest = hashlib.blake2b(f"{start_id}\0{end_id}".encode("utf-8"), digest_size=8).digest()
+            if not self.seen.add(digest + rel_type.encode("utf-8")):
+                return
+        key = (rel_type, start_label, end_label)
+        if key not in self.relationships:
+            header = [f":START_ID({start_label})", f":END_ID({end_label})"] + list(properties or {})
+            self.relationships[key] = CsvFile(self.out_dir, "rels_" + "_".join(key), header, rel_type)
+        self.relationships[key].write([start_id, end_id] + list((properties or {}).values()))
+
+    def is_exported(self, name: str) -> bool:
+        return bytes.fromhex(dataproduct_id(name).replace("-", "")) + b"DataProduct" in self.seen
+
+    def merged(self, label: str, key: str, write) -> str:
+        """Import id of a merged entity, calling write(node_id) the first time it is seen."""
+        node_id = hashed_key(label, key)
+        marker = bytes.fromhex(node_id) + label.encode("utf-8")
+        if self.seen.add(marker):
+            write(node_id)
+        return node_id
+
+    # -- records ------------------------------------------------------------
+
+    def attribute_node(self, label: str, node_id: str, data: dict) -> str:
+        """Import id of a dict field's node: shared via the label's merge key if configured and present."""
+        keys = self.merge_keys.get(label)
+        if keys and all(data.get(key) is not None for key in keys):
+            return self.merged(label, "\0".join(str(data[key]) for key in keys),
+                               lambda merged_id: self.node_file(label).write(merged_id, data))
+        self.node_file(label).write(node_id, data)
+        return node_id
+
+    def pipeline(self, name: str, properties: Optional[dict] = None) -> str:
+        return self.merged("Pipeline", name,
+                           lambda node_id: self.node_file("Pipeline").write(node_id, dict(properties or {}, name=name)))
+
+    def column(self, key: str) -> str:
+        key = key.strip()
+        table, _, name = key.rpartition(".")
+        # pii is filled in when the Column file is finalized (see close)
+        return self.merged("Column", key,
+                           lambda node_id: self.node_file("Column", [":ID(Column)", "key", "table", "name"])
+                           .write([node_id, key, table or None, name]))
+
+    def add_dataproduct(self, dataproduct: DataProduct) -> str:
+        dp_id = dataproduct_id(dataproduct.name)
+        if self.is_exported(dataproduct.name):
+            print(f"⚠️ Duplicate DataProduct '{dataproduct.name}' skipped")
+            return dp_id
+        self.seen.add(bytes.fromhex(dp_id.replace("-", "")) + b"DataProduct")
+        self.products += 1
+        if self.products % 100000 == 0:
+            print(f"📦 {self.products} DataProducts exported...")
+
+        self.node_file("DataProduct", ["id:ID(DataProduct)"] + DATAPRODUCT_PROPERTIES).write(
+            [dp_id] + [getattr(dataproduct, prop, None) for prop in DATAPRODUCT_PROPERTIES])
+
+        for attr, (label, rel) in MERGED_LISTS.items():
+            for value in getattr(dataproduct, attr, None) or []:
+                node_id = self.merged(label, value, lambda node_id: self.node_file(
+                    label, [f":ID({label})", "name"]).write([node_id, value]))
+                self.relate(rel, "DataProduct", dp_id, label, node_id)
+
+        for attr, (label, rel) in DICTS.items():
+            data = getattr(dataproduct, attr, None)
+            if data:
+                node_id = self.attribute_node(label, f"{dp_id}:{attr}", data)
+                self.relate(rel, "DataProduct", dp_id, label, node_id)
+
+        # The registry MERGEs these relationships: one per (product, node)
+        for attr, (label, rel) in LISTS_OF_DICTS.items():
+            related = set()
+            for i, item in enumerate(getattr(dataproduct, attr, None) or []):
+                if isinstance(item, dict):
+                    node_id = self.attribute_node(label, f"{dp_id}:{attr}:{i}", item)
+                    if node_id not in related:
+                        related.add(node_id)
+                        self.relate(rel, "DataProduct", dp_id, label, node_id)
+
+        pipelines = set()
+        for item in dataproduct.pipelines or []:
+            if isinstance(item, dict) and item.get("name"):
+                node_id = self.pipeline(item["name"], item)
+                if node_id not in pipelines:
+                    pipelines.add(node_id)
+                    self.relate("HAS_PIPELINE", "DataProduct", dp_id, "Pipeline", node_id)
+
+        # Column-level lineage, as in DataProductRegistry.link_field_lineage: DERIVES
+        # is MERGEd per (source, target, product) with the last transformation SET,
+        # HAS_COLUMN per (product, target)
+        pii = set(dataproduct.pii_fields or [])
+        derives: Dict[tuple, Optional[str]] = {}
+        for item in dataproduct.field_lineage or []:
+            if not (isinstance(item, dict) and item.get("source") and item.get("target")):
+                continue
+            source, target = self.column(item["source"]), self.column(item["target"])
+            for key, node_id in ((item["source"].strip(), source), (item["target"].strip(), target)):
+                if key in pii or key.rpartition(".")[2] in pii:
+                    self.pii_columns.add(bytes.fromhex(node_id))
+            derives[(source, target)] = item.get("transformation")
+        for (source, target), transformation in derives.items():
+            self.relate("DERIVES", "Column", source, "Column", target,
+                        {"dataproduct_id": dp_id, "transformation": transformation})
+        for target in dict.fromkeys(target for _, target in derives):
+            self.relate("HAS_COLUMN", "DataProduct", dp_id, "Column", target)
+        return dp_id
+
+    def add_link(self, kind: str, from_name: str, to_name: str) -> None:
+        """Pipelines named by links are created if needed; DataProducts must be in the input."""
+        if kind == "TRIGGERS":
+            self.relate("TRIGGERS", "Pipeline", self.pipeline(from_name), "Pipeline", self.pipeline(to_name),
+                        unique=True)
+            return
+        if kind == "PRODUCES":
+            self.relate("PRODUCES", "Pipeline", self.pipeline(from_name), "DataProduct", dataproduct_id(to_name),
+                        unique=True)
+            products = [to_name]
+        elif kind == "FEEDS_INTO":
+            self.relate("FEEDS_INTO", "DataProduct", dataproduct_id(from_name), "DataProduct", dataproduct_id(to_name),
+                        unique=True)
+            products = [from_name, to_name]
+        else:
+            raise ValueError(f"Unknown link type: '{kind}'")
+        # Only links seen before their products are spooled for the final check
+        if not all(self.is_exported(name) for name in products):
+            self.dangling.write(json.dumps({"link": kind, "from": from_name, "to": to_name}) + "\n")
+
+    def export(self, records: Iterable[dict]) -> None:
+        for record in records:
+            if "link" in record:
+                self.add_link(record["link"], record["from"], record["to"])
+            else:
+                self.add_dataproduct(DataProduct(**record))
+
+    def close(self) -> List[dict]:
+        """Finalizes all files and returns links whose DataProducts never appeared in the input."""
+        column = self.nodes.get("Column")
+        if column is not None:
+            column.close()
+            self._add_pii_flags(column)
+        for label, out in list(self.nodes.items()):
+            if isinstance(out, SpooledNodes):
+                self.nodes[label] = out.close()
+            elif label != "Column":
+                out.close()
+        for out in self.relationships.values():
+            out.close()
+        self.dangling.seek(0)
+        unresolved = [link for link in map(json.loads, self.dangling)
+                      if not (self.is_exported(link["to"])
+                              and (link["link"] == "PRODUCES" or self.is_exported(link["from"])))]
+        self.dangling.close()
+        self.seen.close()
+        self.pii_columns.close()
+        return unresolved
+
+    def _add_pii_flags(self, column: CsvFile) -> None:
+        """Rewrites the Column CSV with its pii flag, known only once every product is seen."""
+        with open(column.header_path, "w", newline="") as f:
+            csv.writer(f).writerow([":ID(Column)", "key", "table", "name", "pii:boolean"])
+        flagged_path = f"{column.path}.tmp"
+        with open(column.path, newline="") as src, open(flagged_path, "w", newline="") as dst:
+            writer = csv.writer(dst)
+            for row in csv.reader(src):
+                writer.writerow(row + [csv_value(bytes.fromhex(row[0]) in self.pii_columns)])
+        os.replace(flagged_path, column.path)
+
+    def import_command(self, database: str = "neo4j") -> str:
+        args = [f"--nodes={label}={out.header_path},{out.path}" for label, out in sorted(self.nodes.items())]
+        args += [f"--relationships={out.rel_type}={out.header_path},{out.path}"
+                 for _, out in sorted(self.relationships.items())]
+        return " \\\n  ".join(
+            ["neo4j-admin database import full", f"--array-delimiter='{ARRAY_DELIMITER}'",
+             "--multiline-fields=true", "--skip-bad-relationships=true"] + args + [database])
+
+
+def read_jsonl(path: str) -> Iterable[dict]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="JSONL files of DataProduct records and links")
+    parser.add_argument("--out", default="import", help="directory for the CSV and header files")
+    parser.add_argument("--database", default="neo4j")
+    parser.add_argument("--config", default="dataproduct_config.yaml", help="registry config holding merge_keys")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        merge_keys = (yaml.safe_load(f) or {}).get("merge_keys")
+    exporter = BulkExporter(args.out, merge_keys)
+    for path in args.inputs:
+        print(f"📥 Reading {path}...")
+        exporter.export(read_jsonl(path))
+    unresolved = exporter.close()
+
+    print(f"✅ Exported {exporter.products} DataProducts to {args.out}/")
+    for label, out in sorted(exporter.nodes.items()):
+        print(f"   {label}: {out.rows} nodes")
+    for (rel_type, start_label, end_label), out in sorted(exporter.relationships.items()):
+        print(f"   ({start_label})-[:{rel_type}]->({end_label}): {out.rows} relationships")
+    if unresolved:
+        print(f"⚠️ {len(unresolved)} link(s) name DataProducts not in the input and will be skipped:")
+        for link in unresolved[:20]:
+            print(f"   {link['from']} -[{link['link']}]-> {link['to']}")
+    print(f"\n🚀 Import into an empty database with:\n\n{exporter.import_command(args.database)}\n")
+
+
+if __name__ == "__main__":
+    main()
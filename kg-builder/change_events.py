@@ -0,0 +1,280 @@
+"""
+Append-only change event log written by DataProductRegistry.
+
+Each event is one JSON line:
+
+    {"seq": 42, "ts": "2025-01-01T12:00:00", "type": "dataproduct_updated", "id": "...", ...}
+
+Types: dataproduct_created, dataproduct_updated, dataproduct_deleted,
+edge_added, edge_removed. Sequence numbers increase by one per event across
+all writers: appends take an exclusive flock on the log, read the last
+sequence number and write their lines in a single write. A line left
+unterminated by a writer that died mid-write is terminated by the next
+append and skipped by readers.
+
+Delivery is at-least-once. The registry wraps each graph write in
+pending(): the write's events are journaled to `<log>.pending` before it
+runs and appended, tagged with a change_id, once it has returned. A write
+that raises appends nothing (its statements auto-commit one by one, so
+callers retry it; the retry emits). If the writer dies in between,
+recover() appends the journaled events unless that change_id already
+reached the log, so an event may be delivered for a write that never
+committed, but a committed write is never silently dropped. Consumers
+should treat events as "re-read this entity" hints and apply them
+idempotently.
+
+Consumers read from an offset instead of rescanning the graph:
+
+    consumer = ChangeEventConsumer(ChangeEventLog("change_events.jsonl"), "search_index.offset")
+    for event in consumer.poll():
+        apply(event)
+    consumer.commit()
+"""
+
+import fcntl
+import json
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+
+def _parse(line: bytes) -> Optional[dict]:
+    """The event on a log line, or None for a blank line or a torn write a later append terminated."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ChangeEventLog:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = f"{path}.pending"
+
+    def append(self, event_type: str, **data) -> int:
+        """Appends one event and returns its sequence number."""
+        return self.append_many(event_type, [data])
+
+    def append_many(self, event_type: str, items: List[dict]) -> int:
+        """Appends one event per item under a single lock and fsync; returns the last sequence number."""
+        return self.append_events([{"type": event_type, **data} for data in items])
+
+    def append_events(self, events: List[dict], change_id: Optional[str] = None) -> int:
+        """Appends `events` (dicts with a "type") under a single lock and fsync; returns the last sequence number."""
+        with open(self.path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                seq = self._last_sequence(f)
+                ts = datetime.utcnow().isoformat()
+                # Terminate a line torn by a writer that died mid-write, so ours start on a fresh line
+                lines = [] if self._ends_cleanly(f) else ["\n"]
+                for event in events:
+                    seq += 1
+                    event = {"seq": seq, "ts": ts, **event}
+                    if change_id:
+                        event["change_id"] = change_id
+                    lines.append(json.dumps(event, default=str) + "\n")
+                f.write("".join(lines).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return seq
+
+    @contextmanager
+    def pending(self, events: List[dict]) -> Iterator[List[dict]]:
+        """
+        Journals `events` for the write in the block and appends them once the
+        block returns. The block may edit the yielded list (to the edges a
+        MERGE actually created, say); the journaled events are what recover()
+        appends if this process dies first. Nothing is appended if the block raises.
+        """
+        change_id = uuid.uuid4().hex
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self._journal(add={"change_id": change_id, "host": socket.gethostname(), "pid": os.getpid(),
+                           "position": size, "events": events})
+        final = list(events)
+        try:
+            yield final
+        except BaseException:
+            self._journal(remove=change_id)
+            raise
+        if final:
+            self.append_events(final, change_id)
+        self._journal(remove=change_id)
+
+    def recover(self) -> int:
+        """
+        Appends the journaled events of writers on this host that died between
+        their write and its events, skipping changes whose events are already
+        in the log; returns the number of events appended. Entries of live
+        processes, and of other hosts, are left alone.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0
+        appended = 0
+        with open(self.journal_path, "r+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                entries = [entry for entry in map(_parse, f.read().split(b"\n")) if entry]
+                kept = []
+                for entry in entries:
+                    if entry["host"] != socket.gethostname() or _alive(entry["pid"]):
+                        kept.append(entry)
+                        continue
+                    logged = any(event.get("change_id") == entry["change_id"]
+                                 for event, _ in self.scan(entry["position"]))
+                    if not logged and entry["events"]:
+                        self.append_events(entry["events"], entry["change_id"])
+                        appended += len(entry["events"])
+                self._rewrite(f, kept)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return appended
+
+    def _journal(self, add: Optional[dict] = None, remove: Optional[str] = None) -> None:
+        """Adds an entry to, or removes one from, the pending journal (fsynced under its lock)."""
+        with open(self.journal_path, "a+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                entries = [entry for entry in map(_parse, f.read().split(b"\n")) if entry]
+                if add:
+                    entries.append(add)
+                if remove:
+                    entries = [entry for entry in entries if entry["change_id"] != remove]
+                self._rewrite(f, entries)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _rewrite(f, entries: List[dict]) -> None:
+        # In place rather than via os.replace, so writers waiting on the flock keep the same file
+        f.seek(0)
+        f.truncate()
+        f.write("".join(json.dumps(entry, default=str) + "\n" for entry in entries).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+    def last_sequence(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb") as f:
+            return self._last_sequence(f)
+
+    @staticmethod
+    def _ends_cleanly(f) -> bool:
+        """True if the file is empty or its last line is terminated."""
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+    @staticmethod
+    def _last_sequence(f) -> int:
+        """
+        Sequence number of the last complete event, read backwards from the end
+        of the file. Bytes after the last newline (a torn write) and terminated
+        torn lines are skipped.
+        """
+        f.seek(0, os.SEEK_END)
+        block, tail = 4096, b""
+        position = f.tell()
+        while position > 0:
+            step = min(block, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            lines = tail[:tail.rfind(b"\n") + 1].split(b"\n")
+            # The first line of the tail may start before `position`
+            for line in reversed(lines if position == 0 else lines[1:]):
+                event = _parse(line)
+                if event is not None:
+                    return event["seq"]
+        return 0
+
+    def scan(self, position: int = 0) -> Iterator[Tuple[dict, int]]:
+        """
+        Yields (event, position after it) for every complete line from byte
+        `position` on. A trailing line still being written is left for later.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                position += len(line)
+                event = _parse(line)
+                if event is not None:
+                    yield event, position
+
+    def read(self, after: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """Events with seq > `after`, oldest first (scans the log from the start)."""
+        events = []
+        for event, _ in self.scan():
+            if event["seq"] > after:
+                events.append(event)
+                if limit is not None and len(events) >= limit:
+                    break
+        return events
+
+
+class ChangeEventConsumer:
+    """
+    Reads a ChangeEventLog incrementally. The consumer's offset (last seq and
+    its byte position) is kept in `offset_path`, if given, once commit() is
+    called, so a restarted consumer resumes where it left off. Commit after
+    applying the polled events: a consumer that dies in between sees them
+    again (at-least-once), one that commits first may lose them.
+    """
+
+    def __init__(self, log: ChangeEventLog, offset_path: Optional[str] = None):
+        self.log = log
+        self.offset_path = offset_path
+        self.seq, self.position = 0, 0
+        if offset_path and os.path.exists(offset_path):
+            with open(offset_path) as f:
+                offset = json.load(f)
+            self.seq, self.position = offset["seq"], offset["position"]
+
+    def poll(self, limit: Optional[int] = None) -> List[dict]:
+        """New events since the last poll, oldest first."""
+        events = []
+        for event, position in self.log.scan(self.position):
+            self.position = position
+            if event["seq"] <= self.seq:
+                continue
+            events.append(event)
+            self.seq = event["seq"]
+            if limit is not None and len(events) >= limit:
+                break
+        return events
+
+    def commit(self) -> None:
+        """Persists the current offset (atomically replacing the previous one)."""
+        if not self.offset_path:
+            return
+        tmp_path = f"{self.offset_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"seq": self.seq, "position": self.position}, f)
+        os.replace(tmp_path, self.offset_path)
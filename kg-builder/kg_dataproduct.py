@@ -54,6 +54,7 @@ class DataProduct:
         # 🔁 Lineage
         upstream_sources: Optional[List[str]] = None,
         downstream_targets: Optional[List[str]] = None,
+        # {"source": "table.column", "target": "table.column", "transformation": "..."}
         field_lineage: Optional[List[Dict[str, str]]] = None,
 
     ):
@@ -200,14 +200,16 @@ print("✅ All Data Products added successfully!")
 
 print("\n🔗 Linking Pipelines...")
 
-# Link the pipelines as specified in the requirements
-kgm.link_pipelines({"name": "IngestCustomerData"}, {"name": "ProcessCustomerData"})
-kgm.link_pipelines({"name": "IngestSalesData"}, {"name": "AggregateSales"})
-kgm.link_pipelines({"name": "IngestInventory"}, {"name": "AggregateInventory"})
-kgm.link_pipelines({"name": "AggregateSalesData"}, {"name": "GenerateSalesAndInventory"})
-kgm.link_pipelines({"name": "AggregateInventory"}, {"name": "GenerateSalesAndInventory"})
-kgm.link_pipelines({"name": "ProcessCustomerData"}, {"name": "GenerateCustomerSalesSummary"})
-kgm.link_pipelines({"name": "AggregateSales"}, {"name": "GenerateCustomerSalesSummary"})
+# Link the pipelines as specified in the requirements (one batched statement)
+kgm.link_pipelines_bulk([
+    ("IngestCustomerData", "ProcessCustomerData"),
+    ("IngestSalesData", "AggregateSales"),
+    ("IngestInventory", "AggregateInventory"),
+    ("AggregateSalesData", "GenerateSalesAndInventory"),
+    ("AggregateInventory", "GenerateSalesAndInventory"),
+    ("ProcessCustomerData", "GenerateCustomerSalesSummary"),
+    ("AggregateSales", "GenerateCustomerSalesSummary"),
+])
 
 print("✅ All pipeline links created successfully!")
 
@@ -217,15 +219,17 @@ print("✅ All pipeline links created successfully!")
 
 print("\n📦 Linking Pipelines to Data Products...")
 
-# Link pipelines to the data products they produce
-kgm.pipeline_produces({"name": "IngestCustomerData", "status": "Active"}, id_raw_customer)
-kgm.pipeline_produces({"name": "IngestSalesData", "status": "Active"}, id_raw_sales)
-kgm.pipeline_produces({"name": "IngestInventory", "status": "Active"}, id_raw_inventory)
-kgm.pipeline_produces({"name": "ProcessCustomerData", "status": "Active"}, id_processed_customer)
-kgm.pipeline_produces({"name": "AggregateSales", "status": "Active"}, id_aggregated_sales)
-kgm.pipeline_produces({"name": "AggregateInventory", "status": "Active"}, id_aggregated_inventory)
-kgm.pipeline_produces({"name": "GenerateSalesAndInventory", "status": "Active"}, id_sales_inventory_combined)
-kgm.pipeline_produces({"name": "GenerateCustomerSalesSummary", "status": "Active"}, id_customer_sales_summary)
+# Link pipelines to the data products they produce (one batched statement)
+kgm.pipeline_produces_bulk([
+    ({"name": "IngestCustomerData", "status": "Active"}, id_raw_customer),
+    ({"name": "IngestSalesData", "status": "Active"}, id_raw_sales),
+    ({"name": "IngestInventory", "status": "Active"}, id_raw_inventory),
+    ({"name": "ProcessCustomerData", "status": "Active"}, id_processed_customer),
+    ({"name": "AggregateSales", "status": "Active"}, id_aggregated_sales),
+    ({"name": "AggregateInventory", "status": "Active"}, id_aggregated_inventory),
+    ({"name": "GenerateSalesAndInventory", "status": "Active"}, id_sales_inventory_combined),
+    ({"name": "GenerateCustomerSalesSummary", "status": "Active"}, id_customer_sales_summary),
+])
 
 print("✅ All pipeline-to-dataproduct relationships created!")
 
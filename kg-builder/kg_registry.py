@@ -1,8 +1,11 @@
 import uuid
 import yaml
 from kg_dataproduct import DataProduct
+from change_events import ChangeEventLog
 import json
 from py2neo import Graph, Node, Relationship, NodeMatcher
+from py2neo.errors import ClientError
+from contextlib import contextmanager
 from datetime import datetime
 
 class DataProductRegistry:
@@ -17,6 +20,133 @@ class DataProductRegistry:
         self.dataproducts = {}
         self.config = self.load_config()
         self.updatable_fields = self.config.get("updatable_fields", [])
+        self.merge_keys = self.config.get("merge_keys") or {}
+        event_log_path = self.config.get("event_log_path")
+        self.events = ChangeEventLog(event_log_path) if event_log_path else None
+        if self.events:
+            self.events.recover()
+        self.ensure_indexes()
+
+    def ensure_indexes(self) -> None:
+        # Neo4j updates indexes as part of each committing write, so
+        # add_dataproduct / update_dataproduct keep them current on their own.
+        index = self.config.get("fulltext_index")
+        if index:
+            labels = "|".join(index["labels"])
+            properties = ", ".join(f"n.{prop}" for prop in index["properties"])
+            self.graph.run(f"""
+                CREATE FULLTEXT INDEX {index['name']} IF NOT EXISTS
+                FOR (n:{labels}) ON EACH [{properties}]
+            """)
+            print(f"🔍 Full-text index '{index['name']}' ready on {labels}")
+
+        # Edge wiring looks products up by id or name
+        self.graph.run("""
+            CREATE CONSTRAINT dataproduct_id IF NOT EXISTS
+            FOR (dp:DataProduct) REQUIRE dp.id IS UNIQUE
+        """)
+        self.graph.run("""
+            CREATE INDEX dataproduct_name IF NOT EXISTS
+            FOR (dp:DataProduct) ON (dp.name)
+        """)
+        # kg-assistant's graph fingerprint reads the latest updated_at (so
+        # property-only edits invalidate its caches) from this index
+        self.graph.run("""
+            CREATE INDEX dataproduct_updated_at IF NOT EXISTS
+            FOR (dp:DataProduct) ON (dp.updated_at)
+        """)
+
+        # Column lineage: columns are looked up by key, PII seeds by flag
+        self.graph.run("""
+            CREATE CONSTRAINT column_key IF NOT EXISTS
+            FOR (c:Column) REQUIRE c.key IS UNIQUE
+        """)
+        self.graph.run("""
+            CREATE INDEX column_pii IF NOT EXISTS
+            FOR (c:Column) ON (c.pii)
+        """)
+
+        self.ensure_merge_key_constraints()
+
+        # Point-in-time lookups seek the latest version of a product by valid_from
+        self.graph.run("""
+            CREATE INDEX dataproduct_version_validity IF NOT EXISTS
+            FOR (v:DataProductVersion) ON (v.dataproduct_id, v.valid_from)
+        """)
+
+    def ensure_merge_key_constraints(self) -> None:
+        """
+        Entity resolution: a uniqueness constraint per label's merge key, so
+        concurrent MERGEs cannot create the same entity twice. A label that
+        still has duplicates from before merge_keys gets a plain index under the
+        same name until migrate_merge_keys.py has merged them.
+        """
+        for label, keys in self.merge_keys.items():
+            name = f"{label.lower()}_merge_key"
+            properties = ", ".join(f"n.{key}" for key in keys)
+            if self.graph.run("SHOW CONSTRAINTS YIELD name WHERE name = $name RETURN name", name=name).data():
+                continue
+            if not self.duplicate_groups(label, limit=1):
+                # The constraint brings its own index in place of the fallback one
+                self.graph.run(f"DROP INDEX {name} IF EXISTS")
+                try:
+                    self.graph.run(f"""
+                        CREATE CONSTRAINT {name} IF NOT EXISTS
+                        FOR (n:{label}) REQUIRE ({properties}) IS UNIQUE
+                    """)
+                    continue
+                except ClientError as e:
+                    # A duplicate written since the check above
+                    print(f"❗ Could not create {name}: {e}")
+            print(f"⚠️ Duplicate {label} nodes by {keys}; run migrate_merge_keys.py to enforce uniqueness")
+            self.graph.run(f"""
+                CREATE INDEX {name} IF NOT EXISTS
+                FOR (n:{label}) ON ({properties})
+            """)
+
+    def duplicate_groups(self, label: str, limit: int = None) -> list:
+        """Merge key values shared by more than one `label` node (at most `limit` groups)."""
+        keys = self.merge_keys[label]
+        present = " AND ".join(f"n.{key} IS NOT NULL" for key in keys)
+        group = ", ".join(f"n.{key} AS {key}" for key in keys)
+        return self.graph.run(f"""
+            MATCH (n:{label}) WHERE {present}
+            WITH {group}, count(n) AS nodes
+            WHERE nodes > 1
+            RETURN {", ".join(keys)}, nodes
+            {"LIMIT $limit" if limit else ""}
+        """, limit=limit).data()
+
+    def merge_key(self, label: str, data: dict):
+        """Configured merge key of `label` (a property name or tuple of them), or None if `data` lacks it."""
+        keys = self.merge_keys.get(label)
+        if not keys or any(data.get(key) is None for key in keys):
+            return None
+        return keys[0] if len(keys) == 1 else tuple(keys)
+
+    def create_or_merge(self, label: str, data: dict) -> Node:
+        """Node for a dict field: shared via its merge key when configured, otherwise a new node."""
+        node = Node(label, **data)
+        key = self.merge_key(label, data)
+        if key:
+            self.graph.merge(node, label, key)
+        else:
+            self.graph.create(node)
+        return node
+
+    @contextmanager
+    def change(self, *events: dict):
+        """
+        Wraps a graph write in the change events it produces, for incremental
+        consumers: journaled before the write, appended once it returns (see
+        change_events; a no-op without event_log_path). The block may edit the
+        yielded list, e.g. clear it when nothing changed.
+        """
+        if not self.events:
+            yield list(events)
+            return
+        with self.events.pending(list(events)) as pending:
+            yield pending
 
     def add_dataproduct(self, dataproduct: DataProduct) -> str:
         dataproduct_id = str(uuid.uuid4())
@@ -36,66 +166,70 @@ class DataProductRegistry:
             domain=dataproduct.domain,
             subdomain=dataproduct.subdomain,
             environment=dataproduct.environment,
-            schedule=dataproduct.schedule
+            schedule=dataproduct.schedule,
+            updated_at=datetime.utcnow().isoformat()
         )
-        self.graph.create(dp_node)
-
-        # 2️⃣ Simple List Properties → Create & Relate
-        def create_multiple(label, values, rel):
-            for val in values or []:
-                node = Node(label, name=val)
-                self.graph.merge(node, label, "name")
-                self.graph.create(Relationship(dp_node, rel, node))
+        with self.change(dict(type="dataproduct_created", id=dataproduct_id,
+                              name=dataproduct.name, domain=dataproduct.domain)):
+            self.graph.create(dp_node)
+
+            # 2️⃣ Simple List Properties → Create & Relate
+            def create_multiple(label, values, rel):
+                for val in values or []:
+                    node = Node(label, name=val)
+                    self.graph.merge(node, label, "name")
+                    self.graph.create(Relationship(dp_node, rel, node))
                 
-        create_multiple("Tag", dataproduct.tags, "HAS_TAG")
-        create_multiple("BusinessTerm", dataproduct.business_terms, "HAS_TERM")
-        create_multiple("Glossary", dataproduct.glossary_links, "GLOSSARY_LINK")
-        create_multiple("KnownIssue", dataproduct.known_issues, "HAS_ISSUE")
-        create_multiple("Documentation", dataproduct.documentation_links, "HAS_DOC")
-        create_multiple("FAQ", dataproduct.faqs, "HAS_FAQ")
-        create_multiple("Query", dataproduct.sample_queries, "HAS_QUERY")
-        create_multiple("Table", dataproduct.tables, "USES_TABLE")
-        create_multiple("PIIField", dataproduct.pii_fields, "HAS_PII")
-
-        # 3️⃣ Dictionaries → Nodes with attributes
-        def create_dict_node(label, data, rel):
-            if data:
-                node = Node(label, **data)
-                self.graph.create(node)
-                self.graph.create(Relationship(dp_node, rel, node))
-
-        create_dict_node("Owner", dataproduct.owner, "OWNED_BY")
-        create_dict_node("Manager", dataproduct.manager, "MANAGED_BY")
-        create_dict_node("Metrics", dataproduct.metrics, "HAS_METRIC")
-        create_dict_node("DataQuality", dataproduct.data_quality, "HAS_QUALITY")
-        create_dict_node("Classification", dataproduct.data_classification, "CLASSIFIED_AS")
-        create_dict_node("UsageStats", dataproduct.usage_stats, "HAS_USAGE")
-        create_dict_node("Team", dataproduct.team, "PART_OF_TEAM")
-        create_dict_node("AccessControl", dataproduct.access_controls, "HAS_ACCESS_CTRL")
-        create_dict_node("Database", dataproduct.database, "STORED_IN")
-        create_dict_node("Schema", dataproduct.schema, "HAS_SCHEMA")
-
-        # 4️⃣ Lists of Dicts → Nodes with attributes
-        def create_list_of_dicts(label, items, rel):
-            for item in items or []:
-                if isinstance(item, dict):
-                    node = Node(label, **item)
-                    self.graph.create(node)
+            create_multiple("Tag", dataproduct.tags, "HAS_TAG")
+            create_multiple("BusinessTerm", dataproduct.business_terms, "HAS_TERM")
+            create_multiple("Glossary", dataproduct.glossary_links, "GLOSSARY_LINK")
+            create_multiple("KnownIssue", dataproduct.known_issues, "HAS_ISSUE")
+            create_multiple("Documentation", dataproduct.documentation_links, "HAS_DOC")
+            create_multiple("FAQ", dataproduct.faqs, "HAS_FAQ")
+            create_multiple("Query", dataproduct.sample_queries, "HAS_QUERY")
+            create_multiple("Table", dataproduct.tables, "USES_TABLE")
+            create_multiple("PIIField", dataproduct.pii_fields, "HAS_PII")
+
+            # 3️⃣ Dictionaries → Nodes with attributes
+            def create_dict_node(label, data, rel):
+                if data:
+                    node = self.create_or_merge(label, data)
                     self.graph.create(Relationship(dp_node, rel, node))
 
-        create_list_of_dicts("Steward", dataproduct.stewards, "STEWARDED_BY")
-        create_list_of_dicts("Consumer", dataproduct.consumers, "CONSUMED_BY")
-        create_list_of_dicts("Policy", dataproduct.policies, "HAS_POLICY")
-        create_list_of_dicts("Pipeline", dataproduct.pipelines, "HAS_PIPELINE")
-        create_list_of_dicts("Job", dataproduct.jobs, "HAS_JOB")
-        create_list_of_dicts("FieldLineage", dataproduct.field_lineage, "HAS_FIELD_LINEAGE")
+            create_dict_node("Owner", dataproduct.owner, "OWNED_BY")
+            create_dict_node("Manager", dataproduct.manager, "MANAGED_BY")
+            create_dict_node("Metrics", dataproduct.metrics, "HAS_METRIC")
+            create_dict_node("DataQuality", dataproduct.data_quality, "HAS_QUALITY")
+            create_dict_node("Classification", dataproduct.data_classification, "CLASSIFIED_AS")
+            create_dict_node("UsageStats", dataproduct.usage_stats, "HAS_USAGE")
+            create_dict_node("Team", dataproduct.team, "PART_OF_TEAM")
+            create_dict_node("AccessControl", dataproduct.access_controls, "HAS_ACCESS_CTRL")
+            create_dict_node("Database", dataproduct.database, "STORED_IN")
+            create_dict_node("Schema", dataproduct.schema, "HAS_SCHEMA")
 
+            # 4️⃣ Lists of Dicts → Nodes with attributes
+            def create_list_of_dicts(label, items, rel):
+                for item in items or []:
+                    if isinstance(item, dict):
+                        node = self.create_or_merge(label, item)
+                        self.graph.merge(Relationship(dp_node, rel, node))
+
+            create_list_of_dicts("Steward", dataproduct.stewards, "STEWARDED_BY")
+            create_list_of_dicts("Consumer", dataproduct.consumers, "CONSUMED_BY")
+            create_list_of_dicts("Policy", dataproduct.policies, "HAS_POLICY")
+            create_list_of_dicts("Pipeline", dataproduct.pipelines, "HAS_PIPELINE")
+            create_list_of_dicts("Job", dataproduct.jobs, "HAS_JOB")
+            create_list_of_dicts("FieldLineage", dataproduct.field_lineage, "HAS_FIELD_LINEAGE")
+            self.link_field_lineage(dataproduct_id, dataproduct.field_lineage, dataproduct.pii_fields)
+
+            self.record_version(dataproduct_id)
         print(f"✅ DataProduct '{dataproduct.name}' added with {len(dp_node)} properties and multiple relationships!")
         return dataproduct_id
     
     def update_dataproduct(self, dataproduct: DataProduct) -> bool:
         matcher = NodeMatcher(self.graph)
         updated_fields = []
+        changed_relations = []
 
         if not dataproduct.id:
             print("❗ DataProduct ID is required for update.")
@@ -133,6 +267,7 @@ class DataProductRegistry:
                             new_value=str(new))
             self.graph.create(log_node)
             self.graph.create(Relationship(dp_node, "HAS_CHANGE_LOG", log_node))
+            changed_relations.append(field)
 
         # 3️⃣ Relational updates (smart + logged)
         def update_single_relation(label, data, rel_type):
@@ -151,7 +286,8 @@ class DataProductRegistry:
                     """, id=dataproduct.id)
                     # Create new
                     node = Node(label, **data)
-                    self.graph.merge(node, label, "name" if "name" in data else list(data.keys())[0])
+                    key = self.merge_key(label, data) or ("name" if "name" in data else list(data.keys())[0])
+                    self.graph.merge(node, label, key)
                     self.graph.create(Relationship(dp_node, rel_type, node))
                     log_change(rel_type, old_data, data)
 
@@ -184,44 +320,56 @@ class DataProductRegistry:
                 """, id=dataproduct.id)
                 for item in items:
                     if isinstance(item, dict):
-                        node = Node(label, **item)
-                        self.graph.create(node)
-                        self.graph.create(Relationship(dp_node, rel_type, node))
+                        node = self.create_or_merge(label, item)
+                        self.graph.merge(Relationship(dp_node, rel_type, node))
                 log_change(rel_type, "previous entries", items)
 
-        # Initiate update of core properties
-        update_core_properties(dataproduct)
-
-        # 4️⃣ Dictionary fields
-        update_single_relation("Owner", dataproduct.owner, "OWNED_BY")
-        update_single_relation("Manager", dataproduct.manager, "MANAGED_BY")
-        update_single_relation("Metrics", dataproduct.metrics, "HAS_METRIC")
-        update_single_relation("DataQuality", dataproduct.data_quality, "HAS_QUALITY")
-        update_single_relation("Classification", dataproduct.data_classification, "CLASSIFIED_AS")
-        update_single_relation("UsageStats", dataproduct.usage_stats, "HAS_USAGE")
-        update_single_relation("Team", dataproduct.team, "PART_OF_TEAM")
-        update_single_relation("AccessControl", dataproduct.access_controls, "HAS_ACCESS_CTRL")
-        update_single_relation("Database", dataproduct.database, "STORED_IN")
-        update_single_relation("Schema", dataproduct.schema, "HAS_SCHEMA")
-
-        # 5️⃣ Lists of strings
-        update_multi_string_relation("Tag", dataproduct.tags, "HAS_TAG")
-        update_multi_string_relation("BusinessTerm", dataproduct.business_terms, "HAS_TERM")
-        update_multi_string_relation("Glossary", dataproduct.glossary_links, "GLOSSARY_LINK")
-        update_multi_string_relation("KnownIssue", dataproduct.known_issues, "HAS_ISSUE")
-        update_multi_string_relation("Documentation", dataproduct.documentation_links, "HAS_DOC")
-        update_multi_string_relation("FAQ", dataproduct.faqs, "HAS_FAQ")
-        update_multi_string_relation("Query", dataproduct.sample_queries, "HAS_QUERY")
-        update_multi_string_relation("Table", dataproduct.tables, "USES_TABLE")
-        update_multi_string_relation("PIIField", dataproduct.pii_fields, "HAS_PII")
-
-        # 6️⃣ Lists of dicts
-        update_multi_dict_relation("Steward", dataproduct.stewards, "STEWARDED_BY")
-        update_multi_dict_relation("Consumer", dataproduct.consumers, "CONSUMED_BY")
-        update_multi_dict_relation("Policy", dataproduct.policies, "HAS_POLICY")
-        update_multi_dict_relation("Pipeline", dataproduct.pipelines, "HAS_PIPELINE")
-        update_multi_dict_relation("Job", dataproduct.jobs, "HAS_JOB")
-        update_multi_dict_relation("FieldLineage", dataproduct.field_lineage, "HAS_FIELD_LINEAGE")
+        with self.change(dict(type="dataproduct_updated", id=dataproduct.id, name=dp_node.get("name"))) as events:
+            # Initiate update of core properties
+            update_core_properties(dataproduct)
+
+            # 4️⃣ Dictionary fields
+            update_single_relation("Owner", dataproduct.owner, "OWNED_BY")
+            update_single_relation("Manager", dataproduct.manager, "MANAGED_BY")
+            update_single_relation("Metrics", dataproduct.metrics, "HAS_METRIC")
+            update_single_relation("DataQuality", dataproduct.data_quality, "HAS_QUALITY")
+            update_single_relation("Classification", dataproduct.data_classification, "CLASSIFIED_AS")
+            update_single_relation("UsageStats", dataproduct.usage_stats, "HAS_USAGE")
+            update_single_relation("Team", dataproduct.team, "PART_OF_TEAM")
+            update_single_relation("AccessControl", dataproduct.access_controls, "HAS_ACCESS_CTRL")
+            update_single_relation("Database", dataproduct.database, "STORED_IN")
+            update_single_relation("Schema", dataproduct.schema, "HAS_SCHEMA")
+
+            # 5️⃣ Lists of strings
+            update_multi_string_relation("Tag", dataproduct.tags, "HAS_TAG")
+            update_multi_string_relation("BusinessTerm", dataproduct.business_terms, "HAS_TERM")
+            update_multi_string_relation("Glossary", dataproduct.glossary_links, "GLOSSARY_LINK")
+            update_multi_string_relation("KnownIssue", dataproduct.known_issues, "HAS_ISSUE")
+            update_multi_string_relation("Documentation", dataproduct.documentation_links, "HAS_DOC")
+            update_multi_string_relation("FAQ", dataproduct.faqs, "HAS_FAQ")
+            update_multi_string_relation("Query", dataproduct.sample_queries, "HAS_QUERY")
+            update_multi_string_relation("Table", dataproduct.tables, "USES_TABLE")
+            update_multi_string_relation("PIIField", dataproduct.pii_fields, "HAS_PII")
+
+            # 6️⃣ Lists of dicts
+            update_multi_dict_relation("Steward", dataproduct.stewards, "STEWARDED_BY")
+            update_multi_dict_relation("Consumer", dataproduct.consumers, "CONSUMED_BY")
+            update_multi_dict_relation("Policy", dataproduct.policies, "HAS_POLICY")
+            update_multi_dict_relation("Pipeline", dataproduct.pipelines, "HAS_PIPELINE")
+            update_multi_dict_relation("Job", dataproduct.jobs, "HAS_JOB")
+            update_multi_dict_relation("FieldLineage", dataproduct.field_lineage, "HAS_FIELD_LINEAGE")
+            if dataproduct.field_lineage is not None:
+                self.link_field_lineage(dataproduct.id, dataproduct.field_lineage, dataproduct.pii_fields, replace=True)
+
+            if updated_fields or changed_relations:
+                self.graph.run("""
+                    MATCH (dp:DataProduct {id: $id})
+                    SET dp.updated_at = $now
+                """, id=dataproduct.id, now=datetime.utcnow().isoformat())
+                self.record_version(dataproduct.id)
+                events[0].update(fields=[f[0] for f in updated_fields], relations=changed_relations)
+            else:
+                events.clear()
 
         # Final log
         if updated_fields:
@@ -231,6 +379,166 @@ class DataProductRegistry:
 
         return True 
             
+    def link_field_lineage(self, dataproduct_id: str, field_lineage: list, pii_fields: list = None,
+                           replace: bool = False) -> int:
+        """
+        Models field_lineage entries such as
+            {"source": "raw_customers.email", "target": "customers.email", "transformation": "lower(email)"}
+        as (:Column)-[:DERIVES {dataproduct_id}]->(:Column) edges, with
+        (DataProduct)-[:HAS_COLUMN]->(Column) for the target columns. Columns
+        named in pii_fields (by "table.column" or column name) get pii = true.
+        With replace=True the product's previous edges are removed first.
+        Returns the number of DERIVES edges written.
+        """
+        pii = set(pii_fields or [])
+
+        def column(key):
+            key = key.strip()
+            table, _, name = key.rpartition(".")
+            return {"key": key, "table": table or None, "name": name, "pii": key in pii or name in pii}
+
+        rows = [
+            {"source": column(item["source"]), "target": column(item["target"]),
+             "transformation": item.get("transformation")}
+            for item in field_lineage or []
+            if isinstance(item, dict) and item.get("source") and item.get("target")
+        ]
+
+        if replace:
+            self.graph.run("""
+                MATCH (:Column)-[d:DERIVES {dataproduct_id: $id}]->(:Column)
+                DELETE d
+            """, id=dataproduct_id)
+            self.graph.run("""
+                MATCH (:DataProduct {id: $id})-[r:HAS_COLUMN]->(:Column)
+                DELETE r
+            """, id=dataproduct_id)
+        if not rows:
+            return 0
+
+        self.graph.run("""
+            MATCH (dp:DataProduct {id: $id})
+            UNWIND $rows AS row
+            MERGE (src:Column {key: row.source.key})
+              ON CREATE SET src.table = row.source.table, src.name = row.source.name
+            MERGE (dst:Column {key: row.target.key})
+              ON CREATE SET dst.table = row.target.table, dst.name = row.target.name
+            SET src.pii = coalesce(src.pii, false) OR row.source.pii,
+                dst.pii = coalesce(dst.pii, false) OR row.target.pii
+            MERGE (src)-[d:DERIVES {dataproduct_id: $id}]->(dst)
+            SET d.transformation = row.transformation
+            MERGE (dp)-[:HAS_COLUMN]->(dst)
+        """, id=dataproduct_id, rows=rows)
+        print(f"🧬 Linked {len(rows)} column lineage edge(s) for DataProduct {dataproduct_id}")
+        return len(rows)
+
+    def backfill_column_lineage(self) -> int:
+        """Builds Column/DERIVES lineage from the FieldLineage nodes already in the graph."""
+        products = self.graph.run("""
+            MATCH (dp:DataProduct)-[:HAS_FIELD_LINEAGE]->(fl:FieldLineage)
+            WITH dp, collect(properties(fl)) AS field_lineage
+            OPTIONAL MATCH (dp)-[:HAS_PII]->(p:PIIField)
+            RETURN dp.id AS id, field_lineage, collect(p.name) AS pii_fields
+        """).data()
+        total = 0
+        for product in products:
+            total += self.link_field_lineage(product["id"], product["field_lineage"],
+                                             product["pii_fields"], replace=True)
+        print(f"✅ Backfilled {total} column lineage edge(s) across {len(products)} DataProduct(s)")
+        return total
+
+    # Relationships that are bookkeeping rather than part of a product's state
+    UNVERSIONED_RELATIONS = ["HAS_VERSION", "CURRENT_VERSION", "HAS_CHANGE_LOG", "HAS_COLUMN"]
+
+    def record_version(self, dataproduct_id: str) -> None:
+        """
+        Snapshots the product's current properties and relations as a new
+        DataProductVersion valid from now, closing the previous version
+        (valid_to = now). Relations are stored as JSON keyed by relationship type.
+        Versions are read back through kg-assistant's GET /dataproducts/{id}/as-of.
+        """
+        state = self.graph.run("""
+            MATCH (dp:DataProduct {id: $id})
+            RETURN properties(dp) AS core,
+                   [(dp)-[r]->(n) WHERE NOT type(r) IN $skip |
+                    {rel: type(r), node: CASE WHEN n:DataProduct THEN {id: n.id, name: n.name} ELSE properties(n) END}
+                   ] AS relations
+        """, id=dataproduct_id, skip=self.UNVERSIONED_RELATIONS).data()
+        if not state:
+            return
+        core = {k: v for k, v in state[0]["core"].items() if k != "id"}
+        relations = {}
+        for item in state[0]["relations"]:
+            relations.setdefault(item["rel"], []).append(item["node"])
+        for nodes in relations.values():
+            nodes.sort(key=lambda node: json.dumps(node, sort_keys=True, default=str))
+
+        self.graph.run("""
+            MATCH (dp:DataProduct {id: $id})
+            WITH dp, datetime() AS now
+            OPTIONAL MATCH (dp)-[cv:CURRENT_VERSION]->(current:DataProductVersion)
+            SET current.valid_to = now
+            DELETE cv
+            WITH dp, now, coalesce(current.version, 0) + 1 AS version
+            CREATE (v:DataProductVersion {dataproduct_id: dp.id, version: version, valid_from: now})
+            SET v += $core, v.relations = $relations
+            CREATE (dp)-[:HAS_VERSION]->(v)
+            CREATE (dp)-[:CURRENT_VERSION]->(v)
+        """, id=dataproduct_id, core=core, relations=json.dumps(relations, sort_keys=True, default=str))
+
+    def close_version(self, dataproduct_id: str, deleted: bool = False) -> None:
+        self.graph.run("""
+            MATCH (:DataProduct {id: $id})-[cv:CURRENT_VERSION]->(v:DataProductVersion)
+            SET v.valid_to = datetime(), v.deleted = $deleted
+            DELETE cv
+        """, id=dataproduct_id, deleted=deleted)
+
+    def backfill_versions(self) -> int:
+        """Records a first version for products ingested before versioning existed."""
+        ids = [row["id"] for row in self.graph.run("""
+            MATCH (dp:DataProduct)
+            WHERE NOT (dp)-[:CURRENT_VERSION]->()
+            RETURN dp.id AS id
+        """).data()]
+        for dataproduct_id in ids:
+            self.record_version(dataproduct_id)
+        print(f"🕰️ Recorded initial versions for {len(ids)} DataProduct(s)")
+        return len(ids)
+
+    def merge_duplicate_entities(self, batch_size: int = 500) -> dict:
+        """
+        One-off migration for graphs ingested before merge_keys: nodes of each
+        configured label with equal merge key values are merged into one with
+        apoc.refactor.mergeNodes (relationships moved over, the first node's
+        properties kept), one batch of duplicate groups per transaction, then
+        replaces the fallback indexes with uniqueness constraints.
+        Returns the number of groups merged per label.
+        """
+        merged = {}
+        for label, keys in self.merge_keys.items():
+            present = " AND ".join(f"n.{key} IS NOT NULL" for key in keys)
+            group = ", ".join(f"n.{key} AS k{i}" for i, key in enumerate(keys))
+            result = self.graph.run("""
+                CALL apoc.periodic.iterate($groups, $merge, {batchSize: $batch_size})
+                YIELD batches, total, errorMessages
+                RETURN batches, total, errorMessages
+            """, groups=f"""
+                MATCH (n:{label}) WHERE {present}
+                WITH {group}, collect(n) AS nodes
+                WHERE size(nodes) > 1
+                RETURN nodes
+            """, merge="""
+                CALL apoc.refactor.mergeNodes(nodes, {properties: 'discard', mergeRels: true})
+                YIELD node
+                RETURN count(node)
+            """, batch_size=batch_size).data()[0]
+            if result["errorMessages"]:
+                print(f"❗ Merging {label} failed: {result['errorMessages']}")
+            merged[label] = result["total"]
+            print(f"🧩 {label}: merged {result['total']} duplicate group(s) in {result['batches']} batch(es)")
+        self.ensure_merge_key_constraints()
+        return merged
+
     def add_dataproduct_dependency_by_id(self, from_dpid: str, to_dpid: str) -> bool:
         matcher = NodeMatcher(self.graph)
         from_dp = matcher.match("DataProduct", id=from_dpid).first()
@@ -240,14 +548,182 @@ class DataProductRegistry:
             return False
         else:
             rel = Relationship(from_dp, "FEEDS_INTO", to_dp)
-            self.graph.merge(rel)
+            with self.change(dict(type="edge_added", rel_type="FEEDS_INTO", from_id=from_dpid, to_id=to_dpid)):
+                self.graph.merge(rel)
             print(f"✅ Added dependency: {from_dp['name']} ➡️ {to_dp['name']}")
             return True    
         
-    def add_dataproduct_dependency_by_name(self, from_name, to_name):
+    def delete_dataproduct(self, dataproduct_id: str) -> bool:
+        """
+        Deletes a DataProduct and its column lineage edges, together with the
+        nodes only it linked to (its Owner, Policies, ChangeLog, ...). Nodes
+        still used elsewhere, such as shared Tags, Tables or Pipelines, are kept,
+        and so is its version history (the last version is closed).
+        """
+        matcher = NodeMatcher(self.graph)
+        dp_node = matcher.match("DataProduct", id=dataproduct_id).first()
+        if not dp_node:
+            print(f"❗ No DataProduct found with id: {dataproduct_id}")
+            return False
+
+        feeds = self.graph.run("""
+            MATCH (:DataProduct {id: $id})-[r:FEEDS_INTO]-(:DataProduct)
+            RETURN startNode(r).id AS from_id, endNode(r).id AS to_id
+        """, id=dataproduct_id).data()
+        produced_by = self.graph.run("""
+            MATCH (p:Pipeline)-[:PRODUCES]->(:DataProduct {id: $id})
+            RETURN p.name AS from_pipeline
+        """, id=dataproduct_id).data()
+
+        events = [dict(type="edge_removed", rel_type="FEEDS_INTO", **edge) for edge in feeds]
+        events += [dict(type="edge_removed", rel_type="PRODUCES", to_id=dataproduct_id, **edge) for edge in produced_by]
+        events.append(dict(type="dataproduct_deleted", id=dataproduct_id, name=dp_node.get("name")))
+        with self.change(*events):
+            self.close_version(dataproduct_id, deleted=True)
+            self.graph.run("""
+                MATCH (:Column)-[d:DERIVES {dataproduct_id: $id}]->(:Column)
+                DELETE d
+            """, id=dataproduct_id)
+            self.graph.run("""
+                MATCH (dp:DataProduct {id: $id})
+                OPTIONAL MATCH (dp)-->(n)
+                WHERE NOT n:DataProduct AND NOT n:Column AND NOT n:DataProductVersion AND size([(n)--() | 1]) = 1
+                DETACH DELETE dp, n
+            """, id=dataproduct_id)
+        self.dataproducts.pop(dataproduct_id, None)
+        print(f"🗑️ DataProduct '{dp_node.get('name')}' deleted")
+        return True
+
+    def add_dataproduct_dependency_by_name(self, from_name, to_name) -> bool:
         from_id = self.get_dataproduct_id_by_name(from_name)
         to_id = self.get_dataproduct_id_by_name(to_name)
-        self.add_dependency(from_id, to_id)        
+        return self.add_dataproduct_dependency_by_id(from_id, to_id)
+
+    # Bulk edge wiring: one UNWIND + MERGE statement per batch of pairs instead
+    # of NodeMatcher lookups and a merge per edge. Pairs naming DataProducts
+    # that do not exist are returned as unresolved rather than failing midway.
+    WIRING_BATCH_SIZE = 1000
+
+    def resolve_dataproduct_ids(self, keys, by: str = "id") -> dict:
+        """Maps DataProduct ids or names (by="id" / "name") to ids; unknown keys are left out."""
+        if by not in ("id", "name"):
+            raise ValueError(f"by must be 'id' or 'name', not '{by}'")
+        resolved = {}
+        keys = list(set(keys))
+        for start in range(0, len(keys), self.WIRING_BATCH_SIZE):
+            rows = self.graph.run(f"""
+                UNWIND $keys AS key
+                MATCH (dp:DataProduct {{{by}: key}})
+                RETURN key, min(dp.id) AS id
+            """, keys=keys[start:start + self.WIRING_BATCH_SIZE]).data()
+            resolved.update((row["key"], row["id"]) for row in rows)
+        return resolved
+
+    def wire_edges(self, statement: str, rows: list, rel_type: str, edge) -> list:
+        """
+        Runs `statement` over `rows` in batches; returns the rows it RETURNs (the
+        edges it created). Each batch is one change: edge_added is journaled for
+        every row (`edge(row)` gives its endpoints) and emitted for created edges.
+        """
+        created = []
+        for start in range(0, len(rows), self.WIRING_BATCH_SIZE):
+            batch = rows[start:start + self.WIRING_BATCH_SIZE]
+            with self.change(*(dict(type="edge_added", rel_type=rel_type, **edge(row)) for row in batch)) as events:
+                batch_created = self.graph.run(statement, rows=batch).data()
+                events[:] = [dict(type="edge_added", rel_type=rel_type, **e) for e in batch_created]
+            created.extend(batch_created)
+        return created
+
+    FEEDS_INTO_STATEMENT = """
+        UNWIND $rows AS row
+        MATCH (a:DataProduct {id: row.from_id})
+        MATCH (b:DataProduct {id: row.to_id})
+        WITH row, a, b WHERE NOT (a)-[:FEEDS_INTO]->(b)
+        MERGE (a)-[:FEEDS_INTO]->(b)
+        RETURN row.from_id AS from_id, row.to_id AS to_id
+    """
+
+    def add_dataproduct_dependencies_bulk(self, pairs, by: str = "id") -> dict:
+        """
+        FEEDS_INTO edges for (from, to) pairs of DataProduct ids or names.
+        Returns {"wired": pairs resolved, "created": edges that did not exist yet,
+        "unresolved": [pairs with an unknown product]}; edge_added is emitted
+        for the created edges only.
+        """
+        pairs = list(pairs)
+        ids = self.resolve_dataproduct_ids([key for pair in pairs for key in pair], by)
+        # Duplicate pairs are wired (and reported) once
+        edges = dict.fromkeys((ids[a], ids[b]) for a, b in pairs if a in ids and b in ids)
+        rows = [{"from_id": a, "to_id": b} for a, b in edges]
+        unresolved = [(a, b) for a, b in pairs if a not in ids or b not in ids]
+        created = self.wire_edges(self.FEEDS_INTO_STATEMENT, rows, "FEEDS_INTO", dict)
+        print(f"✅ Added {len(created)} dependencies ({len(rows) - len(created)} already present)")
+        if unresolved:
+            print(f"⚠️ {len(unresolved)} dependencies skipped, unknown DataProduct {by}(s): {unresolved[:10]}")
+        return {"wired": len(rows), "created": len(created), "unresolved": unresolved}
+
+    def link_pipelines_bulk(self, pairs) -> dict:
+        """
+        TRIGGERS edges for (pipeline, pipeline) pairs, each a name or a dict
+        with a name. Like link_pipelines, missing pipelines are created, and
+        edge_added is emitted for new edges only.
+
+        Graphs ingested before Pipeline had a merge key may hold several
+        Pipeline nodes with one name; only one of them is wired (like
+        link_pipelines' .first()). Run migrate_merge_keys.py to merge them.
+        """
+        def pipeline(p):
+            return p if isinstance(p, dict) else {"name": p}
+        rows = {}
+        for a, b in pairs:
+            a, b = pipeline(a), pipeline(b)
+            rows.setdefault((a["name"], b["name"]), {"from": a, "to": b})
+        rows = list(rows.values())
+        created = self.wire_edges("""
+            UNWIND $rows AS row
+            MERGE (p1:Pipeline {name: row.from.name})
+              ON CREATE SET p1 += row.from
+            WITH row, head(collect(p1)) AS p1
+            MERGE (p2:Pipeline {name: row.to.name})
+              ON CREATE SET p2 += row.to
+            WITH row, p1, head(collect(p2)) AS p2
+            WHERE NOT (p1)-[:TRIGGERS]->(p2)
+            MERGE (p1)-[:TRIGGERS]->(p2)
+            RETURN row.from.name AS from_pipeline, row.to.name AS to_pipeline
+        """, rows, "TRIGGERS", lambda row: {"from_pipeline": row["from"]["name"], "to_pipeline": row["to"]["name"]})
+        print(f"🔁 Linked {len(created)} pipeline pairs ({len(rows) - len(created)} already linked)")
+        return {"wired": len(rows), "created": len(created), "unresolved": []}
+
+    def pipeline_produces_bulk(self, pairs, by: str = "id") -> dict:
+        """
+        PRODUCES edges for (pipeline, dataproduct) pairs: the pipeline a name
+        or dict (created if missing), the product an id or name per `by`.
+        As in link_pipelines_bulk, one Pipeline per name is wired and
+        edge_added is emitted for new edges only.
+        """
+        pairs = [(p if isinstance(p, dict) else {"name": p}, key) for p, key in pairs]
+        ids = self.resolve_dataproduct_ids([key for _, key in pairs], by)
+        rows = {}
+        for p, key in pairs:
+            if key in ids:
+                rows.setdefault((p["name"], ids[key]), {"pipeline": p, "to_id": ids[key]})
+        rows = list(rows.values())
+        unresolved = [(p["name"], key) for p, key in pairs if key not in ids]
+        created = self.wire_edges("""
+            UNWIND $rows AS row
+            MATCH (dp:DataProduct {id: row.to_id})
+            MERGE (p:Pipeline {name: row.pipeline.name})
+              ON CREATE SET p += row.pipeline
+            WITH row, dp, head(collect(p)) AS p
+            WHERE NOT (p)-[:PRODUCES]->(dp)
+            MERGE (p)-[:PRODUCES]->(dp)
+            RETURN row.pipeline.name AS from_pipeline, row.to_id AS to_id
+        """, rows, "PRODUCES", lambda row: {"from_pipeline": row["pipeline"]["name"], "to_id": row["to_id"]})
+        print(f"📦 Linked {len(created)} pipelines to the DataProducts they produce "
+              f"({len(rows) - len(created)} already linked)")
+        if unresolved:
+            print(f"⚠️ {len(unresolved)} links skipped, unknown DataProduct {by}(s): {unresolved[:10]}")
+        return {"wired": len(rows), "created": len(created), "unresolved": unresolved}
     
     def link_pipelines(self, pipeline1: dict, pipeline2: dict) -> None:
         # First, try to find existing pipeline nodes
@@ -265,7 +741,9 @@ class DataProductRegistry:
         
         # Create the relationship (use merge to avoid duplicates)
         rel = Relationship(p1, "TRIGGERS", p2)
-        self.graph.merge(rel)
+        with self.change(dict(type="edge_added", rel_type="TRIGGERS",
+                              from_pipeline=pipeline1['name'], to_pipeline=pipeline2['name'])):
+            self.graph.merge(rel)
         print(f"🔁 {pipeline1['name']} TRIGGERS {pipeline2['name']}")    
 
     def pipeline_produces(self, pipeline_data: dict, dataproduct_dpid: str) -> None:
@@ -282,7 +760,9 @@ class DataProductRegistry:
         
         # Create the relationship (use merge to avoid duplicates)
         rel = Relationship(pipeline, "PRODUCES", dp)
-        self.graph.merge(rel)
+        with self.change(dict(type="edge_added", rel_type="PRODUCES",
+                              from_pipeline=pipeline_data['name'], to_id=dataproduct_dpid)):
+            self.graph.merge(rel)
         print(f"📦 {pipeline_data['name']} PRODUCES {dp['name']}")        
 
     def get_dataproduct_id_by_name(self, name):
@@ -297,9 +777,13 @@ class DataProductRegistry:
             return result[0]['id']
     
     def auto_wire_dependencies(self):
-        self.graph.run("""
+        # Read the missing edges first so each batch's events can be journaled before it is wired
+        rows = self.graph.run("""
             MATCH (p1:Pipeline)-[:PRODUCES]->(dp1:DataProduct),
                 (p1)-[:TRIGGERS]->(p2:Pipeline)-[:PRODUCES]->(dp2:DataProduct)
-            MERGE (dp1)-[:FEEDS_INTO]->(dp2)
-        """)
+            WITH DISTINCT dp1, dp2
+            WHERE NOT (dp1)-[:FEEDS_INTO]->(dp2)
+            RETURN dp1.id AS from_id, dp2.id AS to_id
+        """).data()
+        self.wire_edges(self.FEEDS_INTO_STATEMENT, rows, "FEEDS_INTO", dict)
         print("🔗 Auto-wired data product dependencies via pipeline triggers.")        
\ No newline at end of file
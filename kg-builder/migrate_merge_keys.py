@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+One-off migration merging the duplicate Owner, Team, Database, Steward, ...
+nodes created before merge_keys (dataproduct_config.yaml) existed.
+Requires APOC. Safe to re-run: labels without duplicates are left as they are.
+"""
+
+from kg_registry import DataProductRegistry
+
+def migrate_merge_keys():
+    kgm = DataProductRegistry("bolt://localhost:7687", "neo4j", "password")
+
+    print("🧩 Merging duplicate entities by their merge keys...")
+    kgm.merge_duplicate_entities()
+    print("✅ Entity resolution migration complete!")
+
+if __name__ == "__main__":
+    migrate_merge_keys()
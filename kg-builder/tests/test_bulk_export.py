@@ -0,0 +1,74 @@
+import csv
+import os
+
+from bulk_export import BulkExporter, dataproduct_id
+
+MERGE_KEYS = {"Owner": ["email"], "Steward": ["name"]}
+
+RECORDS = [
+    {"name": "RawCustomers", "tags": ["raw", "crm"], "owner": {"email": "ana@example.com", "name": "Ana"},
+     "stewards": [{"name": "Data Quality Team"}, {"name": "Data Quality Team"}],
+     "pipelines": [{"name": "IngestCustomers"}, {"name": "IngestCustomers"}],
+     "pii_fields": ["email"],
+     "field_lineage": [
+         {"source": "raw.email", "target": "customers.email", "transformation": "lower(email)"},
+         {"source": "raw.mail", "target": "customers.email", "transformation": "mail"},
+         {"source": "raw.email", "target": "customers.email", "transformation": "trim(lower(email))"},
+     ]},
+    {"link": "FEEDS_INTO", "from": "RawCustomers", "to": "Customers"},
+    {"name": "Customers", "tags": ["crm"], "owner": {"email": "ana@example.com", "name": "Ana"}},
+    {"link": "FEEDS_INTO", "from": "RawCustomers", "to": "Customers"},
+    {"link": "FEEDS_INTO", "from": "Customers", "to": "Missing"},
+    {"link": "TRIGGERS", "from": "IngestCustomers", "to": "CleanCustomers"},
+    {"link": "TRIGGERS", "from": "IngestCustomers", "to": "CleanCustomers"},
+    {"link": "PRODUCES", "from": "IngestCustomers", "to": "RawCustomers"},
+]
+
+
+def rows(out_dir: str, name: str) -> list:
+    with open(os.path.join(out_dir, f"{name}.csv"), newline="") as f:
+        return list(csv.reader(f))
+
+
+def export(tmp_path) -> tuple:
+    exporter = BulkExporter(str(tmp_path), MERGE_KEYS)
+    exporter.export(RECORDS)
+    return exporter, exporter.close()
+
+
+def test_merged_relationships_are_written_once(tmp_path):
+    exporter, _ = export(tmp_path)
+    raw, customers = dataproduct_id("RawCustomers"), dataproduct_id("Customers")
+    # Links and the product's list-of-dict relationships are MERGEd by the registry
+    assert rows(tmp_path, "rels_FEEDS_INTO_DataProduct_DataProduct") == [
+        [raw, customers], [customers, dataproduct_id("Missing")]]
+    assert len(rows(tmp_path, "rels_TRIGGERS_Pipeline_Pipeline")) == 1
+    assert len(rows(tmp_path, "rels_PRODUCES_Pipeline_DataProduct")) == 1
+    assert len(rows(tmp_path, "rels_STEWARDED_BY_DataProduct_Steward")) == 1
+    assert len(rows(tmp_path, "rels_HAS_PIPELINE_DataProduct_Pipeline")) == 1
+    # Tag relationships are created, one per listed value
+    assert len(rows(tmp_path, "rels_HAS_TAG_DataProduct_Tag")) == 3
+    assert len(rows(tmp_path, "nodes_Tag")) == 2
+
+
+def test_field_lineage_matches_link_field_lineage(tmp_path):
+    export(tmp_path)
+    columns = {row[1]: row for row in rows(tmp_path, "nodes_Column")}
+    assert {key: row[4] for key, row in columns.items()} == {
+        "raw.email": "true", "customers.email": "true", "raw.mail": "false"}
+    derives = {(start, end): transformation
+               for start, end, _, transformation in rows(tmp_path, "rels_DERIVES_Column_Column")}
+    # One DERIVES per (source, target, product), holding the last transformation
+    assert derives == {(columns["raw.email"][0], columns["customers.email"][0]): "trim(lower(email))",
+                       (columns["raw.mail"][0], columns["customers.email"][0]): "mail"}
+    assert rows(tmp_path, "rels_HAS_COLUMN_DataProduct_Column") == [
+        [dataproduct_id("RawCustomers"), columns["customers.email"][0]]]
+
+
+def test_shared_entities_and_unresolved_links(tmp_path):
+    exporter, unresolved = export(tmp_path)
+    assert exporter.products == 2
+    # One Owner node by email, related from both products
+    assert len(rows(tmp_path, "nodes_Owner")) == 1
+    assert len(rows(tmp_path, "rels_OWNED_BY_DataProduct_Owner")) == 2
+    assert unresolved == [{"link": "FEEDS_INTO", "from": "Customers", "to": "Missing"}]
@@ -0,0 +1,123 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from change_events import ChangeEventConsumer, ChangeEventLog
+from test_registry import FakeGraph, registry
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_append_after_torn_line(tmp_path):
+    log = ChangeEventLog(str(tmp_path / "events.jsonl"))
+    log.append("edge_added", from_id="a", to_id="b")
+    with open(log.path, "ab") as f:
+        f.write(b'{"seq": 2, "type": "edge_ad')
+    # The torn line is neither read nor counted
+    assert [event["seq"] for event in log.read()] == [1]
+    assert log.last_sequence() == 1
+
+    assert log.append_many("dataproduct_deleted", [{"id": "x"}, {"id": "y"}]) == 3
+    assert [(event["seq"], event["type"]) for event in log.read()] == [
+        (1, "edge_added"), (2, "dataproduct_deleted"), (3, "dataproduct_deleted")]
+
+
+def test_scan_and_read(tmp_path):
+    log = ChangeEventLog(str(tmp_path / "events.jsonl"))
+    assert log.read() == [] and list(log.scan()) == []
+    for name in "abc":
+        log.append("dataproduct_created", id=name)
+    positions = [position for _, position in log.scan()]
+    assert positions[-1] == os.path.getsize(log.path)
+    assert [event["id"] for event, _ in log.scan(positions[0])] == ["b", "c"]
+    assert [event["id"] for event in log.read(after=1, limit=1)] == ["b"]
+
+
+def test_consumer_poll_commit_and_resume(tmp_path):
+    log = ChangeEventLog(str(tmp_path / "events.jsonl"))
+    offset_path = str(tmp_path / "consumer.offset")
+    log.append_many("edge_added", [{"from_id": "a", "to_id": "b"}, {"from_id": "b", "to_id": "c"}])
+
+    consumer = ChangeEventConsumer(log, offset_path)
+    assert [event["seq"] for event in consumer.poll(limit=1)] == [1]
+    consumer.commit()
+    assert [event["seq"] for event in consumer.poll()] == [2]
+    assert consumer.poll() == []
+
+    # Restarted before committing seq 2: it is delivered again
+    restarted = ChangeEventConsumer(log, offset_path)
+    assert [event["seq"] for event in restarted.poll()] == [2]
+    restarted.commit()
+    log.append("edge_removed", from_id="a", to_id="b")
+    assert [event["seq"] for event in ChangeEventConsumer(log, offset_path).poll()] == [3]
+
+
+def test_pending_appends_after_the_write(tmp_path):
+    log = ChangeEventLog(str(tmp_path / "events.jsonl"))
+    with log.pending([{"type": "edge_added", "from_id": "a", "to_id": "b"},
+                      {"type": "edge_added", "from_id": "a", "to_id": "c"}]) as events:
+        assert log.read() == []
+        events[:] = events[1:]
+    [event] = log.read()
+    assert event["to_id"] == "c" and event["change_id"]
+
+    with pytest.raises(RuntimeError):
+        with log.pending([{"type": "dataproduct_deleted", "id": "x"}]):
+            raise RuntimeError("write failed")
+    assert len(log.read()) == 1
+    assert os.path.getsize(log.journal_path) == 0
+
+
+def test_recover_appends_events_of_a_dead_writer_once(tmp_path):
+    log_path = str(tmp_path / "events.jsonl")
+    # A writer that dies between its graph write and appending the event
+    subprocess.run([sys.executable, "-c", f"""
+import os, sys
+sys.path.insert(0, {HERE!r})
+from change_events import ChangeEventLog
+with ChangeEventLog({log_path!r}).pending([{{"type": "dataproduct_created", "id": "x"}}]):
+    os._exit(1)
+"""], check=False)
+    log = ChangeEventLog(log_path)
+    assert log.read() == []
+    assert log.recover() == 1
+    assert [event["id"] for event in log.read()] == ["x"]
+    assert log.recover() == 0
+
+
+def test_recover_skips_changes_already_logged(tmp_path):
+    log = ChangeEventLog(str(tmp_path / "events.jsonl"))
+    event = {"type": "edge_added", "from_id": "a", "to_id": "b"}
+    # Died after appending but before clearing its journal entry
+    log.append_events([event], change_id="c1")
+    with open(log.journal_path, "w") as f:
+        for change_id, pid in [("c1", dead_pid()), ("c2", os.getpid())]:
+            f.write(json.dumps({"change_id": change_id, "host": socket.gethostname(), "pid": pid,
+                                "position": 0, "events": [event]}) + "\n")
+    assert log.recover() == 0
+    assert len(log.read()) == 1
+    # The live writer's entry is left alone
+    with open(log.journal_path) as f:
+        assert [json.loads(line)["change_id"] for line in f] == ["c2"]
+
+
+def test_registry_emits_created_edges_only(tmp_path):
+    graph = FakeGraph({"RETURN row.from_id AS from_id": [{"from_id": "a", "to_id": "b"}]})
+    kgm = registry(graph)
+    kgm.events = ChangeEventLog(str(tmp_path / "events.jsonl"))
+    kgm.WIRING_BATCH_SIZE = 1
+    created = kgm.wire_edges(kgm.FEEDS_INTO_STATEMENT, [{"from_id": "a", "to_id": "b"}],
+                             "FEEDS_INTO", dict)
+    assert created == [{"from_id": "a", "to_id": "b"}]
+    assert [(e["type"], e["rel_type"], e["from_id"], e["to_id"]) for e in kgm.events.read()] == [
+        ("edge_added", "FEEDS_INTO", "a", "b")]
@@ -0,0 +1,87 @@
+from py2neo import Node
+
+from kg_registry import DataProductRegistry
+
+MERGE_KEYS = {"Owner": ["email"], "Database": ["host", "name"]}
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+
+class FakeGraph:
+    """Records py2neo calls; run() answers with the rows of the first `responses` fragment in the query."""
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.queries, self.merged, self.created = [], [], []
+
+    def run(self, query, **params):
+        query = " ".join(query.split())
+        self.queries.append((query, params))
+        for fragment, rows in self.responses.items():
+            if fragment in query:
+                return FakeCursor(rows)
+        return FakeCursor([])
+
+    def merge(self, subgraph, label=None, *keys):
+        self.merged.append((dict(subgraph), label, keys))
+
+    def create(self, subgraph):
+        self.created.append(dict(subgraph))
+
+
+def registry(graph: FakeGraph) -> DataProductRegistry:
+    kgm = DataProductRegistry.__new__(DataProductRegistry)
+    kgm.graph, kgm.merge_keys, kgm.events = graph, MERGE_KEYS, None
+    return kgm
+
+
+def statements(graph: FakeGraph, prefix: str) -> list:
+    return [query for query, _ in graph.queries if query.startswith(prefix)]
+
+
+def test_create_or_merge_uses_merge_keys():
+    graph = FakeGraph()
+    kgm = registry(graph)
+    owner = kgm.create_or_merge("Owner", {"email": "ana@example.com", "name": "Ana"})
+    kgm.create_or_merge("Database", {"host": "db1", "name": "sales"})
+    kgm.create_or_merge("Database", {"name": "sales"})
+    kgm.create_or_merge("Pipeline", {"name": "IngestSales"})
+
+    assert isinstance(owner, Node) and owner.has_label("Owner")
+    assert graph.merged == [({"email": "ana@example.com", "name": "Ana"}, "Owner", ("email",)),
+                            ({"host": "db1", "name": "sales"}, "Database", (("host", "name"),))]
+    # Without all key properties, or without a configured key, a node per product
+    assert graph.created == [{"name": "sales"}, {"name": "IngestSales"}]
+
+
+def test_merge_duplicate_entities_then_enforces_uniqueness():
+    graph = FakeGraph({"apoc.periodic.iterate": [{"batches": 1, "total": 3, "errorMessages": {}}]})
+    assert registry(graph).merge_duplicate_entities() == {"Owner": 3, "Database": 3}
+
+    iterations = [params for query, params in graph.queries if "apoc.periodic.iterate" in query]
+    assert "n.host IS NOT NULL AND n.name IS NOT NULL" in iterations[1]["groups"]
+    assert statements(graph, "DROP INDEX") == ["DROP INDEX owner_merge_key IF EXISTS",
+                                               "DROP INDEX database_merge_key IF EXISTS"]
+    assert statements(graph, "CREATE CONSTRAINT") == [
+        "CREATE CONSTRAINT owner_merge_key IF NOT EXISTS FOR (n:Owner) REQUIRE (n.email) IS UNIQUE",
+        "CREATE CONSTRAINT database_merge_key IF NOT EXISTS FOR (n:Database) REQUIRE (n.host, n.name) IS UNIQUE",
+    ]
+
+
+def test_duplicates_fall_back_to_index():
+    graph = FakeGraph({"count(n) AS nodes": [{"email": "ana@example.com", "nodes": 2}]})
+    registry(graph).ensure_merge_key_constraints()
+    assert not statements(graph, "CREATE CONSTRAINT") and not statements(graph, "DROP INDEX")
+    assert statements(graph, "CREATE INDEX owner_merge_key IF NOT EXISTS FOR (n:Owner) ON (n.email)")
+
+
+def test_existing_constraint_is_left_alone():
+    graph = FakeGraph({"SHOW CONSTRAINTS": [{"name": "owner_merge_key"}]})
+    registry(graph).ensure_merge_key_constraints()
+    assert [query for query, _ in graph.queries if not query.startswith("SHOW CONSTRAINTS")] == []